@@ -26,8 +26,8 @@ from api.serializers import (
     UserSerializer,
 )
 from azure.storage.blob import BlobServiceClient
-from config import settings
 from datasets.serializers import DataPartnerSerializer
+from django.conf import settings
 from django.contrib.auth.models import User
 from django.contrib.contenttypes.models import ContentType
 from django.core.exceptions import ObjectDoesNotExist
@@ -53,11 +53,11 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 from shared.data.models import Concept
 from shared.files.service import delete_blob, modify_filename, upload_blob
+from shared.jobs.models import Job, JobStage, StageStatus
 from shared.mapping.models import (
     DataDictionary,
     DataPartner,
     MappingRule,
-    OmopField,
     ScanReport,
     ScanReportConcept,
     ScanReportField,
@@ -66,18 +66,18 @@ from shared.mapping.models import (
 )
 from shared.mapping.permissions import get_user_permissions_on_scan_report
 from shared.services.azurequeue import add_message
+from shared.services.omop_registry import get_omop_registry
 from shared.services.rules import (
     _find_destination_table,
     _save_mapping_rules,
     delete_mapping_rules,
+    update_person_id_and_date_rules,
 )
 from shared.services.rules_export import (
     get_mapping_rules_json,
     get_mapping_rules_list,
     make_dag,
 )
-from shared.jobs.models import Job, JobStage, StageStatus
-from django.db.models import Q
 
 
 class DataPartnerViewSet(GenericAPIView, ListModelMixin):
@@ -190,8 +190,15 @@ class ScanReportIndexV2(GenericAPIView, ListModelMixin, CreateModelMixin):
         if not file_serializer.is_valid():
             return Response(file_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-        self.perform_create(file_serializer, non_file_serializer)
+        job = self.perform_create(file_serializer, non_file_serializer)
         headers = self.get_success_headers(file_serializer.data)
+        if job is not None:
+            # The files are still to be checked, so the upload has only been accepted
+            return Response(
+                {"scan_report": job.scan_report_id, "job": job.id},
+                status=status.HTTP_202_ACCEPTED,
+                headers=headers,
+            )
         return Response(
             file_serializer.data, status=status.HTTP_201_CREATED, headers=headers
         )
@@ -274,8 +281,20 @@ class ScanReportIndexV2(GenericAPIView, ListModelMixin, CreateModelMixin):
                 "text/csv",
             )
 
+        # When validating asynchronously, the worker checks the files before
+        # uploading them, and reports any errors through the job.
+        job = None
+        if settings.ASYNC_UPLOAD_VALIDATION:
+            job = Job.objects.create(
+                scan_report=scan_report,
+                stage=JobStage.objects.get(value="UPLOAD_SCAN_REPORT"),
+                status=StageStatus.objects.get(value="IN_PROGRESS"),
+            )
+            azure_dict["validate"] = True
+
         # send to the upload queue
         add_message(os.environ.get("UPLOAD_QUEUE_NAME"), azure_dict)
+        return job
 
 
 class ScanReportDetailV2(
@@ -377,11 +396,42 @@ class ScanReportTableDetailV2(
             Response: The response object.
         """
         instance = self.get_object()
+        # Prevent double-updating from backend
+        if Job.objects.filter(
+            scan_report_table=instance,
+            status=StageStatus.objects.get(value="IN_PROGRESS"),
+        ):
+            return Response(
+                {
+                    "detail": "There is a job running for this table. Please wait until it complete before updating."
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        previous_person_id_id = instance.person_id_id
+        previous_date_event_id = instance.date_event_id
         partial = kwargs.pop("partial", True)
         serializer = self.get_serializer(instance, data=request.data, partial=partial)
         serializer.is_valid(raise_exception=True)
         self.perform_update(serializer)
 
+        # If the table has been mapped already, only its person_id and date rules
+        # depend on the person_id and date_event, so update those in place when they
+        # change. Otherwise, map the table again.
+        changed = (previous_person_id_id, previous_date_event_id) != (
+            instance.person_id_id,
+            instance.date_event_id,
+        )
+        if (
+            changed
+            and previous_person_id_id is not None
+            and previous_date_event_id is not None
+        ):
+            update_person_id_and_date_rules(
+                instance, previous_person_id_id, previous_date_event_id
+            )
+            return Response(serializer.data)
+
         # Delete the current mapping rules
         delete_mapping_rules(instance.id)
 
@@ -403,18 +453,6 @@ class ScanReportTableDetailV2(
         trigger = (
             f"/api/orchestrators/{settings.AZ_RULES_NAME}?code={settings.AZ_RULES_KEY}"
         )
-        # Prevent double-updating from backend
-        if Job.objects.filter(
-            scan_report_table=instance,
-            status=StageStatus.objects.get(value="IN_PROGRESS"),
-        ):
-            return Response(
-                {
-                    "detail": "There is a job running for this table. Please wait until it complete before updating."
-                },
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-
         try:
             # Create Job records
             # For the first stage, default status is IN_PROGRESS
@@ -593,7 +631,7 @@ class ScanReportConceptListV2(
                 pk=body["object_id"]
             ).type_column
         # If users add the concept at "SR_Value" level
-        except:
+        except ScanReportField.DoesNotExist:
             field_datatype = ScanReportValue.objects.get(
                 pk=body["object_id"]
             ).scan_report_field.type_column
@@ -775,18 +813,11 @@ class SummaryRulesListV2(RulesListV2):
         # Get queryset
         queryset = self.get_queryset()
 
-        # Directly filter OmopField objects that end with "_concept_id" but not "_source_concept_id"
-        omop_fields_queryset = OmopField.objects.filter(
-            pk__in=queryset.values_list("omop_field_id", flat=True),
-            field__endswith="_concept_id",
-        ).exclude(
-            Q(field__endswith="_source_concept_id")
-            | Q(field__endswith="value_as_concept_id")
+        # Filter the queryset to OmopFields that end with "_concept_id" but not
+        # "_source_concept_id"
+        filtered_queryset = queryset.filter(
+            omop_field_id__in=get_omop_registry().get_concept_field_ids()
         )
-
-        ids_list = omop_fields_queryset.values_list("id", flat=True)
-        # Filter the queryset based on valid omop_field_ids
-        filtered_queryset = queryset.filter(omop_field_id__in=ids_list)
         count = filtered_queryset.count()
         # Get the rules list based on the filtered queryset
         rules = get_mapping_rules_list(
@@ -191,6 +191,9 @@ EMAIL_BACKEND = "django.core.mail.backends.console.EmailBackend"
 DATA_UPLOAD_MAX_MEMORY_SIZE = int(
     os.environ.get("DATA_UPLOAD_MAX_MEMORY_SIZE", 2621440)
 )
+# Accept uploads without checking them, leaving the checks to the upload worker.
+# Only evaluates to True if 'True' or 1 is supplied.
+ASYNC_UPLOAD_VALIDATION = os.getenv("ASYNC_UPLOAD_VALIDATION", "False") in ["True", "1"]
 
 SESSION_COOKIE_AGE = 86400  # session length is 24 hours
 
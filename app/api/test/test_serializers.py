@@ -1,7 +1,11 @@
-from api.serializers import ScanReportEditSerializer
+from unittest import mock
+
+from api.serializers import ScanReportEditSerializer, ScanReportFilesSerializer
 from datasets.serializers import DatasetEditSerializer
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from rest_framework.exceptions import ParseError
 from rest_framework.serializers import ValidationError
 from rest_framework.test import APIRequestFactory
 from shared.mapping.models import (
@@ -11,6 +15,7 @@ from shared.mapping.models import (
     ScanReport,
     VisibilityChoices,
 )
+from shared.services.scan_report_checks import ScanReportCheckError
 
 
 class TestScanReportEditSerializer(TestCase):
@@ -370,3 +375,48 @@ class TestDatasetEditSerializer(TestCase):
         # check admin can alter admins
         request.user = self.admin_user
         self.assertEqual(serializer.validate_admins(new_admin), new_admin)
+
+
+class TestScanReportFilesSerializer(TestCase):
+    def setUp(self):
+        self.serializer = ScanReportFilesSerializer()
+        self.scan_report = SimpleUploadedFile("scan_report.xlsx", b"scan report")
+        self.data_dictionary = SimpleUploadedFile(
+            "data_dictionary.csv", b"csv_file_name,field_name,code,value\n"
+        )
+
+    @override_settings(ASYNC_UPLOAD_VALIDATION=True)
+    @mock.patch("api.serializers.check_data_dictionary")
+    @mock.patch("api.serializers.check_scan_report")
+    def test_validate_files_async(self, check_scan_report, check_data_dictionary):
+        # The worker checks the files, so they're accepted as they are
+        self.assertIs(
+            self.serializer.validate_scan_report_file(self.scan_report),
+            self.scan_report,
+        )
+        self.assertIs(
+            self.serializer.validate_data_dictionary_file(self.data_dictionary),
+            self.data_dictionary,
+        )
+        check_scan_report.assert_not_called()
+        check_data_dictionary.assert_not_called()
+
+    @override_settings(ASYNC_UPLOAD_VALIDATION=False)
+    @mock.patch("api.serializers.check_data_dictionary")
+    @mock.patch("api.serializers.check_scan_report")
+    def test_validate_files(self, check_scan_report, check_data_dictionary):
+        self.assertIs(
+            self.serializer.validate_scan_report_file(self.scan_report),
+            self.scan_report,
+        )
+        self.assertIs(
+            self.serializer.validate_data_dictionary_file(self.data_dictionary),
+            self.data_dictionary,
+        )
+        check_scan_report.assert_called_once_with(self.scan_report)
+        check_data_dictionary.assert_called_once()
+
+        # Files that fail the checks are rejected
+        check_scan_report.side_effect = ScanReportCheckError(["Missing sheet"])
+        with self.assertRaises(ParseError):
+            self.serializer.validate_scan_report_file(self.scan_report)
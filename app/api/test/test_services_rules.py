@@ -19,6 +19,14 @@ from shared.mapping.models import (
     ScanReportTable,
     ScanReportValue,
 )
+from shared.services.omop_registry import clear_omop_registry, m_date_field_mapper
+from shared.services.rules import (
+    _find_existing_concepts,
+    partition_existing_concepts,
+    save_mapping_rules,
+    save_mapping_rules_sql,
+    update_person_id_and_date_rules,
+)
 
 
 class TestMisalignedMappings(TestCase):
@@ -265,3 +273,180 @@ class TestMisalignedMappings(TestCase):
             source_field=self.scan_report_field_desc,
             concept=self.scan_report_concept_cough_desc,
         )
+
+
+class TestRulesBackends(TestCase):
+    def setUp(self):
+        clear_omop_registry()
+        User = get_user_model()
+        self.user = User.objects.create(username="user", password="password")
+        data_partner = DataPartner.objects.create(name="Data Partner")
+        dataset = Dataset.objects.create(
+            name="Dataset", visibility="PUBLIC", data_partner=data_partner
+        )
+        self.scan_report = ScanReport.objects.create(
+            author=self.user,
+            name="Scan Report",
+            dataset="Dataset Name",
+            parent_dataset=dataset,
+        )
+
+        # Create the OMOP tables and fields rules are made for
+        for table_name in ("observation", "measurement", "condition_occurrence"):
+            omop_table = OmopTable.objects.create(table=table_name)
+            domain = table_name.split("_")[0]
+            field_names = [
+                "person_id",
+                *m_date_field_mapper[table_name],
+                f"{domain}_source_concept_id",
+                f"{domain}_concept_id",
+                f"{domain}_source_value",
+            ]
+            if table_name == "observation":
+                field_names += ["value_as_number", "value_as_string"]
+            if table_name == "measurement":
+                field_names += ["value_as_number", "value_as_concept_id"]
+            for field_name in field_names:
+                OmopField.objects.create(table=omop_table, field=field_name)
+
+        self.concepts = [
+            Concept.objects.create(
+                concept_id=900000000 + i,
+                concept_name=f"{domain} concept",
+                domain_id=domain,
+                vocabulary_id="SNOMED",
+                concept_class_id="Clinical Finding",
+                standard_concept="S",
+                concept_code=str(i),
+                valid_start_date=date(1970, 1, 1),
+                valid_end_date=date(2099, 12, 31),
+            )
+            for i, domain in enumerate(
+                ["Observation", "Measurement", "Meas Value", "Condition", "Drug"]
+            )
+        ]
+
+        # A table with its person_id and date_event set, and one without
+        self.table = ScanReportTable.objects.create(
+            scan_report=self.scan_report, name="Table 1"
+        )
+        self.other_table = ScanReportTable.objects.create(
+            scan_report=self.scan_report, name="Table 2"
+        )
+        fields = {
+            table: [
+                ScanReportField.objects.create(
+                    scan_report_table=table,
+                    name=type_column,
+                    description_column="",
+                    type_column=type_column,
+                    max_length=10,
+                    nrows=-1,
+                    nrows_checked=10,
+                    fraction_empty=0.0,
+                    nunique_values=2,
+                    fraction_unique=20,
+                    ignore_column=None,
+                )
+                for type_column in ("INT", "VARCHAR", "DATE", "nvarchar", "REAL")
+            ]
+            for table in (self.table, self.other_table)
+        }
+        self.table.person_id = fields[self.table][0]
+        self.table.date_event = fields[self.table][2]
+        self.table.save()
+
+        # Every concept on every field, and on a value of every field
+        field_content_type = ContentType.objects.get_for_model(ScanReportField)
+        value_content_type = ContentType.objects.get_for_model(ScanReportValue)
+        for table_fields in fields.values():
+            for field in table_fields:
+                value = ScanReportValue.objects.create(
+                    value="Y",
+                    frequency=1,
+                    value_description="",
+                    scan_report_field=field,
+                )
+                for concept in self.concepts:
+                    for content_type, object_id in (
+                        (field_content_type, field.id),
+                        (value_content_type, value.id),
+                    ):
+                        ScanReportConcept.objects.create(
+                            concept=concept,
+                            content_type=content_type,
+                            object_id=object_id,
+                            creation_type="M",
+                        )
+
+    def _rules(self):
+        return set(
+            MappingRule.objects.values_list(
+                "scan_report_id",
+                "omop_field_id",
+                "source_field_id",
+                "concept_id",
+                "approved",
+            )
+        )
+
+    def test_sql_backend_matches_python(self):
+        for table in (self.table, self.other_table):
+            save_mapping_rules(_find_existing_concepts(table.id))
+        python_rules = self._rules()
+        self.assertTrue(python_rules)
+        MappingRule.objects.all().delete()
+
+        created = sum(
+            save_mapping_rules_sql(table.id) for table in (self.table, self.other_table)
+        )
+
+        self.assertEqual(created, len(python_rules))
+        self.assertEqual(self._rules(), python_rules)
+        # Saving them again leaves the rules as they are
+        self.assertEqual(save_mapping_rules_sql(self.table.id), 0)
+        self.assertEqual(self._rules(), python_rules)
+
+    def test_sql_backend_concept_range(self):
+        save_mapping_rules(_find_existing_concepts(self.table.id))
+        python_rules = self._rules()
+        MappingRule.objects.all().delete()
+
+        for first_id, last_id in partition_existing_concepts(self.table.id, 7):
+            save_mapping_rules_sql(self.table.id, first_id, last_id)
+
+        self.assertEqual(self._rules(), python_rules)
+
+    def test_update_person_id_and_date_rules(self):
+        save_mapping_rules(_find_existing_concepts(self.table.id))
+        previous_person_id_id = self.table.person_id_id
+        previous_date_event_id = self.table.date_event_id
+        fields = list(
+            ScanReportField.objects.filter(scan_report_table=self.table).order_by("id")
+        )
+        self.table.person_id = fields[4]
+        self.table.date_event = fields[1]
+        self.table.save()
+
+        updated = update_person_id_and_date_rules(
+            self.table, previous_person_id_id, previous_date_event_id
+        )
+
+        # The rules are the same as those generated for the new fields
+        updated_rules = self._rules()
+        MappingRule.objects.all().delete()
+        save_mapping_rules(_find_existing_concepts(self.table.id))
+        self.assertGreater(updated, 0)
+        self.assertEqual(updated_rules, self._rules())
+
+    def test_update_person_id_and_date_rules_unset(self):
+        save_mapping_rules(_find_existing_concepts(self.table.id))
+        previous_date_event_id = self.table.date_event_id
+        self.table.date_event = None
+        self.table.save()
+
+        update_person_id_and_date_rules(
+            self.table, self.table.person_id_id, previous_date_event_id
+        )
+
+        self.assertFalse(MappingRule.objects.exists())
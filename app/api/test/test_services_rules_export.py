@@ -0,0 +1,230 @@
+import json
+from datetime import date, datetime, timezone
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.contrib.contenttypes.models import ContentType
+from django.test import TestCase
+from shared.data.models import Concept
+from shared.mapping.models import (
+    DataPartner,
+    Dataset,
+    MappingRule,
+    OmopField,
+    OmopTable,
+    ScanReport,
+    ScanReportConcept,
+    ScanReportField,
+    ScanReportTable,
+    ScanReportValue,
+)
+from shared.services import rules_export
+from shared.services.rules_export import (
+    get_mapping_rule_rows,
+    get_mapping_rules_as_csv,
+    get_mapping_rules_json,
+    get_mapping_rules_list,
+    iter_mapping_rules_json,
+)
+
+
+class TestMappingRuleRows(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        user = User.objects.create(username="user", password="password")
+        data_partner = DataPartner.objects.create(name="Data Partner")
+        dataset = Dataset.objects.create(
+            name="Dataset", visibility="PUBLIC", data_partner=data_partner
+        )
+        self.scan_report = ScanReport.objects.create(
+            author=user,
+            name="Scan Report",
+            dataset="Dataset Name",
+            parent_dataset=dataset,
+        )
+        table = ScanReportTable.objects.create(
+            scan_report=self.scan_report, name="Table"
+        )
+        omop_table = OmopTable.objects.create(table="observation")
+        source_concept_id = OmopField.objects.create(
+            table=omop_table, field="observation_source_concept_id"
+        )
+        source_value = OmopField.objects.create(
+            table=omop_table, field="observation_source_value"
+        )
+
+        field_content_type = ContentType.objects.get_for_model(ScanReportField)
+        value_content_type = ContentType.objects.get_for_model(ScanReportValue)
+        # A concept on a value of each field, and on each field
+        for i in range(10):
+            field = ScanReportField.objects.create(
+                scan_report_table=table,
+                name=f"Field {i}",
+                description_column="",
+                type_column="VARCHAR",
+                max_length=10,
+                nrows=-1,
+                nrows_checked=10,
+                fraction_empty=0.0,
+                nunique_values=1,
+                fraction_unique=10,
+                ignore_column=None,
+            )
+            value = ScanReportValue.objects.create(
+                value=f"Value {i}",
+                frequency=1,
+                value_description="",
+                scan_report_field=field,
+            )
+            concept = Concept.objects.create(
+                concept_id=900000000 + i,
+                concept_name=f"Concept {i}",
+                domain_id="Observation",
+                vocabulary_id="SNOMED",
+                concept_class_id="Clinical Finding",
+                standard_concept="S",
+                concept_code=str(i),
+                valid_start_date=date(1970, 1, 1),
+                valid_end_date=date(2099, 12, 31),
+            )
+            for content_type, object_id in (
+                (value_content_type, value.id),
+                (field_content_type, field.id),
+            ):
+                scan_report_concept = ScanReportConcept.objects.create(
+                    concept=concept,
+                    content_type=content_type,
+                    object_id=object_id,
+                    creation_type="M",
+                )
+                for omop_field in (source_concept_id, source_value):
+                    MappingRule.objects.create(
+                        scan_report=self.scan_report,
+                        omop_field=omop_field,
+                        source_field=field,
+                        concept=scan_report_concept,
+                        approved=True,
+                    )
+        self.mapping_rules = MappingRule.objects.filter(
+            scan_report=self.scan_report
+        ).order_by("id")
+
+    def test_get_mapping_rule_rows(self):
+        # The content types are cached after the first lookup
+        ContentType.objects.get_for_model(ScanReportValue)
+
+        with self.assertNumQueries(1):
+            rows = get_mapping_rule_rows(self.mapping_rules)
+
+        self.assertEqual(len(rows), 40)
+        value_rule, value_source_value, field_rule, field_source_value = rows[:4]
+        self.assertEqual(value_rule.term_mapping, {"Value 0": 900000000})
+        self.assertEqual(field_rule.term_mapping, 900000000)
+        self.assertIsNone(value_source_value.term_mapping)
+        self.assertIsNone(field_source_value.term_mapping)
+        self.assertEqual(value_rule.omop_term, "Concept 0")
+        self.assertEqual(value_rule.domain, "Observation")
+        self.assertEqual(value_rule.destination_table, "observation")
+        self.assertEqual(value_rule.destination_field, "observation_source_concept_id")
+        self.assertEqual(value_rule.source_table, "Table")
+        self.assertEqual(value_rule.source_field, "Field 0")
+
+    def test_get_mapping_rules_list_page(self):
+        ContentType.objects.get_for_model(ScanReportValue)
+
+        with self.assertNumQueries(1):
+            rules = get_mapping_rules_list(
+                self.mapping_rules, page_number=2, page_size=30
+            )
+
+        self.assertEqual(len(rules), 10)
+        self.assertEqual(rules[0]["destination_table"].table, "observation")
+        self.assertEqual(rules[0]["source_field"].name, "Field 7")
+
+    def test_get_mapping_rules_json(self):
+        ContentType.objects.get_for_model(ScanReportValue)
+
+        with self.assertNumQueries(2):
+            rules_json = get_mapping_rules_json(self.mapping_rules)
+
+        self.assertEqual(rules_json["metadata"]["dataset"], "Dataset Name")
+        observation = rules_json["cdm"]["observation"]
+        self.assertEqual(len(observation), 20)
+        self.assertEqual(
+            observation[f"Concept 0 {self.mapping_rules[0].concept_id}"],
+            {
+                "observation_source_concept_id": {
+                    "source_table": "Table",
+                    "source_field": "Field 0",
+                    "term_mapping": {"Value 0": 900000000},
+                },
+                "observation_source_value": {
+                    "source_table": "Table",
+                    "source_field": "Field 0",
+                },
+            },
+        )
+
+    def test_get_mapping_rules_as_csv(self):
+        ContentType.objects.get_for_model(ScanReportValue)
+
+        # The rules, then the concepts of each chunk of 15 rules
+        with patch.object(rules_export, "RULE_ROWS_CHUNK_SIZE", 15):
+            with self.assertNumQueries(4):
+                rows = get_mapping_rules_as_csv(self.mapping_rules).read().splitlines()
+
+        self.assertEqual(len(rows), 41)
+        self.assertEqual(
+            rows[0],
+            "source_table,source_field,source_value,concept_id,omop_term,class,"
+            "concept,validity,domain,vocabulary,creation_type,rule_id,isFieldMapping",
+        )
+        rule_id = self.mapping_rules[0].concept_id
+        self.assertEqual(
+            rows[1:5],
+            [
+                f"Table,Field 0,Value 0,900000000,Concept 0,Clinical Finding,S,True,"
+                f"Observation,SNOMED,M,{rule_id},0",
+                f"Table,Field 0,,,Concept 0,,,,Observation,,M,{rule_id},",
+                f"Table,Field 0,,900000000,Concept 0,Clinical Finding,S,True,"
+                f"Observation,SNOMED,M,{rule_id + 1},1",
+                f"Table,Field 0,,,Concept 0,,,,Observation,,M,{rule_id + 1},",
+            ],
+        )
+
+    def test_iter_mapping_rules_json(self):
+        # Add a second destination table, with rules before the first
+        omop_table = OmopTable.objects.create(table="condition_occurrence")
+        omop_field = OmopField.objects.create(
+            table=omop_table, field="condition_source_concept_id"
+        )
+        for rule in self.mapping_rules.filter(
+            omop_field__field="observation_source_concept_id"
+        )[:5]:
+            MappingRule.objects.create(
+                scan_report=self.scan_report,
+                omop_field=omop_field,
+                source_field=rule.source_field,
+                concept=rule.concept,
+                approved=True,
+            )
+        ordered_rules = self.mapping_rules.order_by(
+            "omop_field__table__table", "concept_id", "id"
+        )
+
+        with patch.object(rules_export, "datetime") as mock_datetime:
+            mock_datetime.now.return_value = datetime(2024, 1, 1, tzinfo=timezone.utc)
+            for indent in (6, None):
+                with self.subTest(indent=indent):
+                    self.assertEqual(
+                        "".join(iter_mapping_rules_json(self.mapping_rules, indent)),
+                        json.dumps(
+                            get_mapping_rules_json(ordered_rules), indent=indent
+                        ),
+                    )
+                    self.assertEqual(
+                        "".join(
+                            iter_mapping_rules_json(MappingRule.objects.none(), indent)
+                        ),
+                        json.dumps({"metadata": {}, "cdm": {}}, indent=indent),
+                    )
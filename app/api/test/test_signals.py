@@ -0,0 +1,85 @@
+from datetime import date
+
+from django.contrib.contenttypes.models import ContentType
+from django.test import TestCase
+from shared.mapping.models import (
+    Concept,
+    DataPartner,
+    Dataset,
+    MappingStatus,
+    ReusableConcept,
+    ScanReport,
+    ScanReportConcept,
+    ScanReportField,
+    ScanReportTable,
+)
+from shared.services.reusable_concepts import refresh_reusable_concepts
+
+
+class TestRefreshChangedReusableConcepts(TestCase):
+    def setUp(self):
+        # Set up a mapped Scan Report in a visible Dataset, and a hidden Dataset
+        data_partner = DataPartner.objects.create(name="Silvan Elves")
+        self.visible_dataset = Dataset.objects.create(
+            name="The Shire", data_partner=data_partner
+        )
+        self.hidden_dataset = Dataset.objects.create(
+            name="The Mines of Moria", data_partner=data_partner, hidden=True
+        )
+        complete = MappingStatus.objects.create(
+            value="COMPLETE", display_name="Mapping Complete"
+        )
+        scan_report = ScanReport.objects.create(
+            dataset="The Heights of Hobbits",
+            parent_dataset=self.visible_dataset,
+            mapping_status=complete,
+        )
+        table = ScanReportTable.objects.create(scan_report=scan_report, name="Table1")
+        field = ScanReportField.objects.create(
+            scan_report_table=table,
+            name="Field1",
+            description_column="",
+            type_column="",
+            max_length=32,
+            nrows=0,
+            nrows_checked=0,
+            fraction_empty=0.0,
+            nunique_values=0,
+            fraction_unique=0.0,
+        )
+        concept = Concept.objects.create(
+            concept_id=1,
+            concept_name="Test Concept",
+            domain_id="Test Domain",
+            vocabulary_id="Test Vocab",
+            concept_class_id="1",
+            concept_code="100",
+            valid_start_date=date.today(),
+            valid_end_date=date.today(),
+        )
+        ScanReportConcept.objects.create(
+            concept=concept,
+            content_type=ContentType.objects.get_for_model(ScanReportField),
+            object_id=field.id,
+        )
+        refresh_reusable_concepts()
+        self.scan_report_id = scan_report.id
+
+    def _move_scan_report(self, dataset: Dataset):
+        scan_report = ScanReport.objects.get(id=self.scan_report_id)
+        scan_report.parent_dataset = dataset
+        with self.captureOnCommitCallbacks(execute=True):
+            scan_report.save()
+
+    def test_move_scan_report_between_datasets(self):
+        reusable_concepts = ReusableConcept.objects.filter(
+            scan_report_id=self.scan_report_id
+        )
+        self.assertEqual(reusable_concepts.count(), 1)
+
+        # Concepts on fields aren't reused from hidden Datasets
+        self._move_scan_report(self.hidden_dataset)
+        self.assertEqual(reusable_concepts.count(), 0)
+
+        self._move_scan_report(self.visible_dataset)
+        self.assertEqual(reusable_concepts.count(), 1)
@@ -3,12 +3,15 @@ from datetime import date
 from unittest import mock
 
 import pytest
+from api.views import ScanReportIndexV2, ScanReportTableDetailV2
 from datasets.views import DatasetIndex
 from django.contrib.auth import get_user_model
 from django.contrib.contenttypes.models import ContentType
-from django.test import TestCase, TransactionTestCase
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, TransactionTestCase, override_settings
 from rest_framework.authtoken.models import Token
 from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+from shared.jobs.models import Job, JobStage, StageStatus
 from shared.mapping.models import (
     Concept,
     DataPartner,
@@ -625,6 +628,148 @@ class TestScanReportListViewset(TransactionTestCase):
         self.assertListEqual(observed_objs, expected_objs)
 
 
+class TestScanReportCreateView(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create(username="gandalf", password="iwjfijweifje")
+        self.data_partner = DataPartner.objects.create(name="Silvan Elves")
+        self.dataset = Dataset.objects.create(
+            name="The Shire",
+            visibility=VisibilityChoices.PUBLIC,
+            data_partner=self.data_partner,
+        )
+        self.dataset.admins.add(self.user)
+        self.project = Project.objects.create(name="The Fellowship of The Ring")
+        self.project.datasets.add(self.dataset)
+        self.project.members.add(self.user)
+
+    def _post(self):
+        request = APIRequestFactory().post(
+            "/api/v2/scanreports/",
+            {
+                "dataset": "The Heights of Hobbits",
+                "parent_dataset": self.dataset.id,
+                "visibility": VisibilityChoices.PUBLIC,
+                "scan_report_file": SimpleUploadedFile(
+                    "scan_report.xlsx", b"scan report"
+                ),
+            },
+            format="multipart",
+        )
+        force_authenticate(request, user=self.user)
+        with mock.patch("api.views.upload_blob"), mock.patch(
+            "api.views.add_message"
+        ) as add_message, mock.patch(
+            "api.serializers.check_scan_report"
+        ) as check_scan_report:
+            response = ScanReportIndexV2.as_view()(request)
+        return response, add_message, check_scan_report
+
+    @override_settings(ASYNC_UPLOAD_VALIDATION=True)
+    def test_post_async(self):
+        response, add_message, check_scan_report = self._post()
+
+        # The upload is accepted, and the worker checks it
+        self.assertEqual(response.status_code, 202)
+        job = Job.objects.get()
+        self.assertEqual(
+            response.data, {"scan_report": job.scan_report_id, "job": job.id}
+        )
+        self.assertEqual(job.stage.value, "UPLOAD_SCAN_REPORT")
+        self.assertEqual(job.status.value, "IN_PROGRESS")
+        self.assertIs(add_message.call_args.args[1]["validate"], True)
+        check_scan_report.assert_not_called()
+
+    @override_settings(ASYNC_UPLOAD_VALIDATION=False)
+    def test_post(self):
+        response, add_message, check_scan_report = self._post()
+
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(Job.objects.exists())
+        self.assertNotIn("validate", add_message.call_args.args[1])
+        check_scan_report.assert_called_once()
+
+
+class TestScanReportTableDetailV2Patch(TestCase):
+    def setUp(self):
+        User = get_user_model()
+        self.user = User.objects.create(username="gandalf", password="iwjfijweifje")
+        data_partner = DataPartner.objects.create(name="Silvan Elves")
+        dataset = Dataset.objects.create(
+            name="The Shire",
+            visibility=VisibilityChoices.PUBLIC,
+            data_partner=data_partner,
+        )
+        dataset.admins.add(self.user)
+        project = Project.objects.create(name="The Fellowship of The Ring")
+        project.datasets.add(dataset)
+        project.members.add(self.user)
+        self.scan_report = ScanReport.objects.create(
+            dataset="The Heights of Hobbits",
+            visibility=VisibilityChoices.PUBLIC,
+            parent_dataset=dataset,
+        )
+        self.table = ScanReportTable.objects.create(
+            scan_report=self.scan_report, name="Table1"
+        )
+        self.person_id, self.other_person_id = [
+            ScanReportField.objects.create(
+                scan_report_table=self.table,
+                name=name,
+                description_column="",
+                type_column="",
+                max_length=32,
+                nrows=0,
+                nrows_checked=0,
+                fraction_empty=0.0,
+                nunique_values=0,
+                fraction_unique=0.0,
+            )
+            for name in ["Field1", "Field2"]
+        ]
+        # The table has been mapped already
+        self.table.person_id = self.person_id
+        self.table.date_event = self.person_id
+        self.table.save()
+
+    def _patch(self):
+        request = APIRequestFactory().patch(
+            f"/api/v2/scanreports/{self.scan_report.id}/tables/{self.table.id}/",
+            {"person_id": self.other_person_id.id},
+            format="json",
+        )
+        force_authenticate(request, user=self.user)
+        with mock.patch("api.views.update_person_id_and_date_rules") as update_rules:
+            response = ScanReportTableDetailV2.as_view()(
+                request, pk=self.scan_report.id, table_pk=self.table.id
+            )
+        return response, update_rules
+
+    def test_patch_in_place(self):
+        response, update_rules = self._patch()
+
+        self.assertEqual(response.status_code, 200)
+        update_rules.assert_called_once()
+        self.table.refresh_from_db()
+        self.assertEqual(self.table.person_id, self.other_person_id)
+
+    def test_patch_job_running(self):
+        Job.objects.create(
+            scan_report=self.scan_report,
+            scan_report_table=self.table,
+            stage=JobStage.objects.get(value="GENERATE_RULES"),
+            status=StageStatus.objects.get(value="IN_PROGRESS"),
+        )
+
+        response, update_rules = self._patch()
+
+        # The table isn't updated while it's being mapped
+        self.assertEqual(response.status_code, 400)
+        update_rules.assert_not_called()
+        self.table.refresh_from_db()
+        self.assertEqual(self.table.person_id, self.person_id)
+
+
 class TestScanReportActiveConceptFilterViewSet(TestCase):
     def setUp(self):
         # Set up Data Partner
@@ -1,11 +1,15 @@
+import base64
 import csv
 import os
 from io import StringIO
-from typing import IO, AnyStr, Iterable, Union
+from typing import IO, AnyStr, Iterable, List, Union
 
-from azure.storage.blob import BlobServiceClient, ContentSettings
+from azure.storage.blob import BlobBlock, BlobServiceClient, ContentSettings
 from django.http.response import HttpResponse
 
+# The size of the blocks `upload_blob_blocks` stages files in
+BLOB_BLOCK_SIZE = 4 * 1024 * 1024
+
 
 def download_data_dictionary_blob(blob_name, container="data-dictionaries"):
     blob_service_client = BlobServiceClient.from_connection_string(
@@ -172,3 +176,56 @@ def upload_blob_read(
         file.read(),
         content_settings=ContentSettings(content_type=content_type),
     )
+
+
+def upload_blob_blocks(
+    blob_name: str,
+    container: str,
+    chunks: Iterable[bytes],
+    content_type: str,
+    block_size: int = BLOB_BLOCK_SIZE,
+) -> None:
+    """
+    Uploads a file to a container in Azure Blob Storage as it's generated, staging
+    it in blocks and committing them at the end, so the whole file is never held in
+    memory.
+
+    Args:
+        blob_name (str): The name that will be assigned to the uploaded file in Azure Blob Storage.
+        container (str): The name of the Azure Blob Storage container where the file will be uploaded.
+        chunks (Iterable[bytes]): The contents of the file, in chunks of any size.
+        content_type (str): The MIME type of the file to be uploaded.
+        block_size (int): The size of the blocks to stage.
+
+    Returns:
+        None
+    """
+    blob_service_client = BlobServiceClient.from_connection_string(
+        os.getenv("STORAGE_CONN_STRING")
+    )
+
+    blob_client = blob_service_client.get_blob_client(
+        container=container, blob=blob_name
+    )
+
+    block_ids: List[str] = []
+
+    def stage_block(data: bytes) -> None:
+        # Block ids must all be the same length
+        block_id = base64.b64encode(f"{len(block_ids):08d}".encode()).decode()
+        blob_client.stage_block(block_id, data)
+        block_ids.append(block_id)
+
+    buffer = bytearray()
+    for chunk in chunks:
+        buffer += chunk
+        while len(buffer) >= block_size:
+            stage_block(bytes(buffer[:block_size]))
+            del buffer[:block_size]
+    if buffer:
+        stage_block(bytes(buffer))
+
+    blob_client.commit_block_list(
+        [BlobBlock(block_id=block_id) for block_id in block_ids],
+        content_settings=ContentSettings(content_type=content_type),
+    )
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class MappingConfig(AppConfig):
     name = "shared.mapping"
     label = "mapping"
+
+    def ready(self):
+        import shared.mapping.signals
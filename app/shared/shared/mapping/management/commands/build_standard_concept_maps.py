@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from shared.services.standard_concepts import build_standard_concept_maps
+
+
+class Command(BaseCommand):
+    help = (
+        "Build the standard concepts each concept maps to through 'Maps to' "
+        "relationships in the OMOP vocabularies, for workers to look up with a "
+        "single query. Run again after loading a new vocabulary release."
+    )
+
+    def handle(self, *args, **options):
+        count, version = build_standard_concept_maps()
+        self.stdout.write(
+            f"Built {count} standard concept maps from vocabulary version "
+            f"'{version}'."
+        )
@@ -0,0 +1,30 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+from shared.services.vocabulary_index import build_vocabulary_index
+
+
+class Command(BaseCommand):
+    help = (
+        "Build a vocabulary index of every concept in the OMOP concept table, for "
+        "workers to look up concepts by vocabulary and code without querying the "
+        "database. Run again after loading a new vocabulary release."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--path",
+            default=os.environ.get("VOCABULARY_INDEX_PATH"),
+            help="Where to write the index. Defaults to VOCABULARY_INDEX_PATH.",
+        )
+        parser.add_argument("--chunk-size", type=int, default=10000)
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        if not path:
+            raise CommandError("Pass --path or set VOCABULARY_INDEX_PATH.")
+
+        count, version = build_vocabulary_index(path, options["chunk_size"])
+        self.stdout.write(
+            f"Wrote {count} concepts to {path}, stamped with version '{version}'."
+        )
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from shared.services.reusable_concepts import refresh_reusable_concepts
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the Reusable Concepts from the concepts of every active Scan Report. "
+        "They're kept up to date as Scan Reports and concepts change, so this is only "
+        "needed to fill them in the first time, or to repair them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scan-report",
+            type=int,
+            action="append",
+            dest="scan_report_ids",
+            help="Only rebuild the Reusable Concepts of this Scan Report. Repeatable.",
+        )
+
+    def handle(self, *args, **options):
+        created = refresh_reusable_concepts(scan_report_ids=options["scan_report_ids"])
+        self.stdout.write(f"Created {created} Reusable Concepts.")
@@ -1,67 +1,56 @@
 from datetime import datetime, timezone
 
 from django.core.management.base import BaseCommand
-from shared.mapping.models import MappingRule
-from shared.services.rules import _find_existing_concepts, _save_mapping_rules
+from shared.mapping.models import MappingRule, ScanReportTable
+from shared.services.rules import (
+    _find_existing_concepts,
+    save_mapping_rules,
+    save_mapping_rules_sql,
+)
 
 
 class Command(BaseCommand):
     help = (
         "Refresh all the mapping rules associated to the supplied Scan Report. "
-        "This can take a _very_ long time (hours) to execute for large numbers of "
-        "ScanReportConcepts. It can also hang at random intervals. If this occurs "
-        "(a single ScanReportConcept takes <2s to complete, so it's easy to spot "
-        "when it hangs) then reboot the container, then comment out the "
-        "'remove_mapping_rules' line below and set skip_first to skip n "
-        "ScanReportConcepts."
+        "The existing rules are deleted, then the rules of each table's "
+        "ScanReportConcepts are saved in batches, or with --backend sql, in a "
+        "single SQL statement."
     )
 
     def add_arguments(self, parser):
         parser.add_argument("--report-id", required=True, type=int)
+        parser.add_argument("--backend", choices=["python", "sql"], default="python")
 
     def handle(self, *args, **options):
         _id = int(options["report_id"])
-        # If restarting this command, comment out the "remove_mapping_rules" line to
-        # keep the previously generated rules, and then update the skip_first value
-        # below to avoid reprocessing all the first ScanReportConcepts which already
-        # have their mapping rules generated.
         rules = MappingRule.objects.all().filter(scan_report__id=_id)
         rules.delete()
 
-        # get all associated ScanReportConcepts for this given ScanReport
-        # this method can take a couple of minutes to execute
-        print("find_existing_scan_report_concepts")
-        all_associated_concepts = _find_existing_concepts(_id)
-        print("total SRConcepts:", len(all_associated_concepts))
-
-        # save all of them
         nconcepts = 0
         nbadconcepts = 0
         start_time = datetime.now(timezone.utc)
-        n_concepts_total = len(all_associated_concepts)
-        print(f"total concepts to map: {n_concepts_total}")
-        skip_first = 0
-        n_concepts_total -= skip_first
-        for concept_index, concept in enumerate(all_associated_concepts[skip_first:]):
-            print(f"new concept {str(concept_index)} of {n_concepts_total}")
-            this_start_time = datetime.now(timezone.utc)
-            if _save_mapping_rules(concept):
-                nconcepts += 1
-            else:
-                nbadconcepts += 1
-            latest_time = datetime.now(timezone.utc)
-            print(f"this concept took: {str(latest_time - this_start_time)}")
-            average_period = (latest_time - start_time) / (concept_index + 1)
-            print(f"average time per concept so far: {str(average_period)}")
-            # Print estimated end time, with a series of hashes on the end to mock a
-            # progress bar - makes it easier to immediately spot if it's hanging.
+        for table in ScanReportTable.objects.filter(scan_report__id=_id).order_by("id"):
+            if options["backend"] == "sql":
+                nrules = save_mapping_rules_sql(table.id)
+                print(
+                    f"table {table.name}: added {nrules} rules, "
+                    f"{datetime.now(timezone.utc) - start_time} so far"
+                )
+                continue
+
+            # get all associated ScanReportConcepts for this table
+            concepts = _find_existing_concepts(table.id)
+            saved = save_mapping_rules(concepts)
+            nconcepts += saved
+            nbadconcepts += len(concepts) - saved
             print(
-                "  estimated end time: "
-                + str(start_time + average_period * n_concepts_total)
-                + "#" * (concept_index % 10)
+                f"table {table.name}: added rules for {saved} of {len(concepts)} "
+                f"concepts, {datetime.now(timezone.utc) - start_time} so far"
             )
 
-        if nbadconcepts == 0:
+        if options["backend"] == "sql":
+            print("Finished adding rules for existing concepts")
+        elif nbadconcepts == 0:
             print(f"Found and added rules for {nconcepts} existing concepts")
         else:
             print(
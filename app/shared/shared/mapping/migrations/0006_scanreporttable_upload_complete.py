@@ -0,0 +1,23 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("mapping", "0005_auto_20241015_0900"),
+    ]
+
+    operations = [
+        # Tables uploaded before this migration were uploaded in full.
+        migrations.AddField(
+            model_name="scanreporttable",
+            name="upload_complete",
+            field=models.BooleanField(default=True),
+            preserve_default=False,
+        ),
+        migrations.AlterField(
+            model_name="scanreporttable",
+            name="upload_complete",
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,50 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("mapping", "0006_scanreporttable_upload_complete"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StandardConceptMap",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("source_concept_id", models.IntegerField()),
+                ("standard_concept_id", models.IntegerField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name="StandardConceptMapVersion",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("version", models.CharField(max_length=255)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="standardconceptmap",
+            constraint=models.UniqueConstraint(
+                fields=("source_concept_id", "standard_concept_id"),
+                name="standardconceptmap_unique",
+            ),
+        ),
+    ]
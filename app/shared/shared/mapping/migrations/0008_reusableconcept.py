@@ -0,0 +1,170 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+# The number of Scan Report Concepts to backfill in one query
+BATCH_SIZE = 5000
+
+
+def _concept_batches(ScanReportConcept, content_type):
+    batch = []
+    for concept in (
+        ScanReportConcept.objects.filter(content_type=content_type)
+        .order_by("id")
+        .values_list("id", "concept_id", "object_id")
+        .iterator(chunk_size=BATCH_SIZE)
+    ):
+        batch.append(concept)
+        if len(batch) == BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def backfill_reusable_concepts(apps, schema_editor):
+    """
+    Adds a Reusable Concept for each concept on a value or field of a mapped, visible
+    Scan Report, as `refresh_reusable_concepts` does when rebuilding them all.
+    """
+    ContentType = apps.get_model("contenttypes", "ContentType")
+    ScanReportConcept = apps.get_model("mapping", "ScanReportConcept")
+    ScanReportField = apps.get_model("mapping", "ScanReportField")
+    ScanReportValue = apps.get_model("mapping", "ScanReportValue")
+    ReusableConcept = apps.get_model("mapping", "ReusableConcept")
+
+    # Content types are created after migrating, so a new database has none
+    value_type = ContentType.objects.filter(
+        app_label="mapping", model="scanreportvalue"
+    ).first()
+    if value_type is not None:
+        for batch in _concept_batches(ScanReportConcept, value_type):
+            values = ScanReportValue.objects.filter(
+                id__in=[object_id for _, _, object_id in batch],
+                scan_report_field__scan_report_table__scan_report__hidden=False,
+                scan_report_field__scan_report_table__scan_report__mapping_status__value="COMPLETE",
+            ).values_list(
+                "id",
+                "value",
+                "value_description",
+                "scan_report_field_id",
+                "scan_report_field__name",
+                "scan_report_field__scan_report_table__scan_report_id",
+            )
+            values = {value[0]: value[1:] for value in values}
+            ReusableConcept.objects.bulk_create(
+                ReusableConcept(
+                    scan_report_concept_id=scan_report_concept_id,
+                    scan_report_id=values[object_id][4],
+                    scan_report_field_id=values[object_id][2],
+                    content_type=value_type,
+                    object_id=object_id,
+                    concept_id=concept_id,
+                    name=values[object_id][0],
+                    value_description=values[object_id][1],
+                    field_name=values[object_id][3],
+                )
+                for scan_report_concept_id, concept_id, object_id in batch
+                if object_id in values
+            )
+
+    field_type = ContentType.objects.filter(
+        app_label="mapping", model="scanreportfield"
+    ).first()
+    if field_type is not None:
+        for batch in _concept_batches(ScanReportConcept, field_type):
+            fields = ScanReportField.objects.filter(
+                id__in=[object_id for _, _, object_id in batch],
+                scan_report_table__scan_report__hidden=False,
+                scan_report_table__scan_report__parent_dataset__hidden=False,
+                scan_report_table__scan_report__mapping_status__value="COMPLETE",
+            ).values_list("id", "name", "scan_report_table__scan_report_id")
+            fields = {field[0]: field[1:] for field in fields}
+            ReusableConcept.objects.bulk_create(
+                ReusableConcept(
+                    scan_report_concept_id=scan_report_concept_id,
+                    scan_report_id=fields[object_id][1],
+                    scan_report_field_id=object_id,
+                    content_type=field_type,
+                    object_id=object_id,
+                    concept_id=concept_id,
+                    name=fields[object_id][0],
+                    value_description=None,
+                    field_name=fields[object_id][0],
+                )
+                for scan_report_concept_id, concept_id, object_id in batch
+                if object_id in fields
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("contenttypes", "0002_remove_content_type_name"),
+        ("mapping", "0007_standardconceptmap"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ReusableConcept",
+            fields=[
+                (
+                    "id",
+                    models.AutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("object_id", models.PositiveIntegerField()),
+                ("concept_id", models.IntegerField()),
+                ("name", models.CharField(max_length=512)),
+                (
+                    "value_description",
+                    models.CharField(blank=True, max_length=512, null=True),
+                ),
+                ("field_name", models.CharField(max_length=512)),
+                (
+                    "content_type",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="contenttypes.contenttype",
+                    ),
+                ),
+                (
+                    "scan_report",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="mapping.scanreport",
+                    ),
+                ),
+                (
+                    "scan_report_concept",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="mapping.scanreportconcept",
+                    ),
+                ),
+                (
+                    "scan_report_field",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="mapping.scanreportfield",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["content_type", "name", "field_name"],
+                        name="reusableconcept_lookup",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(backfill_reusable_concepts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def delete_duplicate_rules(apps, schema_editor):
+    MappingRule = apps.get_model("mapping", "MappingRule")
+    fields = ["scan_report", "omop_field", "source_field", "concept"]
+    duplicates = (
+        MappingRule.objects.filter(source_field__isnull=False)
+        .values(*fields)
+        .annotate(count=Count("id"), keep=Min("id"))
+        .filter(count__gt=1)
+    )
+    for duplicate in duplicates.iterator():
+        MappingRule.objects.filter(
+            **{field: duplicate[field] for field in fields}
+        ).exclude(id=duplicate["keep"]).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("mapping", "0008_reusableconcept"),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_duplicate_rules, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="mappingrule",
+            constraint=models.UniqueConstraint(
+                fields=("scan_report", "omop_field", "source_field", "concept"),
+                name="mappingrule_unique",
+            ),
+        ),
+    ]
@@ -1,3 +1,5 @@
+from typing import Any, Tuple
+
 from django.conf import settings
 from django.contrib.contenttypes.fields import GenericForeignKey, GenericRelation
 from django.contrib.contenttypes.models import ContentType
@@ -40,6 +42,30 @@ class BaseModel(models.Model):
         abstract = True
 
 
+class ReuseStateMixin:
+    """
+    Remembers the fields that Reusable Concepts depend on when an object is loaded
+    from the database, so they're only refreshed when those fields change.
+
+    Attributes:
+        reuse_fields (Tuple[str, ...]): The fields that Reusable Concepts depend on.
+    """
+
+    reuse_fields: Tuple[str, ...] = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._reuse_state = instance.get_reuse_state()
+        return instance
+
+    def get_reuse_state(self) -> Tuple[Any, ...]:
+        # Read from the loaded fields, so deferred fields aren't fetched
+        return tuple(
+            self.__dict__.get(field, models.DEFERRED) for field in self.reuse_fields
+        )
+
+
 class UploadStatus(models.Model):
     value = models.CharField(max_length=64)
     display_name = models.CharField(max_length=64)
@@ -158,11 +184,13 @@ class ScanReportConcept(BaseModel):
         return str(self.id)
 
 
-class ScanReport(BaseModel):
+class ScanReport(ReuseStateMixin, BaseModel):
     """
     Model for a Scan Report.
     """
 
+    reuse_fields = ("mapping_status_id", "hidden", "parent_dataset_id")
+
     author = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
@@ -256,6 +284,9 @@ class ScanReportTable(BaseModel):
         blank=True,
         related_name="date_event",
     )
+    # Set once the fields and values of the table have been uploaded, so an
+    # interrupted upload can resume from the tables that weren't.
+    upload_complete = models.BooleanField(default=False)
 
     class Meta:
         app_label = "mapping"
@@ -264,11 +295,13 @@ class ScanReportTable(BaseModel):
         return str(self.id)
 
 
-class ScanReportField(BaseModel):
+class ScanReportField(ReuseStateMixin, BaseModel):
     """
     Model for a Scan Report Field.
     """
 
+    reuse_fields = ("name",)
+
     scan_report_table = models.ForeignKey(ScanReportTable, on_delete=models.CASCADE)
     name = models.CharField(max_length=512)
     description_column = models.CharField(max_length=512)
@@ -341,16 +374,24 @@ class MappingRule(BaseModel):
 
     class Meta:
         app_label = "mapping"
+        constraints = [
+            UniqueConstraint(
+                fields=["scan_report", "omop_field", "source_field", "concept"],
+                name="mappingrule_unique",
+            )
+        ]
 
     def __str__(self):
         return str(self.id)
 
 
-class ScanReportValue(BaseModel):
+class ScanReportValue(ReuseStateMixin, BaseModel):
     """
     Model for a Scan Report Value.
     """
 
+    reuse_fields = ("value", "value_description")
+
     scan_report_field = models.ForeignKey(ScanReportField, on_delete=models.CASCADE)
     value = models.CharField(max_length=128)
     frequency = models.IntegerField()
@@ -365,6 +406,50 @@ class ScanReportValue(BaseModel):
         return str(self.id)
 
 
+class ReusableConcept(models.Model):
+    """
+    A Scan Report Concept on a field or value of an active Scan Report, denormalised
+    with the details it's reused on, so reusable concepts can be found with a single
+    indexed query.
+
+    Kept up to date as Scan Reports, Datasets, Scan Report Fields, Scan Report Values
+    and Scan Report Concepts change, and rebuilt in full with the
+    `rebuild_reusable_concepts` command.
+    """
+
+    scan_report_concept = models.OneToOneField(
+        ScanReportConcept, on_delete=models.CASCADE, related_name="+"
+    )
+    scan_report = models.ForeignKey(
+        ScanReport, on_delete=models.CASCADE, related_name="+"
+    )
+    # The field, or the field of the value, the concept is on.
+    scan_report_field = models.ForeignKey(
+        ScanReportField, on_delete=models.CASCADE, related_name="+"
+    )
+    content_type = models.ForeignKey(
+        ContentType, on_delete=models.CASCADE, related_name="+"
+    )
+    object_id = models.PositiveIntegerField()
+    concept_id = models.IntegerField()
+    # The value, or the name of the field.
+    name = models.CharField(max_length=512)
+    value_description = models.CharField(max_length=512, blank=True, null=True)
+    field_name = models.CharField(max_length=512)
+
+    class Meta:
+        app_label = "mapping"
+        indexes = [
+            models.Index(
+                fields=["content_type", "name", "field_name"],
+                name="reusableconcept_lookup",
+            )
+        ]
+
+    def __str__(self):
+        return str(self.id)
+
+
 class DataDictionary(BaseModel):
     """
     Model for a Data Dictionary file.
@@ -395,11 +480,53 @@ class NLPModel(models.Model):
         return str(self.id)
 
 
-class Dataset(BaseModel):
+class StandardConceptMap(models.Model):
+    """
+    A standard concept that a concept maps to, through a "Maps to" relationship in the
+    OMOP vocabularies. Built by the `build_standard_concept_maps` command once per
+    vocabulary release, so the standard concepts of many concepts can be found with
+    a single indexed query.
+    """
+
+    source_concept_id = models.IntegerField()
+    standard_concept_id = models.IntegerField()
+
+    class Meta:
+        app_label = "mapping"
+        constraints = [
+            UniqueConstraint(
+                fields=["source_concept_id", "standard_concept_id"],
+                name="standardconceptmap_unique",
+            )
+        ]
+
+    def __str__(self):
+        return str(self.id)
+
+
+class StandardConceptMapVersion(models.Model):
+    """
+    The release of the OMOP vocabularies that the Standard Concept Maps were built
+    from, so maps from an earlier release aren't used.
+    """
+
+    version = models.CharField(max_length=255)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        app_label = "mapping"
+
+    def __str__(self):
+        return str(self.id)
+
+
+class Dataset(ReuseStateMixin, BaseModel):
     """
     Model for datasets which contain scan reports.
     """
 
+    reuse_fields = ("hidden",)
+
     name = models.CharField(max_length=100, unique=True)
     data_partner = models.ForeignKey(
         DataPartner,
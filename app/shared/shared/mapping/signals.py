@@ -0,0 +1,109 @@
+from functools import partial
+from typing import Type
+
+from django.db import transaction
+from django.db.models import Model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from shared.mapping.models import (
+    Dataset,
+    OmopField,
+    OmopTable,
+    ReuseStateMixin,
+    ScanReport,
+    ScanReportConcept,
+    ScanReportField,
+    ScanReportValue,
+)
+from shared.services.omop_registry import clear_omop_registry
+from shared.services.reusable_concepts import refresh_reusable_concepts
+
+
+@receiver(post_save, sender=ScanReport)
+@receiver(post_save, sender=Dataset)
+@receiver(post_save, sender=ScanReportField)
+@receiver(post_save, sender=ScanReportValue)
+def refresh_changed_reusable_concepts(
+    sender: Type[Model], instance: ReuseStateMixin, created: bool, raw: bool, **kwargs
+):
+    """
+    Refreshes the Reusable Concepts of an object when the fields they depend on have
+    changed, once the change is committed. New objects don't have concepts yet, so
+    are skipped. Objects that weren't loaded from the database are assumed changed.
+
+    Args:
+        sender: The sender of the signal.
+        instance: The object saved.
+        created: Whether the object was created.
+        raw: Whether the object was loaded from a fixture.
+
+    Returns:
+        None
+    """
+    state = instance.get_reuse_state()
+    changed = state != getattr(instance, "_reuse_state", None)
+    instance._reuse_state = state
+    if created or raw or not changed:
+        return
+
+    if sender is ScanReport:
+        refresh = partial(refresh_reusable_concepts, scan_report_ids=[instance.pk])
+    elif sender is Dataset:
+        refresh = partial(
+            refresh_reusable_concepts,
+            scan_report_ids=ScanReport.objects.filter(
+                parent_dataset_id=instance.pk
+            ).values_list("id", flat=True),
+        )
+    elif sender is ScanReportField:
+        refresh = partial(
+            refresh_reusable_concepts, scan_report_field_ids=[instance.pk]
+        )
+    else:
+        refresh = partial(
+            refresh_reusable_concepts, scan_report_value_ids=[instance.pk]
+        )
+    transaction.on_commit(refresh)
+
+
+@receiver(post_save, sender=ScanReportConcept)
+def add_reusable_concept(
+    sender: Type[Model], instance: ScanReportConcept, created: bool, raw: bool, **kwargs
+):
+    """
+    Adds a Reusable Concept for a new Scan Report Concept, if it's on an active Scan
+    Report. Reusable Concepts of deleted Scan Report Concepts are deleted with them.
+
+    Concepts created with `bulk_create` don't send signals, so whatever creates them
+    refreshes their Reusable Concepts itself.
+
+    Args:
+        sender: The sender of the signal.
+        instance: The Scan Report Concept saved.
+        created: Whether the Scan Report Concept was created.
+        raw: Whether the Scan Report Concept was loaded from a fixture.
+
+    Returns:
+        None
+    """
+    if created and not raw:
+        transaction.on_commit(
+            partial(refresh_reusable_concepts, scan_report_concept_ids=[instance.pk])
+        )
+
+
+@receiver(post_save, sender=OmopTable)
+@receiver(post_save, sender=OmopField)
+@receiver(post_delete, sender=OmopTable)
+@receiver(post_delete, sender=OmopField)
+def clear_changed_omop_registry(sender: Type[Model], **kwargs):
+    """
+    Clears the registry of OMOP tables and fields of this process when one changes.
+
+    Args:
+        sender: The sender of the signal.
+
+    Returns:
+        None
+    """
+    clear_omop_registry()
@@ -14,7 +14,7 @@ from django.contrib.auth.views import PasswordChangeDoneView
 from django.core.exceptions import ObjectDoesNotExist
 from django.core.mail import BadHeaderError, send_mail
 from django.db.models.query_utils import Q
-from django.http import HttpResponse, JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import redirect, render
 from django.template.loader import render_to_string
 from django.urls import reverse, reverse_lazy
@@ -37,8 +37,8 @@ from shared.mapping.models import (
 )
 from shared.services.azurequeue import add_message
 from shared.services.rules_export import (
-    get_mapping_rules_as_csv,
     get_mapping_rules_json,
+    iter_mapping_rules_csv,
     make_dag,
 )
 
@@ -126,9 +126,9 @@ class StructuralMappingTableListView(ListView):
         scan_report = qs[0].scan_report
         return_type = "csv"
         fname = f"{scan_report.parent_dataset.data_partner.name}_{scan_report.dataset}_structural_mapping.{return_type}"
-        _buffer = get_mapping_rules_as_csv(qs)
-
-        response = HttpResponse(_buffer, content_type="text/csv")
+        response = StreamingHttpResponse(
+            iter_mapping_rules_csv(qs), content_type="text/csv"
+        )
         response["Content-Disposition"] = f'attachment; filename="{fname}"'
         return response
 
@@ -0,0 +1,283 @@
+import io
+from dataclasses import dataclass, field
+from datetime import date, datetime, time
+from itertools import repeat
+from typing import Any, Iterable, Iterator, List, Optional, Sequence, Type
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import Model
+from django.utils import timezone
+from shared.mapping.models import ScanReportField, ScanReportValue
+
+# The number of characters handed to COPY at a time.
+COPY_BUFFER_SIZE = 64 * 1024
+
+
+@dataclass
+class ValueColumns:
+    """
+    Scan Report Values to create, held as one list per column.
+    """
+
+    field_ids: List[int] = field(default_factory=list)
+    values: List[str] = field(default_factory=list)
+    frequencies: List[int] = field(default_factory=list)
+    descriptions: List[Optional[str]] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+
+def _csv_field(value: Any) -> str:
+    """
+    Format a value as a field of a CSV row for COPY.
+
+    Strings are always quoted and NULLs are left unquoted and empty, so that an empty
+    string and a NULL can be told apart.
+
+    Args:
+        - value (Any): The value to format, prepared for the database.
+
+    Returns:
+        - str: The formatted field.
+    """
+    if value is None:
+        return ""
+    if isinstance(value, str):
+        return '"' + value.replace('"', '""') + '"'
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    return str(value)
+
+
+class CsvRowStream(io.TextIOBase):
+    """
+    A readable text stream of rows formatted as CSV, read lazily by COPY.
+
+    Args:
+        - rows (Iterable[Sequence[Any]]): The rows to stream.
+    """
+
+    def __init__(self, rows: Iterable[Sequence[Any]]):
+        self._lines: Iterator[str] = (
+            ",".join(map(_csv_field, row)) + "\n" for row in rows
+        )
+        self._buffer = ""
+        self.rows = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def read(self, size: Optional[int] = -1) -> str:
+        chunks = [self._buffer]
+        length = len(self._buffer)
+        if size is None or size < 0 or length < size:
+            for line in self._lines:
+                self.rows += 1
+                chunks.append(line)
+                length += len(line)
+                if size is not None and 0 <= size <= length:
+                    break
+
+        data = "".join(chunks)
+        if size is None or size < 0:
+            self._buffer = ""
+            return data
+        self._buffer = data[size:]
+        return data[:size]
+
+
+def copy_rows(
+    model: Type[Model],
+    columns: Sequence[str],
+    rows: Iterable[Sequence[Any]],
+    using: str = DEFAULT_DB_ALIAS,
+) -> int:
+    """
+    Stream rows into the table of a model with `COPY ... FROM STDIN`.
+
+    Only supported on PostgreSQL. The rows are streamed as they are read, so they can
+    be produced lazily.
+
+    Args:
+        - model (Type[Model]): The model whose table to copy into.
+        - columns (Sequence[str]): The database columns of each row.
+        - rows (Iterable[Sequence[Any]]): The rows to copy, prepared for the database.
+        - using (str): The database alias to copy into.
+
+    Returns:
+        - int: The number of rows copied.
+    """
+    connection = connections[using]
+    quote_name = connection.ops.quote_name
+    sql = "COPY {} ({}) FROM STDIN WITH (FORMAT csv)".format(
+        quote_name(model._meta.db_table),
+        ", ".join(quote_name(column) for column in columns),
+    )
+    stream = CsvRowStream(rows)
+    with connection.cursor() as cursor:
+        cursor.copy_expert(sql, stream, size=COPY_BUFFER_SIZE)
+    return stream.rows
+
+
+def _reserve_ids(model: Type[Model], count: int, using: str) -> List[int]:
+    """
+    Reserve ids from the primary key sequence of a model's table.
+
+    Args:
+        - model (Type[Model]): The model to reserve ids for.
+        - count (int): The number of ids to reserve.
+        - using (str): The database alias to reserve ids in.
+
+    Returns:
+        - List[int]: The reserved ids.
+    """
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            "SELECT nextval(pg_get_serial_sequence(%s, %s)) FROM generate_series(1, %s)",
+            [model._meta.db_table, model._meta.pk.column, count],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _copy_objects(
+    model: Type[Model], objs: List[Model], using: str, with_ids: bool
+) -> List[Model]:
+    """
+    Copy model instances into the database, or bulk create them if COPY isn't
+    supported.
+
+    Args:
+        - model (Type[Model]): The model of the instances.
+        - objs (List[Model]): The instances to copy.
+        - using (str): The database alias to copy into.
+        - with_ids (bool): Whether to set the primary keys of the instances.
+
+    Returns:
+        - List[Model]: The copied instances.
+    """
+    connection = connections[using]
+    if connection.vendor != "postgresql":
+        return model.objects.using(using).bulk_create(objs)
+    if not objs:
+        return objs
+
+    fields = [
+        field
+        for field in model._meta.concrete_fields
+        if with_ids or not field.primary_key
+    ]
+    if with_ids:
+        for obj, pk in zip(objs, _reserve_ids(model, len(objs), using)):
+            obj.pk = pk
+
+    rows = (
+        [
+            field.get_db_prep_save(field.pre_save(obj, True), connection)
+            for field in fields
+        ]
+        for obj in objs
+    )
+    copy_rows(model, [field.column for field in fields], rows, using)
+    for obj in objs:
+        obj._state.adding = False
+        obj._state.db = using
+    return objs
+
+
+def bulk_load_fields(
+    fields: List[ScanReportField], using: str = DEFAULT_DB_ALIAS
+) -> List[ScanReportField]:
+    """
+    Create Scan Report Fields with COPY, setting their ids.
+
+    Falls back to `bulk_create` on databases other than PostgreSQL.
+
+    Args:
+        - fields (List[ScanReportField]): The fields to create.
+        - using (str): The database alias to create them in.
+
+    Returns:
+        - List[ScanReportField]: The created fields.
+    """
+    return _copy_objects(ScanReportField, fields, using, with_ids=True)
+
+
+def bulk_load_values(
+    values: List[ScanReportValue], using: str = DEFAULT_DB_ALIAS
+) -> List[ScanReportValue]:
+    """
+    Create Scan Report Values with COPY. Their ids are not set.
+
+    Falls back to `bulk_create` on databases other than PostgreSQL.
+
+    Args:
+        - values (List[ScanReportValue]): The values to create.
+        - using (str): The database alias to create them in.
+
+    Returns:
+        - List[ScanReportValue]: The created values.
+    """
+    return _copy_objects(ScanReportValue, values, using, with_ids=False)
+
+
+def bulk_load_value_columns(
+    columns: ValueColumns, using: str = DEFAULT_DB_ALIAS
+) -> int:
+    """
+    Create Scan Report Values from columns with COPY, without building model
+    instances.
+
+    Falls back to `bulk_create` on databases other than PostgreSQL.
+
+    Args:
+        - columns (ValueColumns): The values to create.
+        - using (str): The database alias to create them in.
+
+    Returns:
+        - int: The number of values created.
+    """
+    if connections[using].vendor != "postgresql":
+        ScanReportValue.objects.using(using).bulk_create(
+            ScanReportValue(
+                scan_report_field_id=field_id,
+                value=value,
+                frequency=frequency,
+                value_description=description,
+            )
+            for field_id, value, frequency, description in zip(
+                columns.field_ids,
+                columns.values,
+                columns.frequencies,
+                columns.descriptions,
+            )
+        )
+        return len(columns)
+
+    now = timezone.now()
+    names = [
+        "scan_report_field",
+        "value",
+        "frequency",
+        "value_description",
+        "conceptID",
+        "created_at",
+        "updated_at",
+    ]
+    rows = zip(
+        columns.field_ids,
+        columns.values,
+        columns.frequencies,
+        columns.descriptions,
+        repeat(ScanReportValue._meta.get_field("conceptID").default),
+        repeat(now),
+        repeat(now),
+    )
+    return copy_rows(
+        ScanReportValue,
+        [ScanReportValue._meta.get_field(name).column for name in names],
+        rows,
+        using,
+    )
@@ -0,0 +1,153 @@
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Iterable, List, Literal, Optional, Tuple
+
+from django.db import connections, transaction
+from django.db.models import Field, QuerySet
+from django.db.models.expressions import RawSQL
+from shared.services.bulk_load import COPY_BUFFER_SIZE, CsvRowStream
+
+Strategy = Literal["in", "temp_table"]
+
+# The most values to send in a single IN list, and the size of each chunk of values
+# when chunking. Beyond this, on PostgreSQL, the values are copied into a temporary
+# table and joined.
+IN_CHUNK_SIZE = 5000
+
+
+@dataclass
+class LookupResult:
+    """
+    The rows found by `lookup_in`, and how they were found.
+    """
+
+    strategy: Strategy
+    rows: List[Any] = field(default_factory=list)
+    queries: int = 0
+    seconds: float = 0.0
+
+
+class _QueryCounter:
+    """
+    Counts the queries run on a connection, as an execute wrapper.
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def choose_strategy(count: int, using: str) -> Strategy:
+    """
+    Chooses how to look up a number of values.
+
+    A single IN list is used for few values, and on databases other than PostgreSQL,
+    where the values are sent in chunks. Otherwise the values are copied into a
+    temporary table, which keeps the query small to plan.
+
+    Args:
+        - count (int): The number of values to look up.
+        - using (str): The database alias to look them up in.
+
+    Returns:
+        - Strategy: The strategy to use.
+    """
+    if count <= IN_CHUNK_SIZE or connections[using].vendor != "postgresql":
+        return "in"
+    return "temp_table"
+
+
+def lookup_in(
+    queryset: QuerySet,
+    field_name: str,
+    values: Iterable[Any],
+    strategy: Optional[Strategy] = None,
+) -> LookupResult:
+    """
+    Gets the rows of a queryset whose field is any of the values, like filtering by
+    `<field_name>__in`, but without building an IN list of unbounded size.
+
+    Args:
+        - queryset (QuerySet): The queryset to filter, which may select values.
+        - field_name (str): The field of the queryset's model to match.
+        - values (Iterable[Any]): The values to match. Duplicates are looked up once.
+        - strategy (Optional[Strategy]): How to look up the values, chosen by
+            `choose_strategy` if not given.
+
+    Returns:
+        - LookupResult: The rows found, the strategy used, and the number of queries
+            and seconds taken.
+    """
+    using = queryset.db
+    connection = connections[using]
+    model_field: Field = queryset.model._meta.get_field(field_name)
+    prepared = list(
+        {model_field.get_db_prep_value(value, connection) for value in values}
+    )
+    result = LookupResult(strategy or choose_strategy(len(prepared), using))
+    if not prepared:
+        return result
+
+    start = time.perf_counter()
+    if result.strategy == "in":
+        for i in range(0, len(prepared), IN_CHUNK_SIZE):
+            result.rows.extend(
+                queryset.filter(
+                    **{f"{field_name}__in": prepared[i : i + IN_CHUNK_SIZE]}
+                )
+            )
+            result.queries += 1
+    else:
+        result.rows, result.queries = _lookup_with_temp_table(
+            queryset, field_name, model_field, prepared
+        )
+    result.seconds = time.perf_counter() - start
+    return result
+
+
+def _lookup_with_temp_table(
+    queryset: QuerySet, field_name: str, model_field: Field, values: List[Any]
+) -> Tuple[List[Any], int]:
+    """
+    Copies the values into a temporary table, then gets the rows of the queryset
+    whose field is in it. PostgreSQL only.
+
+    Args:
+        - queryset (QuerySet): The queryset to filter.
+        - field_name (str): The field of the queryset's model to match.
+        - model_field (Field): The model field to match.
+        - values (List[Any]): The values to match, prepared for the database.
+
+    Returns:
+        - Tuple[List[Any], int]: The rows found, and the number of queries taken.
+    """
+    using = queryset.db
+    connection = connections[using]
+    table = connection.ops.quote_name(f"lookup_{uuid.uuid4().hex}")
+    target_field = model_field.target_field if model_field.is_relation else model_field
+    counter = _QueryCounter()
+    with connection.execute_wrapper(counter), transaction.atomic(using=using):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE TEMPORARY TABLE {table} "
+                f"(value {target_field.rel_db_type(connection)}) ON COMMIT DROP"
+            )
+            cursor.copy_expert(
+                f"COPY {table} (value) FROM STDIN WITH (FORMAT csv)",
+                CsvRowStream([value] for value in values),
+                size=COPY_BUFFER_SIZE,
+            )
+            # COPY is run by the driver directly, so isn't counted by the wrapper.
+            counter.count += 1
+            # Without statistics, the planner guesses the table is small.
+            cursor.execute(f"ANALYZE {table}")
+        rows = list(
+            queryset.filter(
+                **{f"{field_name}__in": RawSQL(f"SELECT value FROM {table}", [])}
+            )
+        )
+    return rows, counter.count
@@ -0,0 +1,183 @@
+from collections import defaultdict
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from shared.mapping.models import OmopField
+
+# allowed tables
+m_allowed_tables = [
+    "person",
+    "measurement",
+    "condition_occurrence",
+    "observation",
+    "drug_exposure",
+    "procedure_occurrence",
+    "specimen",
+    "device_exposure",
+]
+
+# look up of date-events in all the allowed (destination) tables
+m_date_field_mapper = {
+    "person": ["birth_datetime"],
+    "condition_occurrence": ["condition_start_datetime", "condition_end_datetime"],
+    "measurement": ["measurement_datetime"],
+    "observation": ["observation_datetime"],
+    "drug_exposure": ["drug_exposure_start_datetime", "drug_exposure_end_datetime"],
+    "procedure_occurrence": ["procedure_datetime"],
+    "specimen": ["specimen_datetime"],
+    "device_exposure": [
+        "device_exposure_start_datetime",
+        "device_exposure_end_datetime",
+    ],
+}
+
+# The registry loaded by this process
+_registry: Optional["OmopRegistry"] = None
+
+
+class OmopRegistry:
+    """
+    The OMOP tables and fields, indexed to look them up without a query.
+
+    The tables and fields are shared, so must not be modified.
+
+    Args:
+        - omop_fields (Iterable[OmopField]): The OMOP fields, with their tables, in id
+            order.
+    """
+
+    def __init__(self, omop_fields: Iterable[OmopField]):
+        self.fields: Dict[int, OmopField] = {}
+        self._by_table: Dict[Tuple[str, str], OmopField] = {}
+        self._by_name: Dict[str, List[OmopField]] = defaultdict(list)
+        for omop_field in omop_fields:
+            self.fields[omop_field.id] = omop_field
+            self._by_table.setdefault(
+                (omop_field.table.table, omop_field.field), omop_field
+            )
+            self._by_name[omop_field.field].append(omop_field)
+
+    def get_field(
+        self, destination_field: str, destination_table: Optional[str] = None
+    ) -> Optional[OmopField]:
+        """
+        Get the destination_field object, given a field name, and/or the table.
+
+        A field in several tables is looked up in the allowed tables.
+
+        Args:
+          - destination_field (str) : the name of the destination field
+          - [optional] destination_table (str) : the name of destination table, if
+            known
+
+        Returns:
+          - Optional[OmopField] : the destination field object, or None if there
+            isn't one
+        """
+        if destination_table is not None:
+            return self._by_table.get((destination_table, destination_field))
+
+        omop_fields = self._by_name.get(destination_field, [])
+        if len(omop_fields) > 1:
+            return next(
+                (
+                    omop_field
+                    for omop_field in omop_fields
+                    if omop_field.table.table in m_allowed_tables
+                ),
+                None,
+            )
+        return omop_fields[0] if omop_fields else None
+
+    def get_domain_field(self, domain: str) -> Optional[OmopField]:
+        """
+        Get the field the concepts of a domain are mapped to, in an allowed table.
+
+        Args:
+            - domain (str): The domain of the concepts, in lower case.
+
+        Returns:
+            - Optional[OmopField]: The field, or None if the domain can't be mapped.
+        """
+        # if the domain is "meas value" then point directly to its field and table
+        if domain == "meas value":
+            omop_field = self.get_field("value_as_concept_id", "measurement")
+        else:
+            omop_field = self.get_field(f"{domain}_source_concept_id")
+
+        if omop_field is None or omop_field.table.table not in m_allowed_tables:
+            return None
+        return omop_field
+
+    def get_domains(self) -> List[str]:
+        """
+        Get the domains whose concepts could be mapped, in lower case: those with a
+        "_source_concept_id" field, and "meas value".
+
+        Returns:
+            - List[str]: The domains.
+        """
+        suffix = "_source_concept_id"
+        return sorted(
+            {"meas value"}
+            | {name[: -len(suffix)] for name in self._by_name if name.endswith(suffix)}
+        )
+
+    def get_date_fields(self, destination_table: str) -> List[Optional[OmopField]]:
+        """
+        Get the date event fields of an allowed table.
+
+        Args:
+            - destination_table (str): The name of the table.
+
+        Returns:
+            - List[Optional[OmopField]]: The date fields, with None for any missing.
+        """
+        return [
+            self.get_field(date_field, destination_table)
+            for date_field in m_date_field_mapper[destination_table]
+        ]
+
+    def get_concept_field_ids(self) -> FrozenSet[int]:
+        """
+        Get the ids of the fields that hold standard concepts: those ending in
+        "_concept_id", but not "_source_concept_id" or "value_as_concept_id".
+
+        Returns:
+            - FrozenSet[int]: The ids of the fields.
+        """
+        return frozenset(
+            omop_field.id
+            for omop_field in self.fields.values()
+            if omop_field.field.endswith("_concept_id")
+            and not omop_field.field.endswith("_source_concept_id")
+            and not omop_field.field.endswith("value_as_concept_id")
+        )
+
+
+def get_omop_registry() -> OmopRegistry:
+    """
+    Gets the registry of OMOP tables and fields, loaded once per process with a
+    single query. Saving or deleting a table or field clears it.
+
+    Returns:
+        - OmopRegistry: The registry.
+    """
+    global _registry
+
+    registry = _registry
+    if registry is None:
+        registry = OmopRegistry(
+            OmopField.objects.select_related("table").order_by("id")
+        )
+        _registry = registry
+    return registry
+
+
+def clear_omop_registry() -> None:
+    """
+    Clears the registry of OMOP tables and fields, so it's loaded again when next
+    used.
+    """
+    global _registry
+
+    _registry = None
@@ -0,0 +1,165 @@
+from itertools import chain
+from typing import Iterable, Iterator, Optional
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import QuerySet
+from shared.mapping.models import ReusableConcept, ScanReportField, ScanReportValue
+
+# The number of Reusable Concepts to create in one query
+BATCH_SIZE = 5000
+
+# Concepts are reused from values of Scan Reports that are visible and mapped...
+ACTIVE_VALUE_FILTER = {
+    "scan_report_field__scan_report_table__scan_report__hidden": False,
+    "scan_report_field__scan_report_table__scan_report__mapping_status__value": "COMPLETE",
+}
+# ...and from fields of those Scan Reports that are also in a visible Dataset.
+ACTIVE_FIELD_FILTER = {
+    "scan_report_table__scan_report__hidden": False,
+    "scan_report_table__scan_report__parent_dataset__hidden": False,
+    "scan_report_table__scan_report__mapping_status__value": "COMPLETE",
+}
+
+
+def refresh_reusable_concepts(
+    scan_report_ids: Optional[Iterable[int]] = None,
+    scan_report_field_ids: Optional[Iterable[int]] = None,
+    scan_report_value_ids: Optional[Iterable[int]] = None,
+    scan_report_concept_ids: Optional[Iterable[int]] = None,
+) -> int:
+    """
+    Replaces the Reusable Concepts of some Scan Reports, Scan Report Fields, Scan
+    Report Values or Scan Report Concepts with their current concepts, if they're
+    active. With none given, rebuilds every Reusable Concept.
+
+    Args:
+        - scan_report_ids (Optional[Iterable[int]]): The Scan Reports to refresh.
+        - scan_report_field_ids (Optional[Iterable[int]]): The Scan Report Fields to
+            refresh, with their values.
+        - scan_report_value_ids (Optional[Iterable[int]]): The Scan Report Values to
+            refresh.
+        - scan_report_concept_ids (Optional[Iterable[int]]): The Scan Report Concepts
+            to refresh.
+
+    Returns:
+        - int: The number of Reusable Concepts created.
+    """
+    value_content_type = ContentType.objects.get_for_model(ScanReportValue)
+    field_content_type = ContentType.objects.get_for_model(ScanReportField)
+
+    stale = ReusableConcept.objects.all()
+    values = ScanReportValue.objects.filter(**ACTIVE_VALUE_FILTER)
+    fields = ScanReportField.objects.filter(**ACTIVE_FIELD_FILTER)
+    if scan_report_ids is not None:
+        scan_report_ids = list(scan_report_ids)
+        stale = stale.filter(scan_report_id__in=scan_report_ids)
+        values = values.filter(
+            scan_report_field__scan_report_table__scan_report_id__in=scan_report_ids
+        )
+        fields = fields.filter(scan_report_table__scan_report_id__in=scan_report_ids)
+    if scan_report_field_ids is not None:
+        scan_report_field_ids = list(scan_report_field_ids)
+        stale = stale.filter(scan_report_field_id__in=scan_report_field_ids)
+        values = values.filter(scan_report_field_id__in=scan_report_field_ids)
+        fields = fields.filter(id__in=scan_report_field_ids)
+    if scan_report_value_ids is not None:
+        scan_report_value_ids = list(scan_report_value_ids)
+        stale = stale.filter(
+            content_type=value_content_type, object_id__in=scan_report_value_ids
+        )
+        values = values.filter(id__in=scan_report_value_ids)
+        fields = fields.none()
+    # Concepts are filtered once, so the concepts selected are the ones filtered.
+    if scan_report_concept_ids is not None:
+        scan_report_concept_ids = list(scan_report_concept_ids)
+        stale = stale.filter(scan_report_concept_id__in=scan_report_concept_ids)
+        values = values.filter(concepts__id__in=scan_report_concept_ids)
+        fields = fields.filter(concepts__id__in=scan_report_concept_ids)
+    else:
+        values = values.filter(concepts__isnull=False)
+        fields = fields.filter(concepts__isnull=False)
+
+    reusable_concepts = chain(
+        _value_concepts(values, value_content_type),
+        _field_concepts(fields, field_content_type),
+    )
+    created = 0
+    with transaction.atomic():
+        stale.delete()
+        batch = []
+        for reusable_concept in reusable_concepts:
+            batch.append(reusable_concept)
+            if len(batch) == BATCH_SIZE:
+                created += len(ReusableConcept.objects.bulk_create(batch))
+                batch = []
+        created += len(ReusableConcept.objects.bulk_create(batch))
+    return created
+
+
+def _value_concepts(
+    values: QuerySet[ScanReportValue], content_type: ContentType
+) -> Iterator[ReusableConcept]:
+    for (
+        scan_report_concept_id,
+        concept_id,
+        value_id,
+        value,
+        value_description,
+        field_id,
+        field_name,
+        scan_report_id,
+    ) in values.values_list(
+        "concepts__id",
+        "concepts__concept_id",
+        "id",
+        "value",
+        "value_description",
+        "scan_report_field_id",
+        "scan_report_field__name",
+        "scan_report_field__scan_report_table__scan_report_id",
+    ).iterator(
+        chunk_size=BATCH_SIZE
+    ):
+        yield ReusableConcept(
+            scan_report_concept_id=scan_report_concept_id,
+            scan_report_id=scan_report_id,
+            scan_report_field_id=field_id,
+            content_type=content_type,
+            object_id=value_id,
+            concept_id=concept_id,
+            name=value,
+            value_description=value_description,
+            field_name=field_name,
+        )
+
+
+def _field_concepts(
+    fields: QuerySet[ScanReportField], content_type: ContentType
+) -> Iterator[ReusableConcept]:
+    for (
+        scan_report_concept_id,
+        concept_id,
+        field_id,
+        field_name,
+        scan_report_id,
+    ) in fields.values_list(
+        "concepts__id",
+        "concepts__concept_id",
+        "id",
+        "name",
+        "scan_report_table__scan_report_id",
+    ).iterator(
+        chunk_size=BATCH_SIZE
+    ):
+        yield ReusableConcept(
+            scan_report_concept_id=scan_report_concept_id,
+            scan_report_id=scan_report_id,
+            scan_report_field_id=field_id,
+            content_type=content_type,
+            object_id=field_id,
+            concept_id=concept_id,
+            name=field_name,
+            value_description=None,
+            field_name=field_name,
+        )
@@ -1,43 +1,40 @@
-from typing import List, Optional
-
+from typing import List, Literal, Optional, Tuple, cast
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from django.db.models import F, Max, Q, QuerySet, Window, prefetch_related_objects
+from django.db.models.constants import OnConflict
+from django.db.models.functions import RowNumber
+from django.utils import timezone
 from shared.data.models import Concept
 from shared.mapping.models import (
     MappingRule,
     OmopField,
     OmopTable,
-    ScanReport,
     ScanReportConcept,
     ScanReportField,
     ScanReportTable,
     ScanReportValue,
 )
+from shared.services.omop_registry import (
+    OmopRegistry,
+    get_omop_registry,
+    m_date_field_mapper,
+)
+
+# The number of Mapping Rules to create in one query
+RULE_BATCH_SIZE = 5000
 
-# allowed tables
-m_allowed_tables = [
-    "person",
-    "measurement",
-    "condition_occurrence",
-    "observation",
-    "drug_exposure",
-    "procedure_occurrence",
-    "specimen",
-    "device_exposure",
-]
-
-# look up of date-events in all the allowed (destination) tables
-m_date_field_mapper = {
-    "person": ["birth_datetime"],
-    "condition_occurrence": ["condition_start_datetime", "condition_end_datetime"],
-    "measurement": ["measurement_datetime"],
-    "observation": ["observation_datetime"],
-    "drug_exposure": ["drug_exposure_start_datetime", "drug_exposure_end_datetime"],
-    "procedure_occurrence": ["procedure_datetime"],
-    "specimen": ["specimen_datetime"],
-    "device_exposure": [
-        "device_exposure_start_datetime",
-        "device_exposure_end_datetime",
-    ],
-}
+RulesBackend = Literal["python", "sql"]
+# Where the source field of a rule comes from: the table's person id or date event,
+# or the field the concept is on.
+RuleSource = Literal["person_id", "date_event", "source_field"]
+
+# The data types of source fields that observations add value rules for
+NUMBER_TYPES = ("int", "real", "float")
+STRING_TYPES = ("varchar", "nvarchar")
+# A data type of each class of source field that has the same rules
+TYPE_CLASSES = [("number", "int"), ("string", "varchar"), ("other", "")]
 
 
 def delete_mapping_rules(table_id: int) -> None:
@@ -55,83 +52,144 @@ def delete_mapping_rules(table_id: int) -> None:
     rules.delete()
 
 
-def _find_existing_concepts(
-    table_id: int, page: int | None, page_size: int | None
-) -> List[ScanReportConcept]:
+def update_person_id_and_date_rules(
+    table: ScanReportTable,
+    previous_person_id_id: Optional[int],
+    previous_date_event_id: Optional[int],
+) -> int:
     """
-    Get ScanReportConcepts associated to a table.
+    Update the mapping rules of a table after its person_id or date_event change.
+
+    Only the person_id and date event rules depend on them, so these are pointed at
+    the new source fields in place, with one update for each. If the table no longer
+    has both set, its rules are deleted, as no rules are made for it.
+
+    The table must have had both set before, so its rules were generated.
 
     Args:
-        - table_id (int): Id of the ScanReportTable to filter by.
-        - page (int | None): Page to get
-        - page_size (int | None): Page size to get
+        - table (ScanReportTable): The table, with its new person_id and date_event.
+        - previous_person_id_id (Optional[int]): The id of the previous person_id
+            field.
+        - previous_date_event_id (Optional[int]): The id of the previous date_event
+            field.
 
     Returns:
-        - A list of ScanReportConcept attached to the Table Id.
+        - int: The number of rules updated.
     """
-    if page is not None and page_size is not None:
-        offset = page * page_size
-        limit = offset + page_size
-    else:
-        offset = None
-        limit = None
+    if table.person_id_id is None or table.date_event_id is None:
+        delete_mapping_rules(table.id)
+        return 0
+
+    registry = get_omop_registry()
+    date_fields = {
+        date_field
+        for date_fields in m_date_field_mapper.values()
+        for date_field in date_fields
+    }
+    person_id_omop_field_ids = [
+        omop_field.id
+        for omop_field in registry.fields.values()
+        if omop_field.field == "person_id"
+    ]
+    date_omop_field_ids = [
+        omop_field.id
+        for omop_field in registry.fields.values()
+        if omop_field.field in date_fields
+    ]
+
+    updated = 0
+    now = timezone.now()
+    for previous_id, new_id, omop_field_ids in (
+        (previous_person_id_id, table.person_id_id, person_id_omop_field_ids),
+        (previous_date_event_id, table.date_event_id, date_omop_field_ids),
+    ):
+        if previous_id == new_id:
+            continue
+        # The previous field is in this table, so only its rules point at it.
+        updated += MappingRule.objects.filter(
+            source_field_id=previous_id, omop_field_id__in=omop_field_ids
+        ).update(source_field_id=new_id, updated_at=now)
+    return updated
 
-    values = (
-        ScanReportValue.objects.all()
-        .filter(scan_report_field__scan_report_table=table_id, concepts__isnull=False)
-        .distinct()
-        .order_by("id")
-    )
 
-    # find ScanReportField associated to this table_id
-    # that have at least one concept added to them
-    fields = (
-        ScanReportField.objects.all()
-        .filter(scan_report_table=table_id, concepts__isnull=False)
-        .distinct()
-        .order_by("id")
-    )
+def _table_concepts(table_id: int) -> QuerySet[ScanReportConcept]:
+    """
+    Get the ScanReportConcepts on the fields and values of a table.
 
-    if offset is not None and limit is not None:
-        values = values[offset:limit]
-        fields = fields[offset:limit]
+    Args:
+        - table_id (int): Id of the ScanReportTable to filter by.
 
-    # retrieve all value concepts
-    all_concepts = [concept for obj in values for concept in obj.concepts.all()]
-    # retrieve all field concepts
-    all_concepts += [concept for obj in fields for concept in obj.concepts.all()]
-    return all_concepts
+    Returns:
+        - QuerySet[ScanReportConcept]: The ScanReportConcepts of the table.
+    """
+    value_ids = ScanReportValue.objects.filter(
+        scan_report_field__scan_report_table=table_id
+    ).values("id")
+    field_ids = ScanReportField.objects.filter(scan_report_table=table_id).values("id")
+    return ScanReportConcept.objects.filter(
+        Q(
+            content_type=ContentType.objects.get_for_model(ScanReportValue),
+            object_id__in=value_ids,
+        )
+        | Q(
+            content_type=ContentType.objects.get_for_model(ScanReportField),
+            object_id__in=field_ids,
+        )
+    )
 
 
-def find_existing_concepts_count(table_id: int) -> int:
+def _find_existing_concepts(
+    table_id: int, first_id: Optional[int] = None, last_id: Optional[int] = None
+) -> List[ScanReportConcept]:
     """
-    Get the count of ScanReportConcepts associated with a table.
+    Get ScanReportConcepts associated to a table, with a single query.
 
     Args:
         - table_id (int): Id of the ScanReportTable to filter by.
+        - first_id (Optional[int]): The first ScanReportConcept id to get.
+        - last_id (Optional[int]): The last ScanReportConcept id to get.
 
     Returns:
-        - The count of ScanReportConcepts attached to the Table Id.
+        - A list of ScanReportConcept attached to the Table Id.
     """
-    # Count the number of ScanReportConcepts associated with the table_id
-    concept_count = (
-        ScanReportValue.objects.filter(
-            scan_report_field__scan_report_table=table_id, concepts__isnull=False
-        )
-        .distinct()
-        .count()
-    )
+    concepts = _table_concepts(table_id)
+    if first_id is not None:
+        concepts = concepts.filter(id__gte=first_id)
+    if last_id is not None:
+        concepts = concepts.filter(id__lte=last_id)
+    return list(concepts.order_by("id"))
 
-    # Count the number of ScanReportConcepts associated with the table_id's fields
-    concept_count += (
-        ScanReportField.objects.filter(
-            scan_report_table=table_id, concepts__isnull=False
+
+def partition_existing_concepts(
+    table_id: int, partition_size: int
+) -> List[Tuple[int, int]]:
+    """
+    Split the ScanReportConcepts associated with a table into contiguous ranges of
+    ids, of up to `partition_size` concepts each, with a single query.
+
+    Args:
+        - table_id (int): Id of the ScanReportTable to filter by.
+        - partition_size (int): The most concepts in a range.
+
+    Returns:
+        - List[Tuple[int, int]]: The first and last id of each range, in order.
+    """
+    # The first concept of each range, with the last concept of the table.
+    boundaries = list(
+        _table_concepts(table_id)
+        .annotate(
+            row=Window(RowNumber(), order_by=F("id").asc()),
+            last_id=Window(Max("id")),
         )
-        .distinct()
-        .count()
+        .annotate(position=(F("row") - 1) % partition_size)
+        .filter(position=0)
+        .order_by("id")
+        .values_list("id", "last_id")
     )
-
-    return concept_count
+    return [
+        (first_id, boundaries[i + 1][0] - 1 if i + 1 < len(boundaries) else last_id)
+        for i, (first_id, last_id) in enumerate(boundaries)
+    ]
 
 
 def _validate_person_id_and_date(source_table: ScanReportTable):
@@ -162,319 +220,368 @@ def _get_omop_field(destination_field: str, destination_table: Optional[str] = N
       - [optional] destination_table (str) : the name of destination table, if known
 
     Returns:
-      - OmopField : the destination field object
-    """
-
-    # if we haven't specified the table name
-    if destination_table is None:
-        # look up the field from the "allowed_tables"
-        omop_field = OmopField.objects.filter(field=destination_field)
+      - OmopField : the destination field object, or None if there isn't one without
+        a table
 
-        if len(omop_field) > 1:
-            return omop_field.filter(table__table__in=m_allowed_tables)[0]
-        elif len(omop_field) == 0:
-            return None
-        else:
-            return omop_field[0]
-
-    else:
-        # otherwise, if we know which table the field is in, use this to find the field
-        omop_field = OmopField.objects.filter(table__table=destination_table).get(
-            field=destination_field
+    Raises:
+      - OmopField.DoesNotExist: If the field isn't in the destination table.
+    """
+    omop_field = get_omop_registry().get_field(destination_field, destination_table)
+    if omop_field is None and destination_table is not None:
+        raise OmopField.DoesNotExist(
+            f"OmopField {destination_table}.{destination_field} does not exist."
         )
     return omop_field
 
 
-def _get_person_id_rule(
-    scan_report: ScanReport,
-    scan_report_concept: ScanReportConcept,
-    source_table: ScanReportTable,
-    destination_table: OmopTable,
-) -> MappingRule:
+def _find_destination_table(concept: Concept) -> Optional[OmopTable]:
     """
-    Get the rule for person_id, given
+    Get the destination table for a given Concept
 
     Args:
-        - scan_report (ScanReport):
-        - scan_report_concept (ScanReportConcept):
-        - source_table (ScanReportTable):
-        - destination_table (OmopTable):
+        - concept (ScanReportConcept): The Concept to get the table for.
 
     Returns:
-        - MappingRule for the person_id
+        - destination_table (OmopTable): The destination table for the concept.
     """
-    # look up what source_field for this table contains the person id
-    person_id_source_field = source_table.person_id
-
-    # get the associated OmopField Object (aka destination_table::person_id)
-    person_id_omop_field = OmopField.objects.get(
-        table=destination_table, field="person_id"
-    )
-
-    # create a new 1-1 rule
-    rule_domain_person_id, created = MappingRule.objects.update_or_create(
-        scan_report=scan_report,
-        omop_field=person_id_omop_field,
-        source_field=person_id_source_field,
-        concept=scan_report_concept,
-        approved=True,
-    )
-    # return the rule mapping
-    return rule_domain_person_id
+    omop_field = get_omop_registry().get_domain_field(concept.domain_id.lower())
+    if omop_field is None:
+        return None
+    return omop_field.table
 
 
-def _get_date_rules(
-    scan_report: ScanReport,
-    scan_report_concept: ScanReportConcept,
-    source_table: ScanReportTable,
-    destination_table: OmopTable,
-):
+def _get_rule_templates(
+    domain: str, type_column: str, registry: OmopRegistry
+) -> Optional[List[Tuple[OmopField, RuleSource]]]:
     """
-    Get date rules for mapping between source and destination tables.
+    Get the destination field of each mapping rule for a concept of a domain, and
+    where its source field comes from.
 
     Args:
-        - scan_report: The ScanReport object.
-        - scan_report_concept: The ScanReportConcept object.
-        - source_table: The ScanReportTable object.
-        - destination_table: The OmopTable object.
+        - domain (str): The domain of the concept, in lower case.
+        - type_column (str): The data type of the source field, in lower case.
+        - registry (OmopRegistry): The OMOP tables and fields.
 
     Returns:
-        - List of MappingRule representing the date rules.
+        - Optional[List[Tuple[OmopField, RuleSource]]]: The OMOP field and source of
+            each rule, or None if concepts of the domain can't be mapped.
     """
+    domain_omop_field = registry.get_domain_field(domain)
+    if domain_omop_field is None:
+        return None
+    destination_table = domain_omop_field.table.table
+
+    # a person_id rule, and (potentially multiple) date rules
+    # in the case of condition_occurrence, there are start and end dates
+    templates: List[Tuple[Optional[OmopField], RuleSource]] = [
+        (registry.get_field("person_id", destination_table), "person_id")
+    ]
+    templates += [
+        (date_omop_field, "date_event")
+        for date_omop_field in registry.get_date_fields(destination_table)
+    ]
 
-    date_event_source_field = source_table.date_event
-
-    date_omop_fields = m_date_field_mapper[destination_table.table]
-    # loop over all returned
-    # most will return just one date event
-    # in the case of condition_occurrence, it returns start and end
-    date_rules = []
-    for date_omop_field in date_omop_fields:
-        # get the actual omop field object
-        date_event_omop_field = OmopField.objects.get(
-            table=destination_table, field=date_omop_field
+    # In case of domain = "meas value", this rule will not be generated.
+    # And because of the conversion of domain below, this block needs to be upfront
+    if domain == "measurement":
+        templates.append(
+            (registry.get_field("value_as_number", "measurement"), "source_field")
         )
-
-        # create a new 1-1 rule
-        rule_domain_date_event, created = MappingRule.objects.update_or_create(
-            scan_report=scan_report,
-            omop_field=date_event_omop_field,
-            source_field=date_event_source_field,
-            concept=scan_report_concept,
-            approved=True,
+    if domain == "meas value":
+        templates.append(
+            (registry.get_field("value_as_concept_id", "measurement"), "source_field")
         )
+        # Then convert to Measument domain helping the process of finding OMOP fields
+        domain = "measurement"
 
-        date_rules.append(rule_domain_date_event)
+    # the domain source_concept_id and concept_id have all term mapping rules
+    # applied. The source_value doesn't use the concept, but preserves the link, so
+    # when all associated concepts are deleted, the rule is deleted.
+    templates += [
+        (registry.get_field(f"{domain}_{omop_field}"), "source_field")
+        for omop_field in ("source_concept_id", "concept_id", "source_value")
+    ]
+
+    # When the concept has the domain "Observation", one more mapping rule to the
+    # OMOP field "value_as_number"/"value_as_string" is added based on the field's
+    # datatype
+    if domain == "observation" and type_column in NUMBER_TYPES:
+        templates.append(
+            (registry.get_field("value_as_number", "observation"), "source_field")
+        )
+    if domain == "observation" and type_column in STRING_TYPES:
+        templates.append(
+            (registry.get_field("value_as_string", "observation"), "source_field")
+        )
 
-    return date_rules
+    if any(omop_field is None for omop_field, _ in templates):
+        return None
+    return cast(List[Tuple[OmopField, RuleSource]], templates)
 
 
-def _find_destination_table(concept: Concept) -> Optional[OmopTable]:
+def _get_rule_targets(
+    concept: Concept, source_field: ScanReportField, registry: OmopRegistry
+) -> Optional[List[Tuple[OmopField, int]]]:
     """
-    Get the destination table for a given Concept
+    Get the destination field and source field of each mapping rule for a concept
+    on a source field.
 
     Args:
-        - concept (ScanReportConcept): The Concept to get the table for.
+        - concept (Concept): The concept to map.
+        - source_field (ScanReportField): The field the concept is on, or the field
+            of the value it's on, with its table.
+        - registry (OmopRegistry): The OMOP tables and fields.
 
     Returns:
-        - destination_table (OmopTable): The destination table for the concept.
+        - Optional[List[Tuple[OmopField, int]]]: The OMOP field and source field id
+            of each rule, or None if the concept can't be mapped.
     """
-    domain = concept.domain_id.lower()
-    # get the omop field for the source_concept_id for this domain
-    # if the domain is "meas value" then point directly to its field and table
-    if domain == "meas value":
-        omop_field = _get_omop_field("value_as_concept_id", "measurement")
-    else:
-        omop_field = _get_omop_field(f"{domain}_source_concept_id")
-
-    if omop_field is None:
+    # check whether the person_id and date events for this table are valid
+    # if not, we dont want to create any rules for this concept
+    source_table = source_field.scan_report_table
+    if not _validate_person_id_and_date(source_table):
         return None
-    # start looking up what table we're looking at
-    destination_table = omop_field.table
 
-    if destination_table.table not in m_allowed_tables:
+    templates = _get_rule_templates(
+        concept.domain_id.lower(), source_field.type_column.lower(), registry
+    )
+    if templates is None:
         return None
-    return destination_table
+    source_field_ids = {
+        "person_id": source_table.person_id_id,
+        "date_event": source_table.date_event_id,
+        "source_field": source_field.id,
+    }
+    return [(omop_field, source_field_ids[source]) for omop_field, source in templates]
 
 
-def _save_mapping_rules(scan_report_concept: ScanReportConcept) -> bool:
+def save_mapping_rules(scan_report_concepts: List[ScanReportConcept]) -> int:
     """
-    Save mapping rules from a given ScanReportConcept.
+    Save the mapping rules of a page of ScanReportConcepts.
+
+    The source fields and concepts are loaded with a query each, the
+    rules computed in memory, then created in batches. Rules that already exist are
+    left as they are.
 
     Args:
-        - concept (ScanReportConcept) : object containing the Concept and Link to source_value
+        - scan_report_concepts (List[ScanReportConcept]): The ScanReportConcepts to
+            save the rules of.
 
     Returns:
-        - bool: If the rule has been saved.
+        - int: The number of ScanReportConcepts rules were saved for.
     """
-    content_object = scan_report_concept.content_object
-    if isinstance(content_object, ScanReportValue):
-        scan_report_value = content_object
-        source_field = scan_report_value.scan_report_field
-    else:
-        source_field = content_object
-
-    scan_report = source_field.scan_report_table.scan_report
+    if not scan_report_concepts:
+        return 0
+
+    value_content_type = ContentType.objects.get_for_model(ScanReportValue)
+    value_ids = set()
+    field_ids = set()
+    for scan_report_concept in scan_report_concepts:
+        if scan_report_concept.content_type_id == value_content_type.id:
+            value_ids.add(scan_report_concept.object_id)
+        else:
+            field_ids.add(scan_report_concept.object_id)
+
+    related = [
+        "scan_report_table",
+        "scan_report_table__person_id",
+        "scan_report_table__date_event",
+    ]
+    value_fields = {
+        value.id: value.scan_report_field
+        for value in ScanReportValue.objects.filter(id__in=value_ids).select_related(
+            *(f"scan_report_field__{relation}" for relation in related)
+        )
+    }
+    fields = ScanReportField.objects.filter(id__in=field_ids).select_related(*related)
+    field_fields = {field.id: field for field in fields}
+    prefetch_related_objects(scan_report_concepts, "concept")
+    registry = get_omop_registry()
+
+    rules = []
+    saved = 0
+    for scan_report_concept in scan_report_concepts:
+        if scan_report_concept.content_type_id == value_content_type.id:
+            source_field = value_fields.get(scan_report_concept.object_id)
+        else:
+            source_field = field_fields.get(scan_report_concept.object_id)
+        if source_field is None:
+            continue
+        targets = _get_rule_targets(scan_report_concept.concept, source_field, registry)
+        if targets is None:
+            continue
+        rules += [
+            MappingRule(
+                scan_report_id=source_field.scan_report_table.scan_report_id,
+                omop_field=omop_field,
+                source_field_id=source_field_id,
+                concept=scan_report_concept,
+                approved=True,
+            )
+            for omop_field, source_field_id in targets
+        ]
+        saved += 1
+
+    MappingRule.objects.bulk_create(
+        rules, batch_size=RULE_BATCH_SIZE, ignore_conflicts=True
+    )
+    return saved
 
-    concept = scan_report_concept.concept
 
-    type_column = source_field.type_column.lower()
-    # get the omop field for the source_concept_id for this domain
-    domain = concept.domain_id.lower()
+def _save_mapping_rules(scan_report_concept: ScanReportConcept) -> bool:
+    """
+    Save mapping rules from a given ScanReportConcept.
 
-    # start looking up what table we're looking at
-    destination_table = _find_destination_table(concept)
-    if destination_table is None:
-        return False
+    Args:
+        - concept (ScanReportConcept) : object containing the Concept and Link to source_value
 
-    # obtain the source table
-    source_table = source_field.scan_report_table
+    Returns:
+        - bool: If the rule has been saved.
+    """
+    return save_mapping_rules([scan_report_concept]) == 1
 
-    # check whether the person_id and date events for this table are valid
-    # if not, we dont want to create any rules for this concept
-    if not _validate_person_id_and_date(source_table):
-        return False
 
-    # create a person_id rule
-    person_id_rule = _get_person_id_rule(
-        scan_report, scan_report_concept, source_table, destination_table
-    )
-    rules = [person_id_rule]
-    # create(potentially multiple) date_rules
-    date_rules = _get_date_rules(
-        scan_report, scan_report_concept, source_table, destination_table
-    )
-    rules += date_rules
+def save_mapping_rules_sql(
+    table_id: int, first_id: Optional[int] = None, last_id: Optional[int] = None
+) -> int:
+    """
+    Save the mapping rules of the ScanReportConcepts of a table with a single
+    `INSERT ... SELECT`, without loading them out of the database.
 
-    # In case of domain = "meas value", this rule will not be generated.
-    # And because of the conversion of domain in the line after "rules.append(rule_domain_value_as_concept_id)", this block needs to be upfront
-    if domain == "measurement":
-        # create/update a model for the domain value_as_number
-        #  - for this destination_field and source_field
-        #  - do_term_mapping is set to false
-        rule_domain_value_as_number, created = MappingRule.objects.update_or_create(
-            scan_report=scan_report,
-            omop_field=_get_omop_field("value_as_number", "measurement"),
-            source_field=source_field,
-            concept=scan_report_concept,
-            approved=True,
-        )
-        rules.append(rule_domain_value_as_number)
+    The rules for each domain and type of source field are worked out from the
+    OMOP registry in the same way as `save_mapping_rules`, then joined to the
+    concepts, their source fields and the table's person_id and date_event. Rules
+    that already exist are left as they are.
 
-    if domain == "meas value":
-        # create/update a model for the field value_as_concept_id in measurement table
-        rule_domain_value_as_concept_id, created = MappingRule.objects.update_or_create(
-            scan_report=scan_report,
-            omop_field=_get_omop_field("value_as_concept_id", "measurement"),
-            source_field=source_field,
-            concept=scan_report_concept,
-            approved=True,
-        )
-        rules.append(rule_domain_value_as_concept_id)
-        # Then convert to Measument domain helping the process of finding OMOP fields below
-        domain = "measurement"
+    Args:
+        - table_id (int): The Id of the table to save the rules for.
+        - first_id (Optional[int]): The first ScanReportConcept id to save the rules
+            of.
+        - last_id (Optional[int]): The last ScanReportConcept id to save the rules of.
 
-    # create/update a model for the domain source_concept_id
-    #  - for this destination_field and source_field
-    #  - do_term_mapping is set to true:
-    #    - all term mapping rules associated need to be applied
-    rule_domain_source_concept_id, created = MappingRule.objects.update_or_create(
-        scan_report=scan_report,
-        omop_field=_get_omop_field(f"{domain}_source_concept_id"),
-        source_field=source_field,
-        concept=scan_report_concept,
-        approved=True,
-    )
-    rules.append(rule_domain_source_concept_id)
-
-    # create/update a model for the domain concept_id
-    #  - for this destination_field and source_field
-    #  - do_term_mapping is set to true:
-    #    - all term mapping rules associated need to be applied
-    rule_domain_concept_id, created = MappingRule.objects.update_or_create(
-        scan_report=scan_report,
-        omop_field=_get_omop_field(f"{domain}_concept_id"),
-        source_field=source_field,
-        concept=scan_report_concept,
-        approved=True,
-    )
-    rules.append(rule_domain_concept_id)
-
-    # create/update a model for the domain source_value
-    #  - for this destination_field and source_field
-    #  - do_term_mapping is set to false
-    rule_domain_source_value, created = MappingRule.objects.update_or_create(
-        scan_report=scan_report,
-        omop_field=_get_omop_field(f"{domain}_source_value"),
-        source_field=source_field,
-        concept=scan_report_concept,
-        approved=True,
+    Returns:
+        - int: The number of rules created.
+    """
+    registry = get_omop_registry()
+    templates = [
+        (domain, type_class, omop_field.id, source)
+        for domain in registry.get_domains()
+        for type_class, type_column in TYPE_CLASSES
+        for omop_field, source in _get_rule_templates(domain, type_column, registry)
+        or []
+    ]
+    if not templates:
+        return 0
+
+    quote_name = connection.ops.quote_name
+    templates_sql = " UNION ALL ".join(
+        [
+            "SELECT %s AS rule_domain, %s AS type_class, %s AS omop_field_id, "
+            "%s AS rule_source"
+        ]
+        * len(templates)
     )
-    # add this new concept mapping
-    # - the concept wont be used, because  do_term_mapping=False
-    # - but we need to preserve the link,
-    #   so when all associated concepts are deleted, the rule is deleted
-    rules.append(rule_domain_source_value)
-
-    # When the concept has the domain "Observation", one more mapping rule to the OMOP field
-    # "value_as_number"/"value_as_string" will be added based on the field's datatype
-    if domain == "observation" and (
-        type_column == "int" or type_column == "real" or type_column == "float"
-    ):
-        # create/update a model for the domain value_as_number
-        #  - for this destination_field and source_field
-        #  - do_term_mapping is set to false
-        rule_domain_value_as_number, created = MappingRule.objects.update_or_create(
-            scan_report=scan_report,
-            omop_field=_get_omop_field("value_as_number", "observation"),
-            source_field=source_field,
-            concept=scan_report_concept,
-            approved=True,
-        )
-        rules.append(rule_domain_value_as_number)
-
-    if domain == "observation" and (
-        type_column == "varchar" or type_column == "nvarchar"
-    ):
-        # create/update a model for the domain value_as_string
-        #  - for this destination_field and source_field
-        #  - do_term_mapping is set to false
-        rule_domain_value_as_string, created = MappingRule.objects.update_or_create(
-            scan_report=scan_report,
-            omop_field=_get_omop_field("value_as_string", "observation"),
-            source_field=source_field,
-            concept=scan_report_concept,
-            approved=True,
+    number_types_sql = ", ".join(["%s"] * len(NUMBER_TYPES))
+    string_types_sql = ", ".join(["%s"] * len(STRING_TYPES))
+    range_sql = ""
+    range_params = []
+    if first_id is not None:
+        range_sql += " AND scan_report_concept.id >= %s"
+        range_params.append(first_id)
+    if last_id is not None:
+        range_sql += " AND scan_report_concept.id <= %s"
+        range_params.append(last_id)
+    now = timezone.now()
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            {connection.ops.insert_statement(on_conflict=OnConflict.IGNORE)}
+                {quote_name(MappingRule._meta.db_table)}
+                (created_at, updated_at, scan_report_id, omop_field_id,
+                source_field_id, concept_id, approved)
+            SELECT %s, %s, source_table.scan_report_id, template.omop_field_id,
+                CASE template.rule_source
+                    WHEN 'person_id' THEN source_table.person_id_id
+                    WHEN 'date_event' THEN source_table.date_event_id
+                    ELSE source_field.id
+                END,
+                scan_report_concept.id, %s
+            FROM (
+                SELECT src.id, src.concept_id, src_value.scan_report_field_id AS field_id
+                FROM {quote_name(ScanReportConcept._meta.db_table)} src
+                JOIN {quote_name(ScanReportValue._meta.db_table)} src_value
+                    ON src_value.id = src.object_id
+                WHERE src.content_type_id = %s
+                UNION ALL
+                SELECT src.id, src.concept_id, src.object_id AS field_id
+                FROM {quote_name(ScanReportConcept._meta.db_table)} src
+                WHERE src.content_type_id = %s
+            ) scan_report_concept
+            JOIN {quote_name(ScanReportField._meta.db_table)} source_field
+                ON source_field.id = scan_report_concept.field_id
+            JOIN {quote_name(ScanReportTable._meta.db_table)} source_table
+                ON source_table.id = source_field.scan_report_table_id
+            JOIN {quote_name(Concept._meta.db_table)} concept
+                ON concept.concept_id = scan_report_concept.concept_id
+            JOIN ({templates_sql}) template
+                ON template.rule_domain = LOWER(concept.domain_id)
+                AND template.type_class = CASE
+                    WHEN LOWER(source_field.type_column) IN ({number_types_sql})
+                        THEN 'number'
+                    WHEN LOWER(source_field.type_column) IN ({string_types_sql})
+                        THEN 'string'
+                    ELSE 'other'
+                END
+            JOIN {quote_name(OmopField._meta.db_table)} omop_field
+                ON omop_field.id = template.omop_field_id
+            WHERE source_table.id = %s
+                AND source_table.person_id_id IS NOT NULL
+                AND source_table.date_event_id IS NOT NULL
+                {range_sql}
+            {connection.ops.on_conflict_suffix_sql([], OnConflict.IGNORE, [], [])}
+            """,
+            [
+                now,
+                now,
+                True,
+                ContentType.objects.get_for_model(ScanReportValue).id,
+                ContentType.objects.get_for_model(ScanReportField).id,
+                *(value for template in templates for value in template),
+                *NUMBER_TYPES,
+                *STRING_TYPES,
+                table_id,
+                *range_params,
+            ],
         )
-        rules.append(rule_domain_value_as_string)
-
-    # now we are sure all rules have been created, we can save them safely
-    for rule in rules:
-        rule.save()
+        return cursor.rowcount
 
-    return True
 
-
-def refresh_mapping_rules(table_id: int, page: int, page_size: int) -> None:
+def refresh_mapping_rules(
+    table_id: int,
+    first_id: Optional[int] = None,
+    last_id: Optional[int] = None,
+    backend: RulesBackend = "python",
+) -> None:
     """
     Refreshes the Mapping Rules for a given Scan Report Table.
 
-    Deletes all the existing rules, gets the concepts, and saves the mapping rules again.
+    Gets a range of the concepts, and saves their mapping rules, in Python or in a
+    single SQL statement.
 
     Args:
         - table_id (int): The Id of the table to refresh the rules for.
+        - first_id (Optional[int]): The first ScanReportConcept id to refresh the
+            rules of.
+        - last_id (Optional[int]): The last ScanReportConcept id to refresh the rules
+            of.
+        - backend (RulesBackend): Whether to save the rules in "python" or "sql".
 
     Returns:
         - None
     """
-
-    concepts = _find_existing_concepts(table_id, page, page_size)
-
-    nconcepts = 0
-    nbadconcepts = 0
-
-    for concept in concepts:
-        if _save_mapping_rules(concept):
-            nconcepts += 1
-        else:
-            nbadconcepts += 1
+    if backend == "sql":
+        save_mapping_rules_sql(table_id, first_id, last_id)
+    else:
+        concepts = _find_existing_concepts(table_id, first_id, last_id)
+        save_mapping_rules(concepts)
@@ -1,10 +1,12 @@
 import csv
 import io
+import itertools
+import json
 from datetime import date, datetime, timezone
-from typing import Any
+from typing import Any, Iterator, NamedTuple
 
 from django.contrib.contenttypes.models import ContentType
-from django.db.models import Q
+from django.db.models import Case, OuterRef, Q, Subquery, When
 from django.db.models.query import QuerySet
 from graphviz import Digraph
 from shared.data.models import Concept, ConceptAncestor
@@ -23,6 +25,154 @@ class NonStandardConceptMapsToSelf(Exception):
     pass
 
 
+# The number of mapping rules fetched, and enriched with their concepts, at a time
+RULE_ROWS_CHUNK_SIZE = 5000
+
+
+class MappingRuleRow(NamedTuple):
+    """
+    The columns of a mapping rule needed to list and export it.
+    """
+
+    rule_id: int
+    omop_term: str
+    domain: str
+    destination_table_id: int
+    destination_table: str
+    destination_field_id: int
+    destination_field: str
+    source_table_id: int
+    source_table: str
+    source_field_id: int
+    source_field: str
+    term_mapping: dict[str, int] | int | None
+    creation_type: str
+
+
+def get_mapping_rule_rows(
+    mapping_rules: QuerySet[MappingRule],
+    page_number: int | None = None,
+    page_size: int | None = None,
+) -> list[MappingRuleRow]:
+    """
+    Gets the columns of mapping rules needed to list and export them, with a single
+    query joining their concepts, OMOP fields and tables, and source fields and
+    tables.
+
+    Args:
+        - mapping_rules (QuerySet[MappingRule]): The mapping rules, in the order to
+            return them.
+        - page_number (int | None): If present, the 1-based number of the page to
+            return.
+        - page_size (int | None): If present, the size of the page to return.
+
+    Returns:
+        - list[MappingRuleRow]: The mapping rules.
+    """
+    return list(iter_mapping_rule_rows(mapping_rules, page_number, page_size))
+
+
+def iter_mapping_rule_rows(
+    mapping_rules: QuerySet[MappingRule],
+    page_number: int | None = None,
+    page_size: int | None = None,
+) -> Iterator[MappingRuleRow]:
+    """
+    Iterates over the columns of mapping rules needed to list and export them, as
+    `get_mapping_rule_rows`, fetching them from the database in chunks.
+
+    Args:
+        - mapping_rules (QuerySet[MappingRule]): The mapping rules, in the order to
+            return them.
+        - page_number (int | None): If present, the 1-based number of the page to
+            return.
+        - page_size (int | None): If present, the size of the page to return.
+
+    Returns:
+        - Iterator[MappingRuleRow]: The mapping rules.
+    """
+    scanreportvalue_content_type = ContentType.objects.get_for_model(ScanReportValue)
+    # The value a value's concept is on, looked up in the same query
+    value = Case(
+        When(
+            concept__content_type=scanreportvalue_content_type,
+            then=Subquery(
+                ScanReportValue.objects.filter(
+                    id=OuterRef("concept__object_id")
+                ).values("value")[:1]
+            ),
+        ),
+    )
+    rows = mapping_rules.annotate(source_value=value).values_list(
+        "concept_id",
+        "concept__concept__concept_name",
+        "concept__concept__domain_id",
+        "concept__concept_id",
+        "concept__content_type_id",
+        "concept__creation_type",
+        "source_value",
+        "omop_field__table_id",
+        "omop_field__table__table",
+        "omop_field_id",
+        "omop_field__field",
+        "source_field__scan_report_table_id",
+        "source_field__scan_report_table__name",
+        "source_field_id",
+        "source_field__name",
+    )
+    # In the case of a paginated call, calculate the slice by hand and apply.
+    # page_number is 1-based.
+    if page_number is not None:
+        first_index = (page_number - 1) * page_size
+        last_index = page_number * page_size
+        rows = rows[first_index:last_index]
+
+    for (
+        rule_id,
+        omop_term,
+        domain,
+        concept_id,
+        content_type_id,
+        creation_type,
+        source_value,
+        destination_table_id,
+        destination_table,
+        destination_field_id,
+        destination_field,
+        source_table_id,
+        source_table,
+        source_field_id,
+        source_field,
+    ) in rows.iterator(chunk_size=RULE_ROWS_CHUNK_SIZE):
+        if source_field_id is None:
+            print(f"WARNING!! mapping rule for {rule_id} has no source field")
+            continue
+
+        # work out if we need term_mapping or not
+        term_mapping: dict[str, int] | int | None = None
+        if "concept_id" in destination_field:
+            if content_type_id == scanreportvalue_content_type.id:
+                term_mapping = {source_value: concept_id}
+            else:
+                term_mapping = concept_id
+
+        yield MappingRuleRow(
+            rule_id,
+            omop_term,
+            domain,
+            destination_table_id,
+            destination_table,
+            destination_field_id,
+            destination_field,
+            source_table_id,
+            source_table,
+            source_field_id,
+            source_field,
+            term_mapping,
+            creation_type,
+        )
+
+
 def get_mapping_rules_list(
     mapping_rules: QuerySet[MappingRule],
     page_number: int | None = None,
@@ -40,163 +190,117 @@ def get_mapping_rules_list(
         list : a list of rules that can be interpreted by the view.py
                page and processed to build a json
     """
-    # In the case of a paginated call, calculate the slice by hand and apply.
-    # page_number is 1-based.
-    if page_number is not None:
-        first_index = (page_number - 1) * page_size
-        last_index = page_number * page_size
-        mapping_rules = mapping_rules[first_index:last_index]
-
-    # get all scan_report_concepts that are used
-    # get the ids first so we can make a batch call
-    scan_report_concepts = list({obj.concept_id for obj in mapping_rules})
-
-    nmapped_concepts = len(scan_report_concepts)
-
-    # make the batch call
-    scan_report_concepts_id_to_obj_map = {
-        x.id: x
-        for x in list(ScanReportConcept.objects.filter(pk__in=scan_report_concepts))
-    }
+    # The tables and fields are shared between rules, so only build each once
+    destination_tables: dict[int, OmopTable] = {}
+    destination_fields: dict[int, OmopField] = {}
+    source_tables: dict[int, ScanReportTable] = {}
+    source_fields: dict[int, ScanReportField] = {}
 
-    ntotal_concepts = len(scan_report_concepts_id_to_obj_map.values())
+    rules = []
+    for row in get_mapping_rule_rows(mapping_rules, page_number, page_size):
+        destination_table = destination_tables.get(row.destination_table_id)
+        if destination_table is None:
+            destination_table = destination_tables[row.destination_table_id] = (
+                OmopTable(id=row.destination_table_id, table=row.destination_table)
+            )
+        destination_field = destination_fields.get(row.destination_field_id)
+        if destination_field is None:
+            destination_field = destination_fields[row.destination_field_id] = (
+                OmopField(
+                    id=row.destination_field_id,
+                    table=destination_table,
+                    field=row.destination_field,
+                )
+            )
+        source_table = source_tables.get(row.source_table_id)
+        if source_table is None:
+            source_table = source_tables[row.source_table_id] = ScanReportTable(
+                id=row.source_table_id, name=row.source_table
+            )
+        source_field = source_fields.get(row.source_field_id)
+        if source_field is None:
+            source_field = source_fields[row.source_field_id] = ScanReportField(
+                id=row.source_field_id,
+                scan_report_table=source_table,
+                name=row.source_field,
+            )
 
-    if nmapped_concepts != ntotal_concepts:
-        print(
-            "WARNING!! There are a differing number of scan report concepts"
-            " associate to the mapping rules, and those that exist as scan report concepts"
+        rules.append(
+            {
+                "rule_id": row.rule_id,
+                "omop_term": row.omop_term,
+                "destination_table": destination_table,
+                "domain": row.domain,
+                "destination_field": destination_field,
+                "source_table": source_table,
+                "source_field": source_field,
+                "term_mapping": row.term_mapping,
+                "creation_type": row.creation_type,
+            }
         )
 
-    # get all the ids for all ScanReportValues that are used (have been mapped with a concept)
-    scanreportvalue_content_type = ContentType.objects.get_for_model(ScanReportValue)
-    scan_report_values_with_scan_report_concepts = [
-        obj.object_id
-        for obj in ScanReportConcept.objects.filter(
-            pk__in=scan_report_concepts_id_to_obj_map,
-            content_type=scanreportvalue_content_type,
-        )
-    ]
-    # make a batch call to the ORM again..
-    scan_report_values_id_to_value_map = {
-        obj.id: obj.value
-        for obj in list(
-            ScanReportValue.objects.filter(
-                pk__in=scan_report_values_with_scan_report_concepts
-            )
-        )
-    }
+    return rules
 
-    # get all destination field ids
-    destination_fields_ids = [obj.omop_field_id for obj in mapping_rules]
-    # batch call
-    destination_fields = {
-        obj.id: obj
-        for obj in list(OmopField.objects.filter(pk__in=destination_fields_ids))
-    }
 
-    # again with destination table
-    destination_tables_ids = [obj.table_id for obj in destination_fields.values()]
-    destination_tables = {
-        obj.id: obj
-        for obj in list(OmopTable.objects.filter(pk__in=destination_tables_ids))
-    }
+def _get_rules_metadata(mapping_rules: QuerySet[MappingRule]) -> dict[str, Any]:
+    """
+    Gets the metadata of the JSON rules export.
 
-    # and sources....
-    source_fields_ids = [obj.source_field_id for obj in mapping_rules]
-    source_fields = {
-        obj.id: obj
-        for obj in list(ScanReportField.objects.filter(pk__in=source_fields_ids))
-    }
-    source_tables_ids = [obj.scan_report_table_id for obj in source_fields.values()]
-    source_tables = {
-        obj.id: obj
-        for obj in list(ScanReportTable.objects.filter(pk__in=source_tables_ids))
-    }
+    Args:
+        - mapping_rules (QuerySet[MappingRule]): The mapping rules, all from the
+            same scan report.
 
-    # Using select_related() means we can chain together querysets into one database
-    # query rather than using multiple
-    structural_mapping_rules_sr_concepts = mapping_rules.select_related("concept")
-    # Generate rule.id to SRConcept.id map for all SRConcepts related to these rules.
-    rule_to_srconcept_id_map = {
-        obj.id: obj.concept.id for obj in structural_mapping_rules_sr_concepts
-    }
+    Returns:
+        - dict[str, Any]: The metadata.
+    """
+    # use the first rule to get the scan_report dataset name
+    # all qs items will be from the same scan_report
+    dataset = mapping_rules.values_list("scan_report__dataset", flat=True)[0]
 
-    structural_mapping_rules_sr_concepts_concepts = mapping_rules.select_related(
-        "concept__concept"
-    )
-    # Generate MappingRule.id to Concept.id map for all Concepts related to SRConcepts
-    # related to these MappingRules.
-    rule_id_to_concept_name_map = {
-        obj.id: obj.concept.concept.concept_name
-        for obj in structural_mapping_rules_sr_concepts_concepts
+    # build some metadata
+    return {
+        "date_created": datetime.now(timezone.utc).isoformat(),
+        "dataset": dataset,
     }
 
-    # Make a single query to get all ScanReportConcepts associated to
-    # ScanReportValues. This means we avoid what would be more understandable,
-    # but extremely slow, code to check whether each object is associated to a
-    # ScanReportValue.
-    scan_report_concepts_with_values = [
-        obj.id
-        for obj in ScanReportConcept.objects.filter(
-            pk__in=scan_report_concepts_id_to_obj_map,
-            content_type=scanreportvalue_content_type,
-        )
-    ]
-
-    # now loop over the rules to actually create the list version of the rules
-    rules = []
-    for rule in mapping_rules:
-        # get the fields/tables from the loop up lists
-        # the speed up comes from here as we dont need to keep hitting the DB to get this data
-        # we've already cached it in these dictionaries by making a batch call
-        destination_field = destination_fields[rule.omop_field_id]
-        destination_table = destination_tables[destination_field.table_id]
-
-        source_field = source_fields[rule.source_field_id]
-        source_table = source_tables[source_field.scan_report_table_id]
-
-        # get the concepts again
-        rule_scan_report_concept_id = rule_to_srconcept_id_map[rule.id]
 
-        if rule.concept_id not in scan_report_concepts_id_to_obj_map:
-            print(f"WARNING!! scan_report_concept {rule.concept_id} no longer exists")
-            continue
+def _get_rule_key(rule: MappingRuleRow) -> str:
+    """
+    Gets the key of the object a rule is in, in its table of the JSON rules export.
 
-        scan_report_concept = scan_report_concepts_id_to_obj_map[rule.concept_id]
+    i.e. 5 rules with have the same id as they're associated to the same object e.g.
+    person mapping of 'F' to 8532. The rule_id is appended to not overwrite mappings
+    to the same concept ID.
 
-        concept_id = scan_report_concept.concept_id
+    Args:
+        - rule (MappingRuleRow): The rule.
 
-        concept_name = rule_id_to_concept_name_map[rule.id]
+    Returns:
+        - str: The key.
+    """
+    return rule.omop_term + " " + str(rule.rule_id)
 
-        # work out if we need term_mapping or not
-        term_mapping = None
-        if "concept_id" in destination_field.field:
-            if scan_report_concept.id in scan_report_concepts_with_values:
-                term_mapping = {
-                    scan_report_values_id_to_value_map[
-                        scan_report_concept.object_id
-                    ]: concept_id
-                }
-            else:
-                term_mapping = concept_id
 
-        creation_type = scan_report_concept.creation_type
+def _get_mapping_spec(rule: MappingRuleRow) -> dict[str, Any]:
+    """
+    Gets the mapping spec of a rule's destination field in the JSON rules export.
 
-        rules.append(
-            {
-                "rule_id": rule_scan_report_concept_id,
-                "omop_term": concept_name,
-                "destination_table": destination_table,
-                "domain": scan_report_concept.concept.domain_id,
-                "destination_field": destination_field,
-                "source_table": source_table,
-                "source_field": source_field,
-                "term_mapping": term_mapping,
-                "creation_type": creation_type,
-            }
-        )
+    Args:
+        - rule (MappingRuleRow): The rule.
 
-    return rules
+    Returns:
+        - dict[str, Any]: The mapping spec.
+    """
+    spec: dict[str, Any] = {
+        "source_table": rule.source_table.replace("\ufeff", ""),
+        "source_field": rule.source_field.replace("\ufeff", ""),
+    }
+    # include term_mapping if it's needed
+    # will appear for destinations with _concept_id,
+    # either as a dict (value map) or as a str/int (field map)
+    if rule.term_mapping is not None:
+        spec["term_mapping"] = rule.term_mapping
+    return spec
 
 
 def get_mapping_rules_json(
@@ -209,35 +313,23 @@ def get_mapping_rules_json(
         - dict : formatted json that can be eaten by the TL-Tool
     """
 
+    # get the list of rules
+    # this is the same list/function that is used
+    all_rules = get_mapping_rule_rows(mapping_rules)
+
     # Return empty metadata and cdm if `structural_mapping_rules` is empty
-    if not mapping_rules:
+    if not all_rules:
         return {"metadata": {}, "cdm": {}}
 
-    # use the first_qs to get the scan_report dataset name
-    # all qs items will be from the same scan_report
-    first_rule = mapping_rules[0]
-
-    # build some metadata
-    metadata = {
-        "date_created": datetime.now(timezone.utc).isoformat(),
-        "dataset": first_rule.scan_report.dataset,
-    }
-
-    # get the list of rules
-    # this is the same list/function that is used
-    # !NOTE: we could cache this to speed things up, as the page load will call this once already
-    all_rules = get_mapping_rules_list(mapping_rules)
+    metadata = _get_rules_metadata(mapping_rules)
 
     cdm: dict[str, Any] = {}
     # loop over the list of rules
     for rule in all_rules:
-        # get the rule id
-        # i.e. 5 rules with have the same id as they're associated to the same object e.g. person mapping of 'F' to 8532
-        # append the rule_id to not overwrite mappings to the same concept ID
-        _id = rule["omop_term"] + " " + str(rule["rule_id"])
+        _id = _get_rule_key(rule)
 
         # get the table name
-        table_name = rule["destination_table"].table
+        table_name = rule.destination_table
 
         # make a new object if we havent come across this cdm table yet
         if table_name not in cdm:
@@ -250,23 +342,71 @@ def get_mapping_rules_json(
             cdm[table_name][_id] = {}
 
         # make a new mapping spec for the destination table
-        destination_field = rule["destination_field"].field
-        cdm[table_name][_id][destination_field] = {
-            "source_table": rule["source_table"].name.replace("\ufeff", ""),
-            "source_field": rule["source_field"].name.replace("\ufeff", ""),
-        }
-        # include term_mapping if it's needed
-        # will appear for destinations with _concept_id,
-        # either as a dict (value map) or as a str/int (field map)
-        if rule["term_mapping"] is not None:
-            cdm[table_name][_id][destination_field]["term_mapping"] = rule[
-                "term_mapping"
-            ]
+        cdm[table_name][_id][rule.destination_field] = _get_mapping_spec(rule)
 
     # add the metadata and cdm object together
     return {"metadata": metadata, "cdm": cdm}
 
 
+def iter_mapping_rules_json(
+    mapping_rules: QuerySet[MappingRule], indent: int | None = 6
+) -> Iterator[str]:
+    """
+    Generates the JSON rules export a rules object at a time, without building it in
+    memory.
+
+    The rules are ordered by destination table and rule id, so each table and object
+    is complete when it's reached. The output is the same as
+    `json.dumps(get_mapping_rules_json(ordered_rules), indent=indent)`.
+
+    Args:
+        - mapping_rules (QuerySet[MappingRule]): The mapping rules.
+        - indent (int | None): The indent to pretty-print the JSON with, or None to
+            write it on one line.
+
+    Returns:
+        - Iterator[str]: The JSON, in chunks.
+    """
+    rules = iter_mapping_rule_rows(
+        mapping_rules.order_by("omop_field__table__table", "concept_id", "id")
+    )
+    first_rule = next(rules, None)
+    metadata = _get_rules_metadata(mapping_rules) if first_rule is not None else {}
+
+    # The separators and indents `json.dumps` uses
+    item_separator = "," if indent is not None else ", "
+
+    def newline(depth: int) -> str:
+        return "\n" + " " * (indent * depth) if indent is not None else ""
+
+    def encode(value: Any, depth: int) -> str:
+        return json.dumps(value, indent=indent).replace("\n", newline(depth))
+
+    yield "{" + newline(1) + '"metadata": ' + encode(metadata, 1)
+    yield item_separator + newline(1) + '"cdm": '
+    if first_rule is None:
+        yield "{}" + newline(0) + "}"
+        return
+
+    yield "{"
+    tables = itertools.groupby(
+        itertools.chain([first_rule], rules), key=lambda rule: rule.destination_table
+    )
+    for table_index, (table_name, table_rules) in enumerate(tables):
+        yield (item_separator if table_index else "") + newline(2)
+        yield json.dumps(table_name) + ": {"
+        for index, (_id, id_rules) in enumerate(
+            itertools.groupby(table_rules, key=_get_rule_key)
+        ):
+            specs = {
+                rule.destination_field: _get_mapping_spec(rule) for rule in id_rules
+            }
+            yield (item_separator if index else "") + newline(3)
+            yield json.dumps(_id) + ": " + encode(specs, 3)
+        yield newline(2) + "}"
+    yield newline(1) + "}" + newline(0) + "}"
+
+
 def get_mapping_rules_as_csv(qs: QuerySet[MappingRule]) -> io.StringIO:
     """
     Gets Mapping Rules in csv format.
@@ -277,20 +417,30 @@ def get_mapping_rules_as_csv(qs: QuerySet[MappingRule]) -> io.StringIO:
     Returns:
         - Mapping rules as StringIO.
     """
-    # get the mapping rules as a list
-    output = get_mapping_rules_list(qs)
-
     # make a string buffer
     _buffer = io.StringIO()
-    # setup a csv writter
-    writer = csv.writer(
-        _buffer,
-        lineterminator="\n",
-        delimiter=",",
-        quoting=csv.QUOTE_MINIMAL,
-    )
+    for chunk in iter_mapping_rules_csv(qs):
+        _buffer.write(chunk)
+
+    # rewind the buffer and return the response
+    _buffer.seek(0)
+
+    return _buffer
+
+
+def iter_mapping_rules_csv(qs: QuerySet[MappingRule]) -> Iterator[str]:
+    """
+    Generates Mapping Rules in csv format, a chunk of rows at a time.
+
+    The concepts of each chunk of rules are looked up with a single query.
+
+    Args:
+        - qs (QuerySet[MappingRule]) queryset of Mapping Rules.
 
-    # setup the headers from the first object
+    Returns:
+        - Iterator[str]: The csv, starting with the headers, in chunks.
+    """
+    # setup the headers
     # replace term_mapping ({'source_value':'concept'}) with separate columns
     headers = [
         "source_table",
@@ -308,48 +458,76 @@ def get_mapping_rules_as_csv(qs: QuerySet[MappingRule]) -> io.StringIO:
         "isFieldMapping",
     ]
 
+    # make a string buffer for each chunk
+    _buffer = io.StringIO()
+    # setup a csv writter
+    writer = csv.writer(
+        _buffer,
+        lineterminator="\n",
+        delimiter=",",
+        quoting=csv.QUOTE_MINIMAL,
+    )
+
     # write the headers to the csv
     writer.writerow(headers)
+    yield _buffer.getvalue()
 
     # Get the current date to check validity
     today = date.today()
 
-    # loop over the content
-    for content in output:
-        # replace the django model objects with string names
-        content["destination_table"] = content["destination_table"].table
-        content["domain"] = content["domain"]
-        content["source_table"] = content["source_table"].name
-        content["source_field"] = content["source_field"].name
-
-        # pop out the term mapping
-        term_mapping = content.pop("term_mapping")
-        content["isFieldMapping"] = ""
-        content["validity"] = ""
-        content["vocabulary"] = ""
-        content["concept"] = ""
-        content["class"] = ""
-        # if no term mapping, set columns to blank
-        if term_mapping is None:
-            content["source_value"] = ""
-            content["concept_id"] = ""
-        elif isinstance(term_mapping, dict):
-            # if is a dict, it's a map between a source value and a concept
-            # set these based on the value/key
-            content["source_value"] = list(term_mapping.keys())[0]
-            content["concept_id"] = list(term_mapping.values())[0]
-            content["isFieldMapping"] = "0"
-        else:
-            # otherwise it is a scalar, it is a term map of a field, so set this
-            content["source_value"] = ""
-            content["concept_id"] = term_mapping
-            content["isFieldMapping"] = "1"
-
-        # Lookup and extract concept
-        if content["concept_id"]:
-            if concept := Concept.objects.filter(
-                concept_id=content["concept_id"]
-            ).first():
+    rows = iter_mapping_rule_rows(qs)
+    while chunk := list(itertools.islice(rows, RULE_ROWS_CHUNK_SIZE)):
+        contents = []
+        for row in chunk:
+            content: dict[str, Any] = row._asdict()
+
+            # pop out the term mapping
+            term_mapping = content.pop("term_mapping")
+            content["isFieldMapping"] = ""
+            content["validity"] = ""
+            content["vocabulary"] = ""
+            content["concept"] = ""
+            content["class"] = ""
+            # if no term mapping, set columns to blank
+            if term_mapping is None:
+                content["source_value"] = ""
+                content["concept_id"] = ""
+            elif isinstance(term_mapping, dict):
+                # if is a dict, it's a map between a source value and a concept
+                # set these based on the value/key
+                content["source_value"] = list(term_mapping.keys())[0]
+                content["concept_id"] = list(term_mapping.values())[0]
+                content["isFieldMapping"] = "0"
+            else:
+                # otherwise it is a scalar, it is a term map of a field, so set this
+                content["source_value"] = ""
+                content["concept_id"] = term_mapping
+                content["isFieldMapping"] = "1"
+            contents.append(content)
+
+        # Lookup the concepts of the chunk in one go
+        concepts = {
+            concept.concept_id: concept
+            for concept in Concept.objects.filter(
+                concept_id__in={
+                    content["concept_id"]
+                    for content in contents
+                    if content["concept_id"]
+                }
+            ).only(
+                "valid_start_date",
+                "valid_end_date",
+                "vocabulary_id",
+                "standard_concept",
+                "concept_class_id",
+            )
+        }
+
+        _buffer.seek(0)
+        _buffer.truncate()
+        for content in contents:
+            # extract concept
+            if concept := concepts.get(content["concept_id"]):
                 content["validity"] = (
                     concept.valid_start_date <= today < concept.valid_end_date
                 )
@@ -357,14 +535,10 @@ def get_mapping_rules_as_csv(qs: QuerySet[MappingRule]) -> io.StringIO:
                 content["concept"] = concept.standard_concept
                 content["class"] = concept.concept_class_id
 
-        # extract and write the contents now
-        content_out = [str(content[x]) for x in headers]
-        writer.writerow(content_out)
-
-    # rewind the buffer and return the response
-    _buffer.seek(0)
-
-    return _buffer
+            # extract and write the contents now
+            content_out = [str(content[x]) for x in headers]
+            writer.writerow(content_out)
+        yield _buffer.getvalue()
 
 
 def make_dag(
@@ -0,0 +1,374 @@
+import csv
+from collections import Counter
+from itertools import chain
+from typing import IO, Any, Iterable, List, Tuple, Union
+
+import openpyxl  # type: ignore
+from openpyxl.workbook.workbook import Workbook  # type: ignore
+
+EXPECTED_HEADERS = [
+    "Table",
+    "Field",
+    "Description",
+    "Type",
+    "Max length",
+    "N rows",
+    "N rows checked",
+    "Fraction empty",
+    "N unique values",
+    "Fraction unique",
+]
+
+DATA_DICTIONARY_HEADERS = ["csv_file_name", "field_name", "code", "value"]
+
+# Sheets that may be in a Scan Report, but are never used.
+IGNORED_SHEETS = ["Table Overview", "_"]
+
+
+class ScanReportCheckError(ValueError):
+    """
+    Raised when a Scan Report or data dictionary fails the consistency checks.
+
+    Args:
+        - errors (List[str]): The messages describing each failure.
+    """
+
+    def __init__(self, errors: List[str]):
+        super().__init__(errors)
+        self.errors = errors
+
+
+def _is_empty(value: Any) -> bool:
+    return value == "" or value is None
+
+
+def check_scan_report(file: Union[str, IO[bytes]]) -> None:
+    """
+    Performs a series of consistency checks on a Scan Report, to quickly identify
+    common data issues so the user can correct them.
+
+    The workbook is opened read-only, so only the rows being checked are held in
+    memory. The Field Overview sheet is read once, and only the header row of each
+    table sheet is read.
+
+    Args:
+        - file (Union[str, IO[bytes]]): The path or file object of the Scan Report.
+            File objects are left open, but not rewound.
+
+    Returns:
+        - None
+
+    Raises:
+        - ScanReportCheckError: At the first stage of checks that fails.
+    """
+    wb = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    try:
+        check_workbook(wb)
+    finally:
+        wb.close()
+
+
+def check_workbook(wb: Workbook) -> None:
+    """
+    Performs the consistency checks of `check_scan_report` on an open workbook.
+
+    The checks run in stages, raising at the first stage that fails:
+        - The Field Overview sheet has the expected headers.
+        - Tables in the Field Overview sheet are separated by a single empty row.
+        - The tables in the Field Overview sheet match the sheets supplied.
+        - The fields of each table match the fields in its sheet, without duplicates.
+
+    Args:
+        - wb (Workbook): The workbook to check, which may be read-only.
+
+    Returns:
+        - None
+
+    Raises:
+        - ScanReportCheckError: At the first stage of checks that fails.
+    """
+    # Get the first sheet 'Field Overview'
+    fo_ws = wb.worksheets[0]
+
+    # Check the headers match the expected headers. Allow unexpected headers after
+    # these. This means old Scan Reports with Flag and Classification columns will be
+    # handled cleanly.
+    source_headers = list(next(fo_ws.iter_rows(max_row=1, values_only=True), ()))
+    if source_headers[:10] != EXPECTED_HEADERS:
+        raise ScanReportCheckError(
+            [
+                f"Please check the following columns exist "
+                f"in the Scan Report (Field Overview sheet) "
+                f"in this order: "
+                f"Table, Field, Description, Type, "
+                f"Max length, N rows, N rows checked, "
+                f"Fraction empty, N unique values, "
+                f"Fraction unique. "
+                f"You provided \n{source_headers[:10]}"
+            ]
+        )
+
+    errors, table_names, tables = _sweep_field_overview(fo_ws)
+    if errors:
+        raise ScanReportCheckError(errors)
+
+    errors = _check_sheet_names(wb, table_names)
+    if errors:
+        raise ScanReportCheckError(errors)
+
+    for table_name, fields in tables:
+        if table_name not in IGNORED_SHEETS:
+            errors.extend(_check_table_fields(wb, table_name, fields))
+    if errors:
+        raise ScanReportCheckError(errors)
+
+
+def _sweep_field_overview(
+    fo_ws: Any,
+) -> Tuple[List[str], set, List[Tuple[Any, List[Any]]]]:
+    """
+    Reads the table and field columns of the Field Overview sheet in a single pass,
+    checking tables are separated by a single empty row and collecting the fields of
+    each table.
+
+    A table is only collected once the empty row after it is reached, and collecting
+    stops at the first two empty rows in a row, as beyond them are spurious rows.
+
+    Args:
+        - fo_ws (Any): The Field Overview worksheet.
+
+    Returns:
+        - Tuple[List[str], set, List[Tuple[Any, List[Any]]]]: The separation errors,
+            the table names, and the name and fields of each table collected.
+    """
+    errors: List[str] = []
+    table_names = set()
+    tables: List[Tuple[Any, List[Any]]] = []
+
+    current_table_fields: List[Any] = []
+    current_table_name = None
+    last_value = None
+    collecting = True
+    rows = fo_ws.iter_rows(min_row=2, max_col=2, values_only=True)
+    first_row = next(rows, None)
+    if first_row is None:
+        return errors, table_names, tables
+    # The first cell is compared with itself.
+    value_above = first_row[0]
+    for value, field in chain([first_row], rows):
+        if (
+            value != value_above and not _is_empty(value) and not _is_empty(value_above)
+        ) or (value == "" and value_above == ""):
+            errors.append(
+                f"At the cell with value {value}, tables in Field Overview "
+                f"table are not correctly separated by "
+                f"a single line. "
+                f"Note: There should be no separator "
+                f"line between the header row and the "
+                f"first row of the first table."
+            )
+        value_above = value
+
+        if not _is_empty(value):
+            table_names.add(value)
+
+        if not collecting:
+            continue
+        if _is_empty(value):
+            # We're at the end of the table, unless this is the second empty line in
+            # a row.
+            if _is_empty(last_value):
+                collecting = False
+                continue
+            tables.append((current_table_name, current_table_fields))
+            current_table_fields = []
+        else:
+            # We can trust the table name not to change within a table, once the
+            # separation check has passed.
+            current_table_fields.append(field)
+            current_table_name = value
+        last_value = value
+
+    table_names.difference_update(IGNORED_SHEETS)
+    return errors, table_names, tables
+
+
+def _check_sheet_names(wb: Workbook, table_names: set) -> List[str]:
+    """
+    Checks the tables in the Field Overview sheet match the sheets supplied.
+
+    Args:
+        - wb (Workbook): The workbook to check.
+        - table_names (set): The table names in the Field Overview sheet.
+
+    Returns:
+        - List[str]: The errors found.
+    """
+    errors: List[str] = []
+    # "Field Overview" is the only required sheet that is not a table name.
+    expected_sheetnames = list(table_names) + ["Field Overview"]
+    actual_sheetnames = set(wb.sheetnames)
+    actual_sheetnames.difference_update(IGNORED_SHEETS)
+
+    if sorted(actual_sheetnames) != sorted(expected_sheetnames):
+        sheets_only = set(actual_sheetnames).difference(expected_sheetnames)
+        fo_only = set(expected_sheetnames).difference(actual_sheetnames)
+        errors.append(
+            "Tables in Field Overview sheet do not match the sheets supplied."
+        )
+        if sheets_only:
+            errors.append(
+                f"{sheets_only} are sheets that do not "
+                f"have matching entries in first column "
+                f"of the Field Overview sheet. "
+            )
+        if fo_only:
+            errors.append(
+                f"{fo_only} are table names in first "
+                f"column of Field Overview sheet but do "
+                f"not have matching sheets supplied."
+            )
+    return errors
+
+
+def _check_table_fields(
+    wb: Workbook, table_name: Any, current_table_fields: List[Any]
+) -> List[str]:
+    """
+    Checks the fields of a table in the Field Overview sheet match the fields in its
+    sheet, and that neither has duplicates.
+
+    Args:
+        - wb (Workbook): The workbook to check.
+        - table_name (Any): The name of the table.
+        - current_table_fields (List[Any]): The fields of the table in the Field
+            Overview sheet.
+
+    Returns:
+        - List[str]: The errors found.
+    """
+    errors: List[str] = []
+    # Get all field names from the associated sheet, by grabbing the first row, and
+    # then grabbing every second column value (because the alternate columns should
+    # be 'Frequency'.
+    header = next(wb[table_name].iter_rows(max_row=1, values_only=True), ())
+    table_sheet_fields = list(header)[::2]
+
+    # Check for multiple columns in a single sheet with the same name
+    for field, count in Counter(table_sheet_fields).items():
+        if count > 1:
+            errors.append(
+                f"Sheet '{table_name}' "
+                f"contains more than one field "
+                f"with the name '{field}'. "
+                f"Field names must be unique "
+                f"within a table."
+            )
+
+    # Check for multiple fields with the same name associated to a single table in
+    # the Field Overview sheet
+    for field, count in Counter(current_table_fields).items():
+        if count > 1:
+            errors.append(
+                f"Field Overview sheet contains "
+                f"more than one field with the "
+                f"name '{field}' against the "
+                f"table '{table_name}'. "
+                f"Field names must be unique "
+                f"within a table."
+            )
+
+    # Check for any fields that are in only one of the Field Overview and the
+    # associated sheet
+    if sorted(table_sheet_fields) != sorted(current_table_fields):
+        sheet_only = set(table_sheet_fields).difference(current_table_fields)
+        fo_only = set(current_table_fields).difference(table_sheet_fields)
+        errors.append(
+            f"Fields in Field Overview against "
+            f"table {table_name} do not "
+            f"match fields in the associated "
+            f"sheet. "
+        )
+        if sheet_only:
+            errors.append(
+                f"{sheet_only} exist in the "
+                f"'{table_name}' sheet "
+                f"but there are no matching "
+                f"entries in the second column "
+                f"of the Field Overview sheet "
+                f"in the rows associated to the "
+                f"table '{table_name}'. "
+            )
+        if fo_only:
+            errors.append(
+                f"{fo_only} exist in second "
+                f"column of Field Over"
+                f"view sheet against the table "
+                f"'{table_name}' but "
+                f"there are no matching column "
+                f"names in the associated sheet "
+                f"'{table_name}'."
+            )
+    return errors
+
+
+def check_data_dictionary(lines: Iterable[str]) -> None:
+    """
+    Checks a data dictionary has the expected headers, and that every line has a
+    table, field and code.
+
+    Args:
+        - lines (Iterable[str]): The lines of the data dictionary CSV, without any
+            byte order mark.
+
+    Returns:
+        - None
+
+    Raises:
+        - ScanReportCheckError: If the headers are wrong, or with every line that
+            fails the checks.
+    """
+    csv_reader = csv.reader(lines)
+
+    # Check first line for correct headers to columns
+    header_line = next(csv_reader, [])
+    if header_line != DATA_DICTIONARY_HEADERS:
+        raise ScanReportCheckError(
+            [
+                f"Dictionary file has incorrect first line. "
+                f"It must be ['csv_file_name', "
+                f"'field_name', 'code', 'value'], but you "
+                f"supplied {header_line}. If this error is "
+                f"showing extra elements, this indicates "
+                f"that another line has >4 elements, "
+                f"which will need to be corrected."
+            ]
+        )
+
+    errors: List[str] = []
+    # Check all rows have either 3 or 4 non-empty elements, and only the 4th can be
+    # empty. Start from 2 because we want to use 1-indexing _and_ skip the first row
+    # which was processed above.
+    for line_no, line in enumerate(csv_reader, start=2):
+        line_length_nonempty = len([element for element in line if element != ""])
+        if line_length_nonempty not in [3, 4]:
+            errors.append(
+                f"Dictionary has "
+                f"{line_length_nonempty} "
+                f"values in line {line_no} ({line}). "
+                f"All lines must "
+                f"have either 3 or 4 entries."
+            )
+        # Check for whether any of the first 3 elements are empty
+        for element_no, element in enumerate(line[:3], start=1):
+            if element == "":
+                errors.append(
+                    f"Dictionary has an empty element "
+                    f"in column {element_no} in line "
+                    f"{line_no}. "
+                    f"Only the 4th element in any line "
+                    f"may be empty."
+                )
+
+    if errors:
+        raise ScanReportCheckError(errors)
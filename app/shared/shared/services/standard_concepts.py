@@ -0,0 +1,57 @@
+from typing import Tuple
+
+from django.db import connection, transaction
+from shared.data.models import Concept, ConceptRelationship
+from shared.mapping.models import StandardConceptMap, StandardConceptMapVersion
+from shared.services.vocabulary_index import get_vocabulary_version
+
+
+def build_standard_concept_maps() -> Tuple[int, str]:
+    """
+    Replaces the Standard Concept Maps with the standard concepts each concept maps to
+    through "Maps to" relationships in the OMOP vocabularies, stamped with their
+    release.
+
+    The maps are built with a single `INSERT ... SELECT` in a transaction, so they're
+    never seen part built.
+
+    Returns:
+        - Tuple[int, str]: The number of maps built, and the release they were built
+            from.
+    """
+    version = get_vocabulary_version() or ""
+    quote_name = connection.ops.quote_name
+    with transaction.atomic():
+        StandardConceptMap.objects.all().delete()
+        StandardConceptMapVersion.objects.all().delete()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {quote_name(StandardConceptMap._meta.db_table)}
+                    (source_concept_id, standard_concept_id)
+                SELECT DISTINCT relationship.concept_id_1, relationship.concept_id_2
+                FROM {quote_name(ConceptRelationship._meta.db_table)} relationship
+                JOIN {quote_name(Concept._meta.db_table)} concept
+                    ON concept.concept_id = relationship.concept_id_2
+                WHERE relationship.relationship_id = %s
+                    AND relationship.concept_id_1 <> relationship.concept_id_2
+                    AND concept.standard_concept = %s
+                """,
+                ["Maps to", "S"],
+            )
+            count = cursor.rowcount
+        StandardConceptMapVersion.objects.create(version=version)
+    return count, version
+
+
+def standard_concept_maps_are_current() -> bool:
+    """
+    Checks the Standard Concept Maps were built from the release of the OMOP
+    vocabularies in the database.
+
+    Returns:
+        - bool: Whether the maps can be used.
+    """
+    return StandardConceptMapVersion.objects.filter(
+        version=get_vocabulary_version() or ""
+    ).exists()
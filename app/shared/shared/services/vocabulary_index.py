@@ -0,0 +1,286 @@
+import mmap
+import os
+import struct
+import sys
+import tempfile
+from array import array
+from hashlib import blake2b
+from typing import BinaryIO, Dict, Iterable, NamedTuple, Optional, Tuple
+
+from shared.data.models import Concept, Vocabulary
+
+MAGIC = b"CARROTVI"
+FORMAT_VERSION = 1
+
+# Magic, format version, slot count, record count and version stamp length.
+_HEADER = struct.Struct("<8sIQQI")
+# Key hash and record offset. Offsets are stored plus one, so zero is an empty slot.
+_SLOT = struct.Struct("<QQ")
+# Key length, domain length, concept_id and standard_concept.
+_RECORD = struct.Struct("<HBic")
+
+# Separates the vocabulary_id from the concept_code in a key. Neither contains tabs.
+_KEY_SEPARATOR = b"\t"
+
+
+class IndexedConcept(NamedTuple):
+    concept_id: int
+    standard_concept: Optional[str]
+    domain_id: str
+
+
+class VocabularyIndexError(ValueError):
+    """
+    Raised when a file is not a vocabulary index this version can read.
+    """
+
+
+def _key(vocabulary_id: str, concept_code: str) -> bytes:
+    return vocabulary_id.encode() + _KEY_SEPARATOR + concept_code.encode()
+
+
+def _hash(key: bytes) -> int:
+    # Stable across processes, unlike hash().
+    return int.from_bytes(blake2b(key, digest_size=8).digest(), "little")
+
+
+def _aligned(size: int) -> int:
+    return (size + 7) & ~7
+
+
+def write_vocabulary_index(
+    path: str,
+    concepts: Iterable[Tuple[str, str, int, Optional[str], str]],
+    version: str,
+) -> int:
+    """
+    Writes a vocabulary index of concepts to a file, keyed by vocabulary_id and
+    concept_code.
+
+    The index is an open addressing hash table, followed by the records it points to,
+    so it can be memory-mapped and probed without being read. It's written to a
+    temporary file then moved into place, so readers never see a partial index, and
+    keep the index they opened until they reopen it.
+
+    Args:
+        - path (str): The path to write the index to.
+        - concepts (Iterable[Tuple[str, str, int, Optional[str], str]]): The
+            vocabulary_id, concept_code, concept_id, standard_concept and domain_id of
+            each concept. Where a vocabulary has several concepts with a code, the
+            first is found. Ordering by vocabulary_id and concept_code lets the others
+            be left out.
+        - version (str): The version stamp of the index, usually the vocabulary release.
+
+    Returns:
+        - int: The number of concepts in the index.
+    """
+    hashes = array("Q")
+    offsets = array("Q")
+    directory = os.path.dirname(os.path.abspath(path))
+    with tempfile.TemporaryFile(dir=directory) as records:
+        offset = 0
+        last_key = None
+        for vocabulary_id, concept_code, concept_id, standard, domain_id in concepts:
+            key = _key(vocabulary_id, concept_code)
+            if key == last_key:
+                continue
+            last_key = key
+            domain = domain_id.encode()
+            record = (
+                _RECORD.pack(
+                    len(key), len(domain), concept_id, (standard or "\0").encode()
+                )
+                + key
+                + domain
+            )
+            records.write(record)
+            hashes.append(_hash(key))
+            offsets.append(offset)
+            offset += len(record)
+
+        # Keep the table at most two thirds full, so probes stay short.
+        slot_count = 1
+        while 2 * slot_count < 3 * len(hashes):
+            slot_count *= 2
+        slots = array("Q", [0]) * (2 * slot_count)
+        mask = slot_count - 1
+        for key_hash, record_offset in zip(hashes, offsets):
+            slot = key_hash & mask
+            while slots[2 * slot + 1]:
+                slot = (slot + 1) & mask
+            slots[2 * slot] = key_hash
+            slots[2 * slot + 1] = record_offset + 1
+        if sys.byteorder == "big":
+            slots.byteswap()
+
+        stamp = version.encode()
+        header = _HEADER.pack(
+            MAGIC, FORMAT_VERSION, slot_count, len(hashes), len(stamp)
+        )
+        header += stamp
+        header += bytes(_aligned(len(header)) - len(header))
+
+        fd, temporary_path = tempfile.mkstemp(dir=directory)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(header)
+                slots.tofile(f)
+                records.seek(0)
+                _copy(records, f)
+            os.replace(temporary_path, path)
+        except BaseException:
+            os.unlink(temporary_path)
+            raise
+    return len(hashes)
+
+
+def _copy(source: BinaryIO, target: BinaryIO) -> None:
+    while chunk := source.read(1024 * 1024):
+        target.write(chunk)
+
+
+class VocabularyIndex:
+    """
+    A read-only, memory-mapped vocabulary index written by `write_vocabulary_index`.
+
+    The file is mapped rather than read, so processes opening the same index share
+    its pages, and only the pages probed are loaded.
+
+    Args:
+        - path (str): The path of the index.
+
+    Raises:
+        - VocabularyIndexError: If the file is not a vocabulary index.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size < _HEADER.size:
+                raise VocabularyIndexError(f"{path} is not a vocabulary index.")
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, format_version, slot_count, record_count, stamp_length = (
+                _HEADER.unpack_from(self._mmap)
+            )
+            if magic != MAGIC:
+                raise VocabularyIndexError(f"{path} is not a vocabulary index.")
+            if format_version != FORMAT_VERSION:
+                raise VocabularyIndexError(
+                    f"{path} has format version {format_version}, "
+                    f"expected {FORMAT_VERSION}."
+                )
+        except VocabularyIndexError:
+            self._mmap.close()
+            raise
+        stamp_end = _HEADER.size + stamp_length
+        self.version = self._mmap[_HEADER.size : stamp_end].decode()
+        self._mask = slot_count - 1
+        self._slots_start = _aligned(stamp_end)
+        self._records_start = self._slots_start + _SLOT.size * slot_count
+        self._record_count = record_count
+
+    def __len__(self) -> int:
+        return self._record_count
+
+    def get(self, vocabulary_id: str, concept_code: str) -> Optional[IndexedConcept]:
+        """
+        Looks up a concept by its vocabulary and code.
+
+        Args:
+            - vocabulary_id (str): The vocabulary of the concept.
+            - concept_code (str): The code of the concept.
+
+        Returns:
+            - Optional[IndexedConcept]: The concept, or None if there isn't one.
+        """
+        key = _key(vocabulary_id, concept_code)
+        key_hash = _hash(key)
+        slot = key_hash & self._mask
+        while True:
+            slot_hash, offset = _SLOT.unpack_from(
+                self._mmap, self._slots_start + _SLOT.size * slot
+            )
+            if not offset:
+                return None
+            if slot_hash == key_hash:
+                start = self._records_start + offset - 1
+                key_length, domain_length, concept_id, standard = _RECORD.unpack_from(
+                    self._mmap, start
+                )
+                key_start = start + _RECORD.size
+                domain_start = key_start + key_length
+                if self._mmap[key_start:domain_start] == key:
+                    return IndexedConcept(
+                        concept_id,
+                        None if standard == b"\0" else standard.decode(),
+                        self._mmap[
+                            domain_start : domain_start + domain_length
+                        ].decode(),
+                    )
+            slot = (slot + 1) & self._mask
+
+    def get_many(
+        self, vocabulary_id: str, concept_codes: Iterable[str]
+    ) -> Dict[str, IndexedConcept]:
+        """
+        Looks up the concepts of many codes in a vocabulary.
+
+        Args:
+            - vocabulary_id (str): The vocabulary of the concepts.
+            - concept_codes (Iterable[str]): The codes to look up.
+
+        Returns:
+            - Dict[str, IndexedConcept]: The concepts found, keyed by their code.
+        """
+        found: Dict[str, IndexedConcept] = {}
+        for concept_code in concept_codes:
+            concept = self.get(vocabulary_id, concept_code)
+            if concept is not None:
+                found[concept_code] = concept
+        return found
+
+    def close(self) -> None:
+        self._mmap.close()
+
+
+def get_vocabulary_version() -> Optional[str]:
+    """
+    Gets the release of the OMOP vocabularies in the database, used to stamp
+    vocabulary indexes.
+
+    Returns:
+        - Optional[str]: The version of the "None" vocabulary, which OMOP uses for the
+            release of the vocabularies as a whole, or None if there isn't one.
+    """
+    return (
+        Vocabulary.objects.filter(vocabulary_id="None")
+        .values_list("vocabulary_version", flat=True)
+        .first()
+    )
+
+
+def build_vocabulary_index(path: str, chunk_size: int = 10000) -> Tuple[int, str]:
+    """
+    Builds a vocabulary index of every concept in the OMOP concept table.
+
+    Args:
+        - path (str): The path to write the index to.
+        - chunk_size (int): The number of concepts to fetch from the database at once.
+
+    Returns:
+        - Tuple[int, str]: The number of concepts in the index, and its version stamp.
+    """
+    version = get_vocabulary_version() or ""
+    concepts = (
+        Concept.objects.order_by("vocabulary_id", "concept_code", "concept_id")
+        .values_list(
+            "vocabulary_id",
+            "concept_code",
+            "concept_id",
+            "standard_concept",
+            "domain_id",
+        )
+        .iterator(chunk_size=chunk_size)
+    )
+    return write_vocabulary_index(path, concepts, version), version
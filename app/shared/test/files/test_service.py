@@ -0,0 +1,51 @@
+import base64
+from unittest.mock import MagicMock, patch
+
+import pytest
+from shared.files.service import upload_blob_blocks
+
+
+@pytest.fixture
+def mock_blob_client():
+    mock_blob_client = MagicMock()
+    mock_service_client = MagicMock()
+    mock_service_client.get_blob_client.return_value = mock_blob_client
+    with patch(
+        "shared.files.service.BlobServiceClient.from_connection_string",
+        return_value=mock_service_client,
+    ):
+        yield mock_blob_client
+
+
+def test_upload_blob_blocks(mock_blob_client):
+    # Act
+    upload_blob_blocks(
+        "rules.json",
+        "rules-exports",
+        iter([b"abc", b"defgh", b"", b"ij"]),
+        "application/json",
+        block_size=4,
+    )
+
+    # Assert
+    staged = [call.args for call in mock_blob_client.stage_block.call_args_list]
+    assert [data for _, data in staged] == [b"abcd", b"efgh", b"ij"]
+    block_ids = [block_id for block_id, _ in staged]
+    assert [base64.b64decode(block_id) for block_id in block_ids] == [
+        b"00000000",
+        b"00000001",
+        b"00000002",
+    ]
+    (blocks,), kwargs = mock_blob_client.commit_block_list.call_args
+    assert [block.id for block in blocks] == block_ids
+    assert kwargs["content_settings"].content_type == "application/json"
+
+
+def test_upload_blob_blocks_empty(mock_blob_client):
+    # Act
+    upload_blob_blocks("rules.json", "rules-exports", iter([]), "application/json")
+
+    # Assert
+    mock_blob_client.stage_block.assert_not_called()
+    mock_blob_client.commit_block_list.assert_called_once()
+    assert mock_blob_client.commit_block_list.call_args.args == ([],)
@@ -0,0 +1,107 @@
+import csv
+import io
+import os
+from datetime import datetime, timezone
+from decimal import Decimal
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "settings")
+import django
+
+django.setup()
+
+from shared.mapping.models import ScanReportValue
+from shared.services.bulk_load import (
+    CsvRowStream,
+    ValueColumns,
+    _csv_field,
+    bulk_load_value_columns,
+    copy_rows,
+)
+
+ROWS = [
+    (1, "apple", 20, None, datetime(2024, 1, 2, 3, 4, 5, tzinfo=timezone.utc)),
+    (2, "", 0, 'say "hi", then\nleave', datetime(2024, 1, 2, tzinfo=timezone.utc)),
+    (3, "x" * 100, 5, "", None),
+]
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        (None, ""),
+        ("", '""'),
+        ('a "b", c', '"a ""b"", c"'),
+        (True, "t"),
+        (False, "f"),
+        (12, "12"),
+        (Decimal("0.25"), "0.25"),
+        (datetime(2024, 1, 2, 3, 4, 5), "2024-01-02T03:04:05"),
+    ],
+)
+def test_csv_field(value, expected):
+    assert _csv_field(value) == expected
+
+
+@pytest.mark.parametrize("size", [-1, 1, 7, 64 * 1024])
+def test_csv_row_stream(size):
+    stream = CsvRowStream(ROWS)
+
+    chunks = []
+    while chunk := stream.read(size):
+        assert size < 0 or len(chunk) <= size
+        chunks.append(chunk)
+
+    data = "".join(chunks)
+    parsed = list(csv.reader(io.StringIO(data)))
+    assert len(parsed) == len(ROWS)
+    assert parsed[1][3] == 'say "hi", then\nleave'
+    # NULLs are unquoted and empty, empty strings are quoted.
+    assert data.splitlines()[0].endswith(",,2024-01-02T03:04:05+00:00")
+    assert data.splitlines()[-1].endswith(',5,"",')
+    assert stream.rows == len(ROWS)
+
+
+@pytest.fixture
+def postgres_connection():
+    connection = MagicMock(vendor="postgresql")
+    connection.ops.quote_name = lambda name: f'"{name}"'
+    connection.copied = []
+    cursor = connection.cursor.return_value.__enter__.return_value
+    cursor.copy_expert.side_effect = lambda sql, stream, size: connection.copied.append(
+        stream.read()
+    )
+    with patch("shared.services.bulk_load.connections", {"default": connection}):
+        yield connection
+
+
+def test_copy_rows(postgres_connection):
+    count = copy_rows(ScanReportValue, ["value", "frequency"], [("a", 1), ("b", 2)])
+
+    assert count == 2
+    cursor = postgres_connection.cursor.return_value.__enter__.return_value
+    sql = cursor.copy_expert.call_args.args[0]
+    assert sql == (
+        'COPY "mapping_scanreportvalue" ("value", "frequency") '
+        "FROM STDIN WITH (FORMAT csv)"
+    )
+    assert postgres_connection.copied == ['"a",1\n"b",2\n']
+
+
+def test_bulk_load_value_columns(postgres_connection):
+    columns = ValueColumns(
+        field_ids=[1, 2],
+        values=["a", ""],
+        frequencies=[10, 0],
+        descriptions=["A", None],
+    )
+
+    with patch("shared.services.bulk_load.timezone.now", return_value="now"):
+        count = bulk_load_value_columns(columns)
+
+    assert count == 2
+    assert postgres_connection.copied == [
+        '1,"a",10,"A",-1,"now","now"\n2,"",0,,-1,"now","now"\n'
+    ]
@@ -0,0 +1,98 @@
+import os
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "settings")
+import django
+
+django.setup()
+
+from django.db.backends.postgresql.base import DatabaseWrapper
+from shared.data.models import Concept
+from shared.services import lookups
+from shared.services.lookups import choose_strategy, lookup_in
+
+
+def _postgresql():
+    # Compiles queries for PostgreSQL without connecting.
+    return DatabaseWrapper(
+        {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": "",
+            "OPTIONS": {},
+            "TIME_ZONE": None,
+            "CONN_MAX_AGE": 0,
+            "CONN_HEALTH_CHECKS": False,
+            "AUTOCOMMIT": True,
+        }
+    )
+
+
+@pytest.fixture
+def connections():
+    with patch("shared.services.lookups.connections") as connections:
+        connections.__getitem__.return_value = _postgresql()
+        yield connections
+
+
+@pytest.mark.parametrize(
+    "count, vendor, strategy",
+    [
+        (lookups.IN_CHUNK_SIZE, "postgresql", "in"),
+        (lookups.IN_CHUNK_SIZE + 1, "postgresql", "temp_table"),
+        (lookups.IN_CHUNK_SIZE + 1, "sqlite", "in"),
+    ],
+)
+def test_choose_strategy(connections, count, vendor, strategy):
+    connections.__getitem__.return_value = MagicMock(vendor=vendor)
+
+    assert choose_strategy(count, "default") == strategy
+
+
+def test_lookup_in_chunks(connections, monkeypatch):
+    monkeypatch.setattr(lookups, "IN_CHUNK_SIZE", 2)
+    queryset = MagicMock(model=Concept)
+    queryset.filter.side_effect = lambda **kwargs: [
+        (value,) for value in kwargs["concept_id__in"]
+    ]
+
+    result = lookup_in(queryset, "concept_id", ["1", 2, "2", 3], strategy="in")
+
+    assert result.strategy == "in"
+    assert result.queries == 2
+    assert sorted(result.rows) == [(1,), (2,), (3,)]
+
+
+def test_lookup_in_without_values(connections):
+    queryset = MagicMock(model=Concept)
+
+    result = lookup_in(queryset, "concept_code", [])
+
+    assert (result.strategy, result.rows, result.queries) == ("in", [], 0)
+    queryset.filter.assert_not_called()
+
+
+@patch("shared.services.lookups.transaction")
+def test_lookup_in_temp_table(transaction, connections):
+    # Runs the queries on cursors that don't connect, counting each one.
+    connection = connections.__getitem__.return_value
+    connection.ensure_connection = MagicMock()
+    connection.create_cursor = MagicMock()
+
+    def _filter(**kwargs):
+        # Selects the rows, then prefetches their relations
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT")
+            cursor.execute("SELECT")
+        return [(1,)]
+
+    queryset = MagicMock(model=Concept)
+    queryset.filter.side_effect = _filter
+
+    result = lookup_in(queryset, "concept_code", ["A01", "A02"], strategy="temp_table")
+
+    # CREATE, COPY, ANALYZE and both SELECTs
+    assert result.strategy == "temp_table"
+    assert result.queries == 5
+    assert result.rows == [(1,)]
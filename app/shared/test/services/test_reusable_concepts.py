@@ -0,0 +1,122 @@
+import os
+from unittest.mock import patch
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "settings")
+import django
+
+django.setup()
+
+from django.db.models import DEFERRED
+from shared.mapping import signals
+from shared.mapping.models import (
+    ScanReport,
+    ScanReportConcept,
+    ScanReportField,
+    ScanReportValue,
+)
+
+
+def test__remember_reuse_state_skips_deferred_fields():
+    # Arrange
+    value = ScanReportValue.from_db("default", ["id", "value"], [1, "M"])
+
+    # Assert
+    assert value._reuse_state == ("M", DEFERRED)
+
+
+def test__refresh_changed_reusable_concepts_on_change():
+    # Arrange
+    field = ScanReportField.from_db("default", ["id", "name"], [1, "sex"])
+    field.name = "gender"
+
+    # Act
+    with (
+        patch.object(signals.transaction, "on_commit") as on_commit,
+        patch.object(signals, "refresh_reusable_concepts") as refresh,
+    ):
+        signals.refresh_changed_reusable_concepts(
+            ScanReportField, field, created=False, raw=False
+        )
+        # Refreshed once the change is committed
+        refresh.assert_not_called()
+        on_commit.call_args.args[0]()
+
+    # Assert
+    refresh.assert_called_once_with(scan_report_field_ids=[1])
+    assert field._reuse_state == ("gender",)
+
+
+def test__refresh_changed_reusable_concepts_skips_unchanged_and_new():
+    # Arrange
+    unchanged = ScanReportValue.from_db(
+        "default", ["id", "value", "value_description"], [1, "M", None]
+    )
+    new = ScanReportValue(id=2, value="F", value_description=None)
+
+    # Act
+    with patch.object(signals.transaction, "on_commit") as on_commit:
+        signals.refresh_changed_reusable_concepts(
+            ScanReportValue, unchanged, created=False, raw=False
+        )
+        signals.refresh_changed_reusable_concepts(
+            ScanReportValue, new, created=True, raw=False
+        )
+
+    # Assert
+    on_commit.assert_not_called()
+
+
+def test__refresh_changed_reusable_concepts_on_dataset_move():
+    # Arrange
+    scan_report = ScanReport.from_db(
+        "default",
+        ["id", "mapping_status_id", "hidden", "parent_dataset_id"],
+        [1, 2, False, 3],
+    )
+    scan_report.parent_dataset_id = 4
+
+    # Act
+    with (
+        patch.object(signals.transaction, "on_commit", side_effect=lambda f: f()),
+        patch.object(signals, "refresh_reusable_concepts") as refresh,
+    ):
+        signals.refresh_changed_reusable_concepts(
+            ScanReport, scan_report, created=False, raw=False
+        )
+
+    # Assert
+    refresh.assert_called_once_with(scan_report_ids=[1])
+
+
+def test__refresh_changed_reusable_concepts_not_loaded():
+    # Arrange
+    value = ScanReportValue(id=1, value="M", value_description=None)
+
+    # Act
+    with patch.object(signals.transaction, "on_commit") as on_commit:
+        signals.refresh_changed_reusable_concepts(
+            ScanReportValue, value, created=False, raw=False
+        )
+
+    # Assert
+    on_commit.assert_called_once()
+
+
+def test__add_reusable_concept():
+    # Arrange
+    concept = ScanReportConcept(id=3)
+
+    # Act
+    with (
+        patch.object(signals.transaction, "on_commit", side_effect=lambda f: f()),
+        patch.object(signals, "refresh_reusable_concepts") as refresh,
+    ):
+        signals.add_reusable_concept(
+            ScanReportConcept, concept, created=True, raw=False
+        )
+        signals.add_reusable_concept(
+            ScanReportConcept, concept, created=False, raw=False
+        )
+
+    # Assert
+    refresh.assert_called_once_with(scan_report_concept_ids=[3])
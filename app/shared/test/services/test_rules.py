@@ -8,8 +8,10 @@ import django
 
 django.setup()
 
-from shared.mapping.models import OmopField, ScanReportField, ScanReportTable
+from shared.data.models import Concept
+from shared.mapping.models import OmopField, OmopTable, ScanReportField, ScanReportTable
 from shared.services import rules
+from shared.services.omop_registry import OmopRegistry, clear_omop_registry
 
 
 def test__validate_person_id_and_date():
@@ -45,13 +47,131 @@ def test_get_omop_field_without_destination_table(mock_omop_field):
     # Arrange
     destination_field = "test"
     expected_omop_field = mock_omop_field
+    expected_omop_field.field = destination_field
+    clear_omop_registry()
 
-    with patch("shared.services.rules.OmopField.objects") as mock_omop_field_objects:
-        mock_omop_field_objects.filter.return_value = [expected_omop_field]
+    with patch(
+        "shared.services.omop_registry.OmopField.objects"
+    ) as mock_omop_field_objects:
+        mock_omop_field_objects.select_related.return_value.order_by.return_value = [
+            expected_omop_field
+        ]
 
         # Act
         result = rules._get_omop_field(destination_field)
+        # The fields are loaded once.
+        rules._get_omop_field(destination_field)
 
         # Assert
-        mock_omop_field_objects.filter.assert_called_once_with(field=destination_field)
+        mock_omop_field_objects.select_related.assert_called_once_with("table")
         assert result == expected_omop_field
+    clear_omop_registry()
+
+
+@pytest.fixture
+def omop_registry():
+    fields = []
+    for table_id, (table, names) in enumerate(
+        {
+            "person": ["person_id", "birth_datetime"],
+            "observation": [
+                "person_id",
+                "observation_datetime",
+                "observation_concept_id",
+                "observation_source_concept_id",
+                "observation_source_value",
+                "value_as_number",
+                "value_as_string",
+            ],
+            "visit_occurrence": ["person_id", "visit_source_concept_id"],
+        }.items()
+    ):
+        omop_table = OmopTable(id=table_id, table=table)
+        fields += [
+            OmopField(id=len(fields) + i, table=omop_table, field=name)
+            for i, name in enumerate(names)
+        ]
+    return OmopRegistry(fields)
+
+
+def test__omop_registry(omop_registry):
+    # Fields in several tables are looked up in the allowed tables.
+    assert omop_registry.get_field("person_id").table.table == "person"
+    assert (
+        omop_registry.get_field("person_id", "observation").table.table == "observation"
+    )
+    assert omop_registry.get_field("missing") is None
+    assert omop_registry.get_field("birth_datetime", "observation") is None
+
+    assert omop_registry.get_domain_field("observation").field == (
+        "observation_source_concept_id"
+    )
+    # Visits aren't an allowed table.
+    assert omop_registry.get_domain_field("visit") is None
+    assert [field.field for field in omop_registry.get_date_fields("person")] == [
+        "birth_datetime"
+    ]
+    assert [
+        omop_registry.fields[id].field for id in omop_registry.get_concept_field_ids()
+    ] == ["observation_concept_id"]
+
+
+def test__get_rule_targets(omop_registry):
+    # Arrange
+    table = ScanReportTable(
+        person_id=ScanReportField(id=1), date_event=ScanReportField(id=2)
+    )
+    source_field = ScanReportField(id=3, type_column="VARCHAR", scan_report_table=table)
+
+    # Act
+    targets = rules._get_rule_targets(
+        Concept(domain_id="Observation"), source_field, omop_registry
+    )
+
+    # Assert
+    assert [
+        (omop_field.field, source_field_id) for omop_field, source_field_id in targets
+    ] == [
+        ("person_id", 1),
+        ("observation_datetime", 2),
+        ("observation_source_concept_id", 3),
+        ("observation_concept_id", 3),
+        ("observation_source_value", 3),
+        ("value_as_string", 3),
+    ]
+    assert all(omop_field.table.table == "observation" for omop_field, _ in targets)
+
+
+def test__get_rule_targets_without_destination(omop_registry):
+    # Arrange
+    table = ScanReportTable(
+        person_id=ScanReportField(id=1), date_event=ScanReportField(id=2)
+    )
+    source_field = ScanReportField(id=3, type_column="INT", scan_report_table=table)
+
+    # Act & Assert
+    # Visits aren't an allowed table, and there are no drug fields.
+    for domain in ["Visit", "Drug"]:
+        assert (
+            rules._get_rule_targets(
+                Concept(domain_id=domain), source_field, omop_registry
+            )
+            is None
+        )
+
+
+def test__get_rule_templates(omop_registry):
+    # Act
+    templates = rules._get_rule_templates("observation", "varchar", omop_registry)
+
+    # Assert
+    assert [(field.field, source) for field, source in templates] == [
+        ("person_id", "person_id"),
+        ("observation_datetime", "date_event"),
+        ("observation_source_concept_id", "source_field"),
+        ("observation_concept_id", "source_field"),
+        ("observation_source_value", "source_field"),
+        ("value_as_string", "source_field"),
+    ]
+    assert omop_registry.get_domains() == ["meas value", "observation", "visit"]
+    assert rules._get_rule_templates("visit", "int", omop_registry) is None
@@ -0,0 +1,167 @@
+import io
+
+import openpyxl
+import pytest
+from shared.services.scan_report_checks import (
+    EXPECTED_HEADERS,
+    ScanReportCheckError,
+    check_data_dictionary,
+    check_scan_report,
+)
+
+
+def _scan_report(field_overview, sheets):
+    wb = openpyxl.Workbook()
+    fo_ws = wb.active
+    fo_ws.title = "Field Overview"
+    fo_ws.append(EXPECTED_HEADERS)
+    for row in field_overview:
+        fo_ws.append(row)
+    for name, fields in sheets.items():
+        header = []
+        for field in fields:
+            header += [field, "Frequency"]
+        wb.create_sheet(name).append(header)
+    file = io.BytesIO()
+    wb.save(file)
+    file.seek(0)
+    return file
+
+
+FIELD_OVERVIEW = [
+    ["Person", "id"],
+    ["Person", "sex"],
+    [None],
+    ["Visit", "id"],
+    ["Visit", "date"],
+    ["", None, "End"],
+]
+SHEETS = {"Person": ["id", "sex"], "Visit": ["date", "id"]}
+
+
+def test_check_scan_report():
+    file = _scan_report(FIELD_OVERVIEW, {**SHEETS, "Table Overview": []})
+
+    check_scan_report(file)
+
+    # The file is left open, so it can be uploaded.
+    file.seek(0)
+    assert file.read(2) == b"PK"
+
+
+def test_check_scan_report_headers():
+    wb = openpyxl.Workbook()
+    wb.active.append(["Table", "Field", "Type"])
+    file = io.BytesIO()
+    wb.save(file)
+
+    with pytest.raises(ScanReportCheckError) as e:
+        check_scan_report(file)
+
+    assert len(e.value.errors) == 1
+    assert e.value.errors[0].endswith("You provided \n['Table', 'Field', 'Type']")
+
+
+def test_check_scan_report_separation():
+    field_overview = [
+        ["Person", "id"],
+        ["Visit", "id"],
+        [None],
+        ["Visit", "date"],
+        ["Drug", "id"],
+    ]
+    file = _scan_report(field_overview, {})
+
+    with pytest.raises(ScanReportCheckError) as e:
+        check_scan_report(file)
+
+    # Stops before comparing the sheets.
+    assert [error.split(",")[0] for error in e.value.errors] == [
+        "At the cell with value Visit",
+        "At the cell with value Drug",
+    ]
+
+
+def test_check_scan_report_sheet_names():
+    file = _scan_report(FIELD_OVERVIEW, {"Person": ["id", "sex"], "Drug": ["id"]})
+
+    with pytest.raises(ScanReportCheckError) as e:
+        check_scan_report(file)
+
+    assert e.value.errors == [
+        "Tables in Field Overview sheet do not match the sheets supplied.",
+        "{'Drug'} are sheets that do not have matching entries in first column of "
+        "the Field Overview sheet. ",
+        "{'Visit'} are table names in first column of Field Overview sheet but do "
+        "not have matching sheets supplied.",
+    ]
+
+
+def test_check_scan_report_table_fields():
+    field_overview = [
+        ["Person", "id"],
+        ["Person", "id"],
+        [None],
+        *FIELD_OVERVIEW[3:],
+    ]
+    sheets = {"Person": ["id", "id", "sex"], "Visit": ["date", "id"]}
+    file = _scan_report(field_overview, sheets)
+
+    with pytest.raises(ScanReportCheckError) as e:
+        check_scan_report(file)
+
+    assert e.value.errors == [
+        "Sheet 'Person' contains more than one field with the name 'id'. "
+        "Field names must be unique within a table.",
+        "Field Overview sheet contains more than one field with the name 'id' "
+        "against the table 'Person'. Field names must be unique within a table.",
+        "Fields in Field Overview against table Person do not match fields in the "
+        "associated sheet. ",
+        "{'sex'} exist in the 'Person' sheet but there are no matching entries in "
+        "the second column of the Field Overview sheet in the rows associated to "
+        "the table 'Person'. ",
+    ]
+
+
+def test_check_scan_report_stops_after_two_empty_rows():
+    # Tables after two empty rows are spurious, so their fields aren't compared.
+    field_overview = [*FIELD_OVERVIEW[:3], [None], *FIELD_OVERVIEW[3:]]
+    file = _scan_report(field_overview, {**SHEETS, "Visit": ["other"]})
+
+    check_scan_report(file)
+
+
+def test_check_scan_report_without_tables():
+    check_scan_report(_scan_report([], {}))
+
+
+def test_check_data_dictionary():
+    check_data_dictionary(
+        [
+            "csv_file_name,field_name,code,value",
+            "Person,sex,M,Male",
+            "Person,sex,F,",
+        ]
+    )
+
+
+@pytest.mark.parametrize("lines", [[], ["table,field,code,value"]])
+def test_check_data_dictionary_headers(lines):
+    with pytest.raises(ScanReportCheckError) as e:
+        check_data_dictionary(lines)
+
+    assert e.value.errors[0].startswith("Dictionary file has incorrect first line.")
+
+
+def test_check_data_dictionary_lines():
+    lines = ["csv_file_name,field_name,code,value", "Person,,M,Male", "Person,sex"]
+
+    with pytest.raises(ScanReportCheckError) as e:
+        check_data_dictionary(lines)
+
+    assert e.value.errors == [
+        "Dictionary has an empty element in column 2 in line 2. "
+        "Only the 4th element in any line may be empty.",
+        "Dictionary has 2 values in line 3 (['Person', 'sex']). "
+        "All lines must have either 3 or 4 entries.",
+    ]
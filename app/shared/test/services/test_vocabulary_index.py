@@ -0,0 +1,82 @@
+import os
+
+import pytest
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "settings")
+import django
+
+django.setup()
+
+from shared.services.vocabulary_index import (
+    IndexedConcept,
+    VocabularyIndex,
+    VocabularyIndexError,
+    write_vocabulary_index,
+)
+
+CONCEPTS = [
+    ("ICD10", "A01", 1, None, "Condition"),
+    ("ICD10", "A01", 2, "S", "Condition"),
+    ("LOINC", "A01", 3, "S", "Measurement"),
+    ("SNOMED", "123", 4, "S", "Condition"),
+    ("SNOMED", "é", 5, "C", "Observation"),
+]
+
+
+def test_vocabulary_index(tmp_path):
+    path = str(tmp_path / "vocabulary.idx")
+
+    assert write_vocabulary_index(path, CONCEPTS, "v5.0 30-AUG-23") == 4
+    index = VocabularyIndex(path)
+
+    assert index.version == "v5.0 30-AUG-23"
+    assert len(index) == 4
+    # The first concept of a code in a vocabulary is found.
+    assert index.get("ICD10", "A01") == IndexedConcept(1, None, "Condition")
+    assert index.get("LOINC", "A01") == IndexedConcept(3, "S", "Measurement")
+    assert index.get("SNOMED", "é") == IndexedConcept(5, "C", "Observation")
+    assert index.get("SNOMED", "A01") is None
+    assert index.get_many("SNOMED", ["123", "124", "é"]) == {
+        "123": IndexedConcept(4, "S", "Condition"),
+        "é": IndexedConcept(5, "C", "Observation"),
+    }
+    index.close()
+
+
+def test_vocabulary_index_unordered_duplicates(tmp_path):
+    path = str(tmp_path / "vocabulary.idx")
+    concepts = [CONCEPTS[1], CONCEPTS[3], CONCEPTS[0]]
+
+    write_vocabulary_index(path, concepts, "")
+
+    assert VocabularyIndex(path).get("ICD10", "A01").concept_id == 2
+
+
+def test_vocabulary_index_without_concepts(tmp_path):
+    path = str(tmp_path / "vocabulary.idx")
+
+    assert write_vocabulary_index(path, [], "") == 0
+
+    assert VocabularyIndex(path).get("SNOMED", "123") is None
+
+
+def test_vocabulary_index_replaces_index(tmp_path):
+    path = str(tmp_path / "vocabulary.idx")
+    write_vocabulary_index(path, CONCEPTS, "old")
+    old = VocabularyIndex(path)
+
+    write_vocabulary_index(path, CONCEPTS[3:], "new")
+
+    # Open indexes are unchanged until they are reopened.
+    assert old.get("ICD10", "A01") is not None
+    assert VocabularyIndex(path).get("ICD10", "A01") is None
+    assert VocabularyIndex(path).version == "new"
+
+
+@pytest.mark.parametrize("content", [b"", b"not a vocabulary index at all"])
+def test_vocabulary_index_invalid(tmp_path, content):
+    path = tmp_path / "vocabulary.idx"
+    path.write_bytes(content)
+
+    with pytest.raises(VocabularyIndexError):
+        VocabularyIndex(str(path))
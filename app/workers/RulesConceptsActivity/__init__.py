@@ -1,6 +1,6 @@
 import os
 from collections import defaultdict
-from typing import Any, Dict, List, Union
+from typing import Any, Dict, Iterable, List, Tuple, Union
 
 from shared_code import blob_parser, helpers
 from shared_code.logger import logger
@@ -13,12 +13,11 @@ django.setup()
 
 from shared.data.models import Concept
 from shared.mapping.models import ScanReportConcept, ScanReportTable
+from shared.services.reusable_concepts import refresh_reusable_concepts
+from shared.services.standard_concepts import standard_concept_maps_are_current
 from shared_code import db
-from shared_code.db import (
-    update_job,
-    JobStageType,
-    StageStatusType,
-)
+from shared_code.db import JobStageType, StageStatusType, update_job
+
 from .reuse import reuse_existing_field_concepts, reuse_existing_value_concepts
 
 
@@ -34,27 +33,16 @@ def _create_concepts(
     Returns:
         - List[ScanReportConcept]: List of Scan Report Concepts.
     """
-    concepts: List[ScanReportConcept] = []
+    concept_object_ids: List[Tuple[Union[str, int], str]] = []
     for concept in table_values:
         if concept["concept_id"] != -1:
             if isinstance(concept["concept_id"], list):
                 for concept_id in concept["concept_id"]:
-                    concept_instance = db.create_concept(
-                        concept_id, concept["id"], ScanReportConceptContentType.VALUE
-                    )
-                    if concept_instance is not None:
-                        concepts.append(concept_instance)
+                    concept_object_ids.append((concept_id, concept["id"]))
             else:
-                if (
-                    concept_instance := db.create_concept(
-                        concept["concept_id"],
-                        concept["id"],
-                        ScanReportConceptContentType.VALUE,
-                    )
-                ) is not None:
-                    concepts.append(concept_instance)
+                concept_object_ids.append((concept["concept_id"], concept["id"]))
 
-    return concepts
+    return db.create_concepts(concept_object_ids, ScanReportConceptContentType.VALUE)
 
 
 def _transform_concepts(
@@ -87,12 +75,18 @@ def _transform_concepts(
     for entry in table_values:
         entries_grouped_by_vocab[entry["vocabulary_id"]].append(entry)
 
+    # Checked once for the table, rather than for every vocabulary
+    use_standard_concept_maps = (
+        any(vocab is not None for vocab in entries_grouped_by_vocab)
+        and standard_concept_maps_are_current()
+    )
+
     for vocab, value in entries_grouped_by_vocab.items():
         if vocab is None:
             # Set to defaults, and skip all the remaining processing that a vocab would require
             _set_defaults_for_none_vocab(value)
         else:
-            _process_concepts_for_vocab(vocab, value, table)
+            _process_concepts_for_vocab(vocab, value, table, use_standard_concept_maps)
 
 
 def _set_defaults_for_none_vocab(entries: List[ScanReportValueDict]) -> None:
@@ -112,7 +106,10 @@ def _set_defaults_for_none_vocab(entries: List[ScanReportValueDict]) -> None:
 
 
 def _process_concepts_for_vocab(
-    vocab: str, entries: List[ScanReportValueDict], table: ScanReportTable
+    vocab: str,
+    entries: List[ScanReportValueDict],
+    table: ScanReportTable,
+    use_standard_concept_maps: bool,
 ) -> None:
     """
     Process concepts for a specific vocabulary.
@@ -120,6 +117,7 @@ def _process_concepts_for_vocab(
     Args:
         - vocab (str): The vocabulary to process concepts for.
         - entries (List[ScanReportValueDict]): A list of Scan Report Value dictionaries representing the entries.
+        - use_standard_concept_maps (bool): Whether the Standard Concept Maps can be used.
 
     Returns:
         - None
@@ -140,14 +138,15 @@ def _process_concepts_for_vocab(
     )
     _match_concepts_to_entries(entries, concept_vocab_content)
     logger.debug("finished matching")
-    _batch_process_non_standard_concepts(entries)
+    _batch_process_non_standard_concepts(entries, use_standard_concept_maps)
 
 
 def _get_concepts_for_vocab(
     vocab: str, entries: List[ScanReportValueDict]
 ) -> List[Concept]:
     """
-    Get Concepts for a specific vocabulary.
+    Get Concepts for a specific vocabulary, from the vocabulary index if there is one,
+    otherwise from the database.
 
     Args:
         - vocab (str): The vocabulary to get concepts for.
@@ -157,13 +156,45 @@ def _get_concepts_for_vocab(
         - List[Concept]: A list of Concepts matching the filter.
 
     """
-    concept_codes = [entry["value"] for entry in entries]
+    concept_codes = list({entry["value"] for entry in entries})
+
+    vocabulary_index = db.get_vocabulary_index()
+    if vocabulary_index is not None:
+        return [
+            Concept(
+                concept_id=concept.concept_id,
+                concept_code=concept_code,
+                vocabulary_id=vocab,
+                standard_concept=concept.standard_concept,
+                domain_id=concept.domain_id,
+            )
+            for concept_code, concept in vocabulary_index.get_many(
+                vocab, map(str, concept_codes)
+            ).items()
+        ]
+
+    return db.lookup(
+        Concept.objects.filter(vocabulary_id=vocab), "concept_code", concept_codes
+    )
+
+
+def _index_concepts_by_code(concepts: Iterable[Concept]) -> Dict[str, Concept]:
+    """
+    Index concepts of a vocabulary by their concept code.
+
+    Where concepts share a code, the first is kept, so lookups match the first
+    concept with that code.
 
-    concepts = Concept.objects.filter(
-        concept_code__in=concept_codes, vocabulary_id=vocab
-    ).all()
+    Args:
+        - concepts (Iterable[Concept]): The concepts of a vocabulary.
 
-    return list(concepts)
+    Returns:
+        - Dict[str, Concept]: The concepts, keyed by their concept code as a string.
+    """
+    concepts_by_code: Dict[str, Concept] = {}
+    for concept in concepts:
+        concepts_by_code.setdefault(str(concept.concept_code), concept)
+    return concepts_by_code
 
 
 def _match_concepts_to_entries(
@@ -173,9 +204,9 @@ def _match_concepts_to_entries(
     Match concepts to entries.
 
     Remarks:
-        Loop over all returned concepts, and match their concept_code and vocabulary_id with
-        the full_value in the entries, and set the latter's
-        concept_id and standard_concept with those values
+        Index the returned concepts by concept_code, then look up the full_value of
+        each entry, and set the latter's concept_id and standard_concept with those
+        values. Where several concepts share a code, the first is used.
 
     Args:
         - entries (List[ScanReportValueDict]): A list of Scan Report Value dictionaries representing the entries.
@@ -185,23 +216,26 @@ def _match_concepts_to_entries(
         - None
 
     """
+    concepts_by_code = _index_concepts_by_code(concept_vocab_content)
     for entry in entries:
-        entry["concept_id"] = -1
-        entry["standard_concept"] = None
-        for returned_concept in concept_vocab_content:
-            if str(entry["value"]) == str(returned_concept.concept_code):
-                entry["concept_id"] = str(returned_concept.concept_id)
-                entry["standard_concept"] = str(returned_concept.standard_concept)
-                # exit inner loop early if we find a concept for this entry
-                break
+        concept = concepts_by_code.get(str(entry["value"]))
+        if concept is None:
+            entry["concept_id"] = -1
+            entry["standard_concept"] = None
+        else:
+            entry["concept_id"] = str(concept.concept_id)
+            entry["standard_concept"] = str(concept.standard_concept)
 
 
-def _batch_process_non_standard_concepts(entries: List[ScanReportValueDict]) -> None:
+def _batch_process_non_standard_concepts(
+    entries: List[ScanReportValueDict], use_standard_concept_maps: bool
+) -> None:
     """
     Batch process non-standard concepts.
 
     Args:
         - entries (List[ScanReportValueDict]): A list of Scan Report Value dictionaries representing the entries.
+        - use_standard_concept_maps (bool): Whether the Standard Concept Maps can be used.
 
     Returns:
         - None
@@ -215,7 +249,9 @@ def _batch_process_non_standard_concepts(entries: List[ScanReportValueDict]) ->
         f"finished selecting nonstandard concepts - selected "
         f"{len(nonstandard_entries)}"
     )
-    batched_standard_concepts_map = db.find_standard_concept_batch(nonstandard_entries)
+    batched_standard_concepts_map = db.find_standard_concept_batch(
+        nonstandard_entries, use_standard_concept_maps
+    )
     _update_entries_with_standard_concepts(entries, batched_standard_concepts_map)
 
 
@@ -251,7 +287,9 @@ def _update_entries_with_standard_concepts(
 
 
 def _handle_table(
-    table: ScanReportTable, vocab: Union[Dict[str, Dict[str, str]], None]
+    table: ScanReportTable,
+    vocab: Union[Dict[str, Dict[str, str]], None],
+    reuse_version: str,
 ) -> None:
     """
     Handles Concept Creation on a table.
@@ -262,6 +300,7 @@ def _handle_table(
     Args:
         - table (ScanReportTable): Table object to create for.
         - vocab (Dict[str, Dict[str, str]]): Vocab dictionary.
+        - reuse_version (str): The version of the Reusable Concepts to reuse.
 
     Returns:
         - None
@@ -280,6 +319,8 @@ def _handle_table(
     # Bulk create Concepts
     logger.info(f"Creating {len(concepts)} concepts for table {table.name}")
     ScanReportConcept.objects.bulk_create(concepts)
+    # Bulk created concepts don't send the signal that adds their Reusable Concepts
+    refresh_reusable_concepts(scan_report_concept_ids=[c.pk for c in concepts])
 
     logger.info("Create concepts all finished")
     if len(concepts) == 0:
@@ -287,7 +328,7 @@ def _handle_table(
             JobStageType.BUILD_CONCEPTS_FROM_DICT,
             StageStatusType.COMPLETE,
             scan_report_table=table,
-            details=f"Finished",
+            details="Finished",
         )
     else:
         update_job(
@@ -304,7 +345,7 @@ def _handle_table(
         scan_report_table=table,
     )
     # handle reuse of concepts at field level
-    reuse_existing_field_concepts(table_fields, table)
+    reuse_existing_field_concepts(table_fields, table, reuse_version)
     update_job(
         JobStageType.REUSE_CONCEPTS,
         StageStatusType.IN_PROGRESS,
@@ -312,7 +353,7 @@ def _handle_table(
         details="Finished at field level. Continuing at value level...",
     )
     # handle reuse of concepts at value level
-    reuse_existing_value_concepts(table_values, table)
+    reuse_existing_value_concepts(table_values, table, reuse_version)
     update_job(
         JobStageType.REUSE_CONCEPTS,
         StageStatusType.COMPLETE,
@@ -333,6 +374,10 @@ def main(msg: Dict[str, str]):
     """
     data_dictionary_blob = msg.pop("data_dictionary_blob")
     table_id = msg.pop("table_id")
+    reuse_version = msg.pop("reuse_version", None)
+    # Orchestrations started before the version was passed don't have it
+    if reuse_version is None:
+        reuse_version = db.get_reusable_concepts_version()
 
     # get the table
     table = ScanReportTable.objects.get(pk=table_id)
@@ -340,4 +385,4 @@ def main(msg: Dict[str, str]):
     # get the vocab dictionary
     _, vocab_dictionary = blob_parser.get_data_dictionary(data_dictionary_blob)
 
-    _handle_table(table, vocab_dictionary)
+    _handle_table(table, vocab_dictionary, reuse_version)
@@ -1,23 +1,17 @@
-from typing import Dict, List, Tuple, Union
 from collections import defaultdict
-from shared.mapping.models import (
-    ScanReportConcept,
-    ScanReportField,
-    ScanReportValue,
-    ScanReportTable,
-)
+from typing import Any, Dict, Iterable, List, Tuple, Union
+
+from shared.mapping.models import ScanReportConcept, ScanReportField, ScanReportTable
+from shared.services.reusable_concepts import refresh_reusable_concepts
 from shared_code import db
+from shared_code.db import JobStageType, StageStatusType, update_job
 from shared_code.logger import logger
 from shared_code.models import (
     ScanReportConceptContentType,
     ScanReportFieldDict,
     ScanReportValueDict,
 )
-from shared_code.db import (
-    update_job,
-    JobStageType,
-    StageStatusType,
-)
+from shared_code.reuse_snapshot import SnapshotConcept, get_reuse_snapshot
 
 """
 Functions for finding, mapping, and creation of reusable Scan Report Concepts.
@@ -30,7 +24,9 @@ This happens for Scan Report Fields and Values.
 
 
 def reuse_existing_value_concepts(
-    new_values_map: List[ScanReportValueDict], table: ScanReportTable
+    new_values_map: List[ScanReportValueDict],
+    table: ScanReportTable,
+    reuse_version: str,
 ) -> None:
     """
     This expects a dict of value names to ids which have been generated in a newly
@@ -39,70 +35,20 @@ def reuse_existing_value_concepts(
 
     Args:
         new_fields_map (Dict[str, str]): A map of field names to Ids.
+        reuse_version (str): The version of the Reusable Concepts to reuse.
     """
     logger.info("reuse_existing_value_concepts")
     content_type = ScanReportConceptContentType.VALUE
 
-    existing_value_concepts = db.get_scan_report_active_concepts(content_type)
-
-    # Create a defaultdict that maps existing value ids to scan report concepts
-    existing_value_id_to_concept_map = defaultdict(list)
-
-    for element in existing_value_concepts:
-        existing_value_id_to_concept_map[str(element.object_id)].append(
-            str(element.concept.pk)
-        )
-
-    # Convert defaultdict to a regular dictionary
-    existing_value_id_to_concept_map = dict(existing_value_id_to_concept_map)
-    logger.debug(
-        f"value_id:concept_id for all existing values in active SRs with concepts: "
-        f"{existing_value_id_to_concept_map}"
+    # Get the concepts of existing values in active SRs with the same value and field
+    # name as a new value, as one for each existing SRValue with a SRConcept.
+    existing_mappings_to_consider = _existing_mappings(
+        get_reuse_snapshot(table.scan_report_id, reuse_version).concepts(content_type)
     )
-
-    # get details of existing selected values, for the purpose of matching against
-    existing_value_ids = [value.object_id for value in existing_value_concepts]
-    existing_values_filtered_by_id = ScanReportValue.objects.filter(
-        id__in=existing_value_ids
-    ).all()
-
-    # existing_values_filtered_by_id now contains the id,value,value_dec,
-    # scan_report_field of each value got from the active concepts filter.
     logger.debug(
-        f"ids, values and value descriptions of existing values in active SRs with "
-        f"concepts: {existing_values_filtered_by_id}"
+        f"existing values in active SRs with concepts: {existing_mappings_to_consider}"
     )
 
-    # get field ids from values and use to get scan report fields' details
-    existing_field_ids = {
-        item.scan_report_field.id for item in existing_values_filtered_by_id
-    }
-    existing_fields = ScanReportField.objects.filter(id__in=existing_field_ids).all()
-    logger.debug(
-        f"ids and names of existing fields associated to values with concepts in "
-        f"active SRs: {existing_fields}"
-    )
-
-    existing_field_id_to_name_map = {
-        str(field.pk): field.name for field in existing_fields
-    }
-    logger.debug(f"{existing_field_id_to_name_map=}")
-
-    # Combine everything of the existing values to get this list, one for each
-    # existing SRValue with a SRConcept in an active SR.
-    existing_mappings_to_consider = [
-        {
-            "name": value.value,
-            "concept": existing_value_id_to_concept_map[str(value.pk)],
-            "id": value.pk,
-            "description": value.value_description,
-            "field_name": existing_field_id_to_name_map[
-                str(value.scan_report_field.id)
-            ],
-        }
-        for value in existing_values_filtered_by_id
-    ]
-
     # Now handle the newly-added values in a similar manner
     logger.debug("new_paginated_field_ids")
     new_field_ids = [value["scan_report_field"]["id"] for value in new_values_map]
@@ -132,40 +78,9 @@ def reuse_existing_value_concepts(
     # Now we simply look for unique matches on (name, description, field_name) across
     # the two.
 
-    # value_details_to_value_and_concept_id_map will contain
-    # (name, description, field_name) -> (value_id, concept_id)
-    # for each value/description/field tuple in new_values_full_details
-    # if that tuple has only one match in existing_mappings_to_consider
-    value_details_to_value_and_concept_id_map = {}
-    for item in new_values_full_details:
-        name = item["name"]
-        description = item["description"]
-        field_name = item["field_name"]
-        key = (str(name), str(description), str(field_name))
-
-        mappings_matching_value = list(
-            filter(
-                lambda mapping: mapping["name"] == name
-                and mapping["description"] == description
-                and mapping["field_name"] == field_name,
-                existing_mappings_to_consider,
-            )
-        )
-
-        if mappings_matching_value:
-            target_value_id = str(mappings_matching_value[0]["id"])
-            target_concept_ids = list(
-                {
-                    concept_id
-                    for mapping in mappings_matching_value
-                    for concept_id in mapping["concept"]
-                }
-            )
-
-            value_details_to_value_and_concept_id_map[key] = (
-                target_value_id,
-                target_concept_ids,
-            )
+    value_details_to_value_and_concept_id_map = _match_values(
+        new_values_full_details, existing_mappings_to_consider
+    )
 
     # Use the new_values_full_details as keys into
     # value_details_to_value_and_concept_id_map to extract concept IDs and details
@@ -177,13 +92,18 @@ def reuse_existing_value_concepts(
         table,
     ):
         ScanReportConcept.objects.bulk_create(concepts_to_post)
+        refresh_reusable_concepts(
+            scan_report_concept_ids=[c.pk for c in concepts_to_post]
+        )
         logger.info("POST concepts all finished in reuse_existing_value_concepts")
     else:
         logger.info("No concepts to reuse at value level")
 
 
 def reuse_existing_field_concepts(
-    new_fields_map: List[ScanReportFieldDict], table: ScanReportTable
+    new_fields_map: List[ScanReportFieldDict],
+    table: ScanReportTable,
+    reuse_version: str,
 ) -> None:
     """
     Creates new concepts associated to any field that matches the name of an existing
@@ -194,6 +114,7 @@ def reuse_existing_field_concepts(
 
     Args:
         new_fields_map (List[Dict[str, Any]]): A list of fields.
+        reuse_version (str): The version of the Reusable Concepts to reuse.
 
     Returns:
         None
@@ -201,41 +122,11 @@ def reuse_existing_field_concepts(
     logger.info("reuse_existing_field_concepts")
     content_type = ScanReportConceptContentType.FIELD
 
-    existing_field_concepts = db.get_scan_report_active_concepts(content_type)
-
-    # Create a defaultdict that maps existing field ids to scan report concepts
-    existing_field_id_to_concept_map = defaultdict(list)
-
-    for element in existing_field_concepts:
-        existing_field_id_to_concept_map[str(element.object_id)].append(
-            str(element.concept.pk)
-        )
-
-    # Convert defaultdict to a regular dictionary
-    existing_field_id_to_concept_map = dict(existing_field_id_to_concept_map)
-    logger.debug(
-        f"field_id:concept_id for all existing fields in active SRs with concepts: "
-        f"{existing_field_id_to_concept_map}"
-    )
-
-    # Get details of existing selected fields, for the purpose of matching against new fields
-    existing_field_ids = {item.object_id for item in existing_field_concepts}
-    existing_fields = ScanReportField.objects.filter(id__in=existing_field_ids).all()
-    logger.debug(
-        f"ids and names of existing fields with concepts in active SRs:"
-        f" {existing_fields}"
+    # Get the concepts of existing fields in active SRs with the same name as a new
+    # field, as one for each existing SRField with a SRConcept.
+    existing_mappings_to_consider = _existing_mappings(
+        get_reuse_snapshot(table.scan_report_id, reuse_version).concepts(content_type)
     )
-
-    # Combine everything of the existing fields to get this list, one for each
-    # existing SRField with a SRConcept in an active SR.
-    existing_mappings_to_consider = [
-        {
-            "name": field.name,
-            "concept": existing_field_id_to_concept_map[str(field.pk)],
-            "id": field.pk,
-        }
-        for field in existing_fields
-    ]
     logger.debug(f"{existing_mappings_to_consider=}")
 
     # Handle the newly-added fields
@@ -252,18 +143,152 @@ def reuse_existing_field_concepts(
 
     # Now we simply look for unique matches on "name" across the two.
 
+    existing_field_name_to_field_and_concept_id_map = _match_fields(
+        new_fields_full_details, existing_mappings_to_consider
+    )
+
+    # Use the new_fields_full_details as keys into
+    # existing_field_name_to_field_and_concept_id_map to extract concept IDs and details
+    # for new ScanReportConcept entries to post.
+    if concepts_to_post := select_concepts_to_post(
+        new_fields_full_details,
+        existing_field_name_to_field_and_concept_id_map,
+        content_type,
+        table,
+    ):
+        ScanReportConcept.objects.bulk_create(concepts_to_post)
+        refresh_reusable_concepts(
+            scan_report_concept_ids=[c.pk for c in concepts_to_post]
+        )
+        logger.info("POST concepts all finished in reuse_existing_field_concepts")
+    else:
+        logger.info("No concepts to reuse at field level")
+
+
+def _existing_mappings(
+    reusable_concepts: Iterable[SnapshotConcept],
+) -> List[Dict[str, Any]]:
+    """
+    Combines reusable concepts into one mapping for each existing field or value,
+    with all of its concepts.
+
+    Args:
+        - reusable_concepts (Iterable[SnapshotConcept]): The reusable concepts.
+
+    Returns:
+        - List[Dict[str, Any]]: The "id", "name", "concept", "description" and
+            "field_name" of each existing field or value.
+    """
+    existing_mappings: Dict[int, Dict[str, Any]] = {}
+    for reusable_concept in reusable_concepts:
+        mapping = existing_mappings.setdefault(
+            reusable_concept.object_id,
+            {
+                "name": reusable_concept.name,
+                "concept": [],
+                "id": reusable_concept.object_id,
+                "description": reusable_concept.value_description,
+                "field_name": reusable_concept.field_name,
+            },
+        )
+        mapping["concept"].append(str(reusable_concept.concept_id))
+    return list(existing_mappings.values())
+
+
+def _match_values(
+    new_values_full_details: List[Dict[str, Any]],
+    existing_mappings_to_consider: List[Dict[str, Any]],
+) -> Dict[Tuple[str, str, str], Tuple[str, List[str]]]:
+    """
+    Matches new values to existing values with concepts on their name, description
+    and field name.
+
+    The existing values are indexed by (name, description, field_name) first, so
+    each new value is matched with a single lookup.
+
+    Args:
+        - new_values_full_details (List[Dict[str, Any]]): The "id", "name",
+            "description" and "field_name" of each new value.
+        - existing_mappings_to_consider (List[Dict[str, Any]]): The "id", "name",
+            "concept", "description" and "field_name" of each existing value.
+
+    Returns:
+        - Dict[Tuple[str, str, str], Tuple[str, List[str]]]: The first matching
+            existing value id and the concept ids of all matching existing values, for
+            each (name, description, field_name) with a match.
+    """
+    existing_mappings_by_details: Dict[Tuple[Any, Any, Any], List[Dict[str, Any]]] = (
+        defaultdict(list)
+    )
+    for mapping in existing_mappings_to_consider:
+        existing_mappings_by_details[
+            (mapping["name"], mapping["description"], mapping["field_name"])
+        ].append(mapping)
+
+    # value_details_to_value_and_concept_id_map will contain
+    # (name, description, field_name) -> (value_id, concept_id)
+    # for each value/description/field tuple in new_values_full_details
+    # if that tuple has a match in existing_mappings_to_consider
+    value_details_to_value_and_concept_id_map = {}
+    for item in new_values_full_details:
+        name = item["name"]
+        description = item["description"]
+        field_name = item["field_name"]
+        key = (str(name), str(description), str(field_name))
+
+        mappings_matching_value = existing_mappings_by_details.get(
+            (name, description, field_name)
+        )
+        if mappings_matching_value:
+            target_value_id = str(mappings_matching_value[0]["id"])
+            target_concept_ids = list(
+                {
+                    concept_id
+                    for mapping in mappings_matching_value
+                    for concept_id in mapping["concept"]
+                }
+            )
+
+            value_details_to_value_and_concept_id_map[key] = (
+                target_value_id,
+                target_concept_ids,
+            )
+    return value_details_to_value_and_concept_id_map
+
+
+def _match_fields(
+    new_fields_full_details: List[Dict[str, Any]],
+    existing_mappings_to_consider: List[Dict[str, Any]],
+) -> Dict[str, Tuple[str, List[str]]]:
+    """
+    Matches new fields to existing fields with concepts on their name.
+
+    The existing fields are indexed by name first, so each new field is matched with
+    a single lookup.
+
+    Args:
+        - new_fields_full_details (List[Dict[str, Any]]): The "id" and "name" of each
+            new field.
+        - existing_mappings_to_consider (List[Dict[str, Any]]): The "id", "name" and
+            "concept" of each existing field.
+
+    Returns:
+        - Dict[str, Tuple[str, List[str]]]: The first matching existing field id and
+            the concept ids of all matching existing fields, for each name with a
+            match that has concepts.
+    """
+    existing_mappings_by_name: Dict[Any, List[Dict[str, Any]]] = defaultdict(list)
+    for mapping in existing_mappings_to_consider:
+        existing_mappings_by_name[mapping["name"]].append(mapping)
+
     # existing_field_name_to_field_and_concept_id_map will contain
     # (field_name) -> (field_id, concept_id)
     # for each field in new_fields_full_details
-    # if that field has only one match in existing_mappings_to_consider
+    # if that field has a match in existing_mappings_to_consider
     existing_field_name_to_field_and_concept_id_map = {}
     for item in new_fields_full_details:
         name = item["name"]
-        mappings_matching_field_name = list(
-            filter(
-                lambda mapping: mapping["name"] == name, existing_mappings_to_consider
-            )
-        )
+        mappings_matching_field_name = existing_mappings_by_name.get(name, [])
 
         # Flatten the list of concept IDs
         target_concept_ids = {
@@ -273,27 +298,12 @@ def reuse_existing_field_concepts(
         }
 
         if len(target_concept_ids) != 0:
-            target_field_id = next(
-                mapping["id"] for mapping in mappings_matching_field_name
-            )
+            target_field_id = mappings_matching_field_name[0]["id"]
             existing_field_name_to_field_and_concept_id_map[str(name)] = (
                 str(target_field_id),
                 list(map(str, target_concept_ids)),  # Store all concept IDs as a list
             )
-
-    # Use the new_fields_full_details as keys into
-    # existing_field_name_to_field_and_concept_id_map to extract concept IDs and details
-    # for new ScanReportConcept entries to post.
-    if concepts_to_post := select_concepts_to_post(
-        new_fields_full_details,
-        existing_field_name_to_field_and_concept_id_map,
-        content_type,
-        table,
-    ):
-        ScanReportConcept.objects.bulk_create(concepts_to_post)
-        logger.info("POST concepts all finished in reuse_existing_field_concepts")
-    else:
-        logger.info("No concepts to reuse at field level")
+    return existing_field_name_to_field_and_concept_id_map
 
 
 def select_concepts_to_post(
@@ -331,7 +341,7 @@ def select_concepts_to_post(
     Raises:
         Exception:  ValueError: A content_type other than scanreportfield or scanreportvalue was provided.
     """
-    concepts_to_post: List[ScanReportConcept] = []
+    concept_object_ids: List[Tuple[str, str]] = []
     key: Union[str, Tuple[str, str, str]]
 
     for new_content_detail in new_content_details:
@@ -359,11 +369,8 @@ def select_concepts_to_post(
                     f"Found existing {'field' if content_type == ScanReportConceptContentType.FIELD else 'value'} with id: {existing_content_id} "
                     f"with existing concept mapping: {concept_id} which matches new {'field' if content_type == ScanReportConceptContentType.FIELD else 'value'} id: {new_content_detail['id']}"
                 )
-                if concept_entry := db.create_concept(
-                    concept_id, str(new_content_detail["id"]), content_type, "R"
-                ):
-                    concepts_to_post.append(concept_entry)
+                concept_object_ids.append((concept_id, str(new_content_detail["id"])))
         except KeyError:
             continue
 
-    return concepts_to_post
+    return db.create_concepts(concept_object_ids, content_type, "R")
@@ -1,9 +1,7 @@
-import io
 import json
 import os
 from datetime import datetime
-from io import BytesIO
-from typing import Dict
+from typing import Dict, Iterator
 
 import azure.functions as func
 from shared_code.models import FileHandlerConfig, RulesFileMessage
@@ -15,52 +13,50 @@ django.setup()
 
 from django.db.models.query import QuerySet
 from shared.files.models import FileDownload, FileType
-from shared.files.service import upload_blob_read
+from shared.files.service import upload_blob_blocks
 from shared.mapping.models import MappingRule, ScanReport
 from shared.services.rules_export import (
-    get_mapping_rules_as_csv,
     get_mapping_rules_json,
+    iter_mapping_rules_csv,
+    iter_mapping_rules_json,
     make_dag,
 )
-from shared_code.db import (
-    update_job,
-    JobStageType,
-    StageStatusType,
-)
+from shared_code.db import JobStageType, StageStatusType, update_job
 
 
-def create_json_rules(rules: QuerySet[MappingRule]) -> BytesIO:
+def create_json_rules(rules: QuerySet[MappingRule]) -> Iterator[bytes]:
     """
-    Converts a queryset of mapping rules into a JSON byte stream.
+    Converts a queryset of mapping rules into JSON, generated a chunk at a time.
+
+    The JSON is pretty-printed unless the 'RULES_JSON_PRETTY' environment variable
+    is "False" or "0".
 
     Args:
         rules (QuerySet[MappingRule]): A queryset containing mapping rules.
 
     Returns:
-        BytesIO: A byte stream of JSON mapping rules.
+        Iterator[bytes]: The JSON mapping rules, in chunks.
     """
-    data = get_mapping_rules_json(rules)
-    json_data = json.dumps(data, indent=6)
-    json_bytes = BytesIO(json_data.encode("utf-8"))
-    json_bytes.seek(0)
-    return json_bytes
+    pretty = os.environ.get("RULES_JSON_PRETTY", "True") in ["True", "1"]
+    for chunk in iter_mapping_rules_json(rules, indent=6 if pretty else None):
+        yield chunk.encode("utf-8")
 
 
-def create_csv_rules(rules: QuerySet[MappingRule]) -> BytesIO:
+def create_csv_rules(rules: QuerySet[MappingRule]) -> Iterator[bytes]:
     """
-    Converts a queryset of mapping rules into a CSV byte stream.
+    Converts a queryset of mapping rules into CSV, generated a chunk at a time.
 
     Args:
         rules (QuerySet[MappingRule]): A queryset containing mapping rules.
 
     Returns:
-        BytesIO: A byte stream of CSV mapping rules.
+        Iterator[bytes]: The CSV mapping rules, in chunks.
     """
-    data = get_mapping_rules_as_csv(rules)
-    return io.BytesIO(data.getvalue().encode("utf-8"))
+    for chunk in iter_mapping_rules_csv(rules):
+        yield chunk.encode("utf-8")
 
 
-def create_svg_rules(rules: QuerySet[MappingRule]) -> BytesIO:
+def create_svg_rules(rules: QuerySet[MappingRule]) -> Iterator[bytes]:
     """
     Converts a queryset of mapping rules into a SVG byte stream.
 
@@ -68,12 +64,11 @@ def create_svg_rules(rules: QuerySet[MappingRule]) -> BytesIO:
         rules (QuerySet[MappingRule]): A queryset containing mapping rules.
 
     Returns:
-        BytesIO: A byte stream of SVG DAG mapping rules.
+        Iterator[bytes]: The SVG DAG mapping rules, in one chunk.
     """
     data = get_mapping_rules_json(rules)
     dag = make_dag(data["cdm"])
-    svg_bytes = dag.encode("utf-8")
-    return BytesIO(svg_bytes)
+    yield dag.encode("utf-8")
 
 
 def main(msg: func.QueueMessage) -> None:
@@ -126,7 +121,7 @@ def main(msg: func.QueueMessage) -> None:
 
     # Save to blob
     filename = f"Rules - {scan_report.dataset} - {scan_report_id} - {datetime.now()}.{file_extension}"
-    upload_blob_read(filename, "rules-exports", file, file_type)
+    upload_blob_blocks(filename, "rules-exports", file, file_type)
 
     # create entity
     file_type_entity = FileType.objects.get(value=file_type_value)
@@ -22,12 +22,16 @@ def main(msg: Dict[str, Any]):
         - None
     """
     table_id = msg.pop("table_id")
-    page = msg.pop("page_num")
-    page_size = msg.pop("page_size")
+    first_id = msg.pop("first_id")
+    last_id = msg.pop("last_id")
+    backend = msg.pop("backend", "python")
 
-    logger.info(f"Generating mapping rules for table: {table_id}, page: {page}")
+    logger.info(
+        f"Generating mapping rules for table: {table_id}, "
+        f"concepts: {first_id} to {last_id}, backend: {backend}"
+    )
 
-    refresh_mapping_rules(table_id, page, page_size)
+    refresh_mapping_rules(table_id, first_id, last_id, backend)
     logger.info(f"Finished mapping rules for table: {table_id}")
 
     return
@@ -9,14 +9,15 @@ from shared_code.logger import logger
 
 django.setup()
 
-from shared.services.rules import find_existing_concepts_count
+from shared.jobs.models import Job, JobStage, StageStatus
+from shared.mapping.models import ScanReportTable
+from shared.services.rules import partition_existing_concepts
 from shared_code.db import (
-    update_job,
     JobStageType,
     StageStatusType,
+    get_reusable_concepts_version,
+    update_job,
 )
-from shared.mapping.models import ScanReportTable
-from shared.jobs.models import Job, JobStage, StageStatus
 
 
 def orchestrator_function(context: df.DurableOrchestrationContext):
@@ -35,32 +36,48 @@ def orchestrator_function(context: df.DurableOrchestrationContext):
     try:
         msg: Dict[str, Any] = context.get_input()
 
+        # Take the version of the Reusable Concepts once for the run, so the
+        # activity reuses the snapshot of that version. The activity isn't run again
+        # when replaying, so it's only needed the first time.
+        if not context.is_replaying:
+            msg["reuse_version"] = get_reusable_concepts_version()
+
         # CreateConcepts
         result = yield context.call_activity("RulesConceptsActivity", msg)
 
         table_id = msg.pop("table_id")
 
-        # Get concepts number
-        concepts_count = find_existing_concepts_count(table_id)
-        logger.info(f"Concepts found: {concepts_count}")
-
-        # Paginate, but ensure we have at least 1 task.
-        page_size = int(os.environ.get("PAGE_SIZE", "1000"))
-        num_pages = max((concepts_count + page_size - 1) // page_size, 1)
+        # The "sql" backend saves the rules of the whole table in one statement.
+        # Otherwise, split the concepts into ranges, but ensure we have at least 1
+        # task.
+        backend = os.environ.get("RULES_GENERATION_BACKEND", "python")
+        if backend == "sql":
+            partitions = [(None, None)]
+        else:
+            page_size = int(os.environ.get("PAGE_SIZE", "1000"))
+            partitions = partition_existing_concepts(table_id, page_size)
+            logger.info(f"Concept partitions found: {len(partitions)}")
+            if not partitions:
+                partitions = [(0, 0)]
 
         update_job(
             JobStageType.GENERATE_RULES,
             StageStatusType.IN_PROGRESS,
             scan_report_table=ScanReportTable.objects.get(id=table_id),
-            details=f"Generating mapping rules from available concepts.",
+            details="Generating mapping rules from available concepts.",
         )
         # Fan out
         tasks = [
             context.call_activity(
                 "RulesGenerationActivity",
-                {"table_id": table_id, "page_num": page_num, "page_size": page_size},
+                {
+                    "table_id": table_id,
+                    "first_id": first_id,
+                    "last_id": last_id,
+                    "backend": backend,
+                },
             )
-            for page_num in range(num_pages)
+            for first_id, last_id in partitions
         ]
         results = yield context.task_all(tasks)
 
@@ -1,50 +1,59 @@
 import asyncio
+import json
+import multiprocessing
 import os
+import threading
 from collections import defaultdict
-from typing import Any, Dict, List, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import suppress
+from functools import partial
+from multiprocessing.managers import SyncManager
+from queue import Empty, Queue
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 
 import azure.functions as func
-from openpyxl import Workbook
+from asgiref.sync import sync_to_async
+from django.db import connections, transaction
 from openpyxl.cell.cell import Cell
 from openpyxl.worksheet.worksheet import Worksheet
-from shared.mapping.models import (
-    ScanReportField,
-    ScanReportTable,
-    ScanReportValue,
+from shared.jobs.models import Job
+from shared.mapping.models import ScanReport, ScanReportField, ScanReportTable
+from shared.services.bulk_load import (
+    ValueColumns,
+    bulk_load_fields,
+    bulk_load_value_columns,
 )
+from shared.services.scan_report_checks import ScanReportCheckError, check_scan_report
 from shared_code import blob_parser, helpers
-from shared_code.db import (
-    update_job,
-    JobStageType,
-    StageStatusType,
-)
-from shared.mapping.models import ScanReport
+from shared_code.db import JobStageType, StageStatusType, update_job
 from shared_code.logger import logger
+from shared_code.xlsx_reader import ScanReportReader, put_value_batches
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "shared_code.django_settings")
 import django
 
 django.setup()
 
+# The number of parsed batches of values that can wait to be inserted, per table
+PARSED_BATCHES_QUEUE_SIZE = 2
+# The number of times a message is delivered before it is moved to the poison queue
+MAX_DEQUEUE_COUNT = helpers.get_max_dequeue_count()
+
 
-def _get_unique_table_names(worksheet: Worksheet) -> List[str]:
+def _get_unique_table_names(reader: ScanReportReader) -> List[str]:
     """
-    Extracts unique table names from the Field Overview worksheet.
+    Extracts unique table names from the Field Overview sheet.
 
     Args:
-        worksheet: The worksheet containing table names.
+        reader (ScanReportReader): The scan report, with Field Overview as the first
+            sheet.
 
     Returns:
         List[str]: A list of unique table names.
     """
     # Get all the table names in the order they appear in the Field Overview page
     table_names = []
-    # Iterate over cells in the first column, but because we're in ReadOnly mode we
-    # can't do that in the simplest manner.
-    worksheet.reset_dimensions()
-    worksheet.calculate_dimension(force=True)
-    for row in worksheet.iter_rows(min_row=2, max_row=worksheet.max_row):
-        cell_value = row[0].value
+    for (cell_value,) in reader.iter_rows(reader.sheetnames[0], min_row=2, max_col=1):
         if cell_value and cell_value not in table_names:
             table_names.append(cell_value)
     return table_names
@@ -92,25 +101,21 @@ def _create_field_entry(row: Tuple[Cell], scan_report_table_id: str) -> ScanRepo
     )
 
 
-def _transform_scan_report_sheet_table(sheet: Worksheet) -> defaultdict[Any, List]:
+def _transform_scan_report_sheet_table(
+    reader: ScanReportReader, sheet_name: str
+) -> defaultdict[Any, List]:
     """
     Transforms a worksheet data into a JSON like format.
 
     Args:
-        sheet (Worksheet): Sheet of data to transform
+        reader (ScanReportReader): The scan report to read from.
+        sheet_name (str): Name of the sheet of data to transform
 
     Returns:
         defaultdict[Any, List]: The transformed data.
     """
     logger.debug("Start process_scan_report_sheet_table")
 
-    sheet.reset_dimensions()
-    sheet.calculate_dimension(force=True)
-    # Get header entries (skipping every second column which is just 'Frequency')
-    # So sheet_headers = ['a', 'b']
-    first_row = sheet[1]
-    sheet_headers = [cell.value for cell in first_row[::2]]
-
     # Set up an empty defaultdict, and fill it with one entry per header (i.e. one
     # per column)
     # Append each entry's value with the tuple (value, frequency) so that we end up
@@ -120,252 +125,438 @@ def _transform_scan_report_sheet_table(sheet: Worksheet) -> defaultdict[Any, Lis
     #
     # ordereddict({'a': [('apple', 20), ('banana', 3), ('pear', 12)],
     #              'b': [('orange', 5), ('plantain', 50)]})
-
     d = defaultdict(list)
-    # Iterate over all rows beyond the header - use the number of sheet_headers*2 to
-    # set the maximum column rather than relying on sheet.max_col as this is not
-    # always reliably updated by Excel etc.
-    for row in sheet.iter_rows(
-        min_col=1,
-        max_col=len(sheet_headers) * 2,
-        min_row=2,
-        max_row=sheet.max_row,
-        values_only=True,
-    ):
-        # Set boolean to track whether we hit a blank row for early exit below.
-        this_row_empty = True
-        # Iterate across the pairs of cells in the row. If the pair is non-empty,
-        # then add it to the relevant dict entry.
-        for header, cell, freq in zip(sheet_headers, row[::2], row[1::2]):
-            if (cell != "" and cell is not None) or (freq != "" and freq is not None):
-                d[header].append((str(cell), freq))
-                this_row_empty = False
-        # This will trigger if we hit a row that is entirely empty. Short-circuit
-        # to exit early here - this saves us from situations where sheet.max_row is
-        # incorrectly set (too large)
-        if this_row_empty:
-            break
+    for header, value, frequency in reader.iter_value_triples(sheet_name):
+        d[header].append((value, frequency))
 
     logger.debug("Finish process_scan_report_sheet_table")
     return d
 
 
-def _create_value_entries(
-    values_details: List[Dict[str, Any]], fields: list[ScanReportField]
-) -> List[ScanReportValue]:
+def _index_fields(
+    fields: list[ScanReportField],
+    table_name: str,
+    data_dictionary: Optional[Dict[Any, Dict]],
+) -> Dict[str, Tuple[int, Dict[str, Any]]]:
     """
-    Create value entries based on values_details and fieldnames_to_ids_dict.
+    Index the fields of a table by name, with their value descriptions from the data
+    dictionary.
 
     Args:
-        values_details (List[Dict[str, Any]]): A list of dictionaries of the value
-            details for each fieldname-value pair.
-        fields (List[ScanReportField]): A list of SCan Report Fields.
+        fields (List[ScanReportField]): The Scan Report Fields of the table.
+        table_name (str): The name of the table.
+        data_dictionary (Optional[Dict[Any, Dict]]): A dictionary mapping table names
+            to dictionaries containing fieldname-value mappings and their
+            corresponding value descriptions, or None without a data dictionary.
 
     Returns:
-        List[ScanReportValue]: A list of ScanReportValues.
-    """
-    return [
-        ScanReportValue(
-            value=entry["full_value"][:127],
-            frequency=int(entry["frequency"]),
-            value_description=entry["val_desc"],
-            scan_report_field=next(f for f in fields if f.name == entry["fieldname"]),
+        Dict[str, Tuple[int, Dict[str, Any]]]: The id of each field, and the
+            descriptions of its values, by field name.
+    """
+    table_data = (data_dictionary or {}).get(str(table_name)) or {}
+    fields_index: Dict[str, Tuple[int, Dict[str, Any]]] = {}
+    for field in fields:
+        fields_index.setdefault(
+            field.name, (field.pk, table_data.get(str(field.name)) or {})
         )
-        for entry in values_details
-    ]
+    return fields_index
 
 
-def _apply_data_dictionary(
-    values_details: List[Dict[str, Any]], data_dictionary: Dict[Any, Dict]
-) -> None:
+def _create_value_columns(
+    batch: Iterable[Tuple[Any, str, Any]],
+    fields_index: Dict[str, Tuple[int, Dict[str, Any]]],
+) -> ValueColumns:
     """
-    Apply data dictionary to update value descriptions in values_details from the data dict.
+    Create the columns of ScanReportValues, with value descriptions, for one batch of
+    values.
 
     Args:
-        values_details (List[Dict[str, Any]]): A list of dictionaries with the value
-            details for each fieldname-value pair.
-        data_dictionary (Dict[Any, Dict]): A dictionary mapping table names to dictionaries
-            containing fieldname-value mappings and their corresponding value descriptions.
+        batch: (field name, value, frequency) for each value in the batch.
+        fields_index: The id and value descriptions of each field, by field name.
 
     Returns:
-        None
+        ValueColumns: The values to insert.
+
+    Raises:
+        ValueError: A value belongs to a field that isn't in the Field Overview.
     """
-    for entry in values_details:
-        table_data = data_dictionary.get(str(entry["table"]))
-        if table_data and table_data.get(str(entry["fieldname"])):
-            entry["val_desc"] = table_data[str(entry["fieldname"])].get(
-                str(entry["full_value"])
-            )
+    columns = ValueColumns()
+    add_field_id = columns.field_ids.append
+    add_value = columns.values.append
+    add_frequency = columns.frequencies.append
+    add_description = columns.descriptions.append
+    for fieldname, value, frequency in batch:
+        try:
+            field_id, descriptions = fields_index[fieldname]
+        except KeyError:
+            raise ValueError(
+                f"Found values for field '{fieldname}', which is not in the Field"
+                " Overview."
+            ) from None
+        try:
+            frequency = int(frequency)
+        except (ValueError, TypeError):
+            frequency = 0
+        add_field_id(field_id)
+        add_value(value[:127])
+        add_frequency(frequency)
+        add_description(descriptions.get(str(value)) if descriptions else None)
+    return columns
+
+
+def _upload_table(
+    table: ScanReportTable,
+    field_entries: list[ScanReportField],
+    batches: Iterable[List[Tuple[Any, str, Any]]],
+    data_dictionary: Dict[Any, Dict],
+) -> None:
+    """
+    Creates the fields and values of a table, and marks the table as uploaded, in a
+    single transaction.
 
+    A table is either uploaded in full or not at all, so an interrupted upload can
+    be resumed from the first table that wasn't uploaded.
 
-def _assign_order(values_details: List[Dict[str, Any]]) -> None:
+    Args:
+        table (ScanReportTable): The table to upload.
+        field_entries (List[ScanReportField]): List of field entries to create.
+        batches (Iterable[List[Tuple[Any, str, Any]]]): Batches of (field name,
+            value, frequency) for each value in the table.
+        data_dictionary (Dict[Any, Dict]): The data dictionary.
     """
-    Add "order" field to each entry to enable correctly-ordered recombination at the end.
+    with transaction.atomic():
+        fields = bulk_load_fields(field_entries)
+        fields_index = _index_fields(fields, table.name, data_dictionary)
+        for batch in batches:
+            bulk_load_value_columns(_create_value_columns(batch, fields_index))
+        table.upload_complete = True
+        table.save(update_fields=["upload_complete", "updated_at"])
 
-    Args:
-        values_details (List[Dict[str, Any]]): List of value details to transform.
 
-    Returns:
-        None
+def _set_upload_failed(scan_report_id: str, details: Optional[str] = None) -> None:
     """
-    for entry_number, entry in enumerate(values_details):
-        entry["order"] = entry_number
+    Marks the upload of a scan report as failed.
+
+    Args:
+        scan_report_id (str): The ID of the scan report.
+        details (Optional[str]): Why the upload failed, recorded on its job.
+    """
+    update_job(
+        JobStageType.UPLOAD_SCAN_REPORT,
+        StageStatusType.FAILED,
+        scan_report=ScanReport.objects.get(id=scan_report_id),
+        details=details,
+    )
 
 
-def _create_values_details(
-    fieldname_value_freq: Dict[str, Tuple[str]],
-    table_name: str,
-) -> List[Dict[str, Any]]:
+def _check_errors_details(errors: List[str]) -> str:
     """
-    Create value details for each fieldname-value pair.
+    Joins the errors from the upload consistency checks into the details of a job,
+    cut to fit.
 
     Args:
-        fieldname_value_freq (Dict[str, Tuple[str]]): A dictionary mapping fieldnames to
-            tuples of value-frequency pairs.
-        table_name (str): The name of the table.
+        errors (List[str]): The errors from the checks.
 
     Returns:
-        List[Dict[str, Any]]: A list of dictionaries containing the value details for each
-            fieldname-value pair.
-    """
-    values_details = []
-    for fieldname, value_freq_tuples in fieldname_value_freq.items():
-        for full_value, frequency in value_freq_tuples:
-            try:
-                frequency = int(frequency)
-            except (ValueError, TypeError):
-                frequency = 0
-            values_details.append(
-                {
-                    "full_value": full_value,
-                    "frequency": frequency,
-                    "fieldname": fieldname,
-                    "table": table_name,
-                    "val_desc": None,
-                }
-            )
-    return values_details
+        str: The errors, separated by " * " as the API returns them.
+    """
+    details = " * ".join(errors)
+    max_length = Job._meta.get_field("details").max_length
+    if len(details) > max_length:
+        details = details[: max_length - 3] + "..."
+    return details
 
 
-async def _add_SRValues_and_value_descriptions(
-    fieldname_value_freq_dict: Dict[str, Tuple[str]],
-    current_table_name: str,
-    data_dictionary: Dict[Any, Dict],
-    fields: list[ScanReportField],
-) -> None:
+def _should_validate(msg: func.QueueMessage) -> bool:
     """
-    Add ScanReportValues and value descriptions to the values_details list.
+    Whether the API accepted the upload without checking the files, leaving the
+    consistency checks to the worker.
 
     Args:
-        fieldname_value_freq_dict: A dictionary containing field names as keys and
-            value-frequency tuples as values.
-        current_table_name: The name of the current table.
-        data_dictionary: The data dictionary containing field-value descriptions.
-        fields: A list of Scan Report Fields.
+        msg (func.QueueMessage): The message received from the queue.
 
     Returns:
-        The response content after posting the values.
+        bool: True if the files should be checked before uploading.
     """
-    values_details = _create_values_details(
-        fieldname_value_freq_dict, current_table_name
-    )
-    logger.debug("Assign order")
-    _assign_order(values_details)
+    return bool(json.loads(msg.get_body().decode("utf-8")).get("validate", False))
+
 
-    # --------------------------------------------------------------------------------
-    # Update val_desc of each SRField entry if it has a value description from the
-    # data dictionary
-    if data_dictionary:
-        logger.debug("apply data dictionary")
-        _apply_data_dictionary(values_details, data_dictionary)
+async def _check_table_sheet(
+    table_name: str, scan_report_id: str, reader: ScanReportReader
+) -> None:
+    """
+    Checks the scan report has a sheet for a table, marking the upload as failed if
+    it doesn't.
 
-    # Convert basic information about SRValues into entries
-    logger.debug("create value_entries_to_post")
-    value_entries = _create_value_entries(values_details, fields)
-    await ScanReportValue.objects.abulk_create(value_entries)
+    Args:
+        table_name (str): The name of the table.
+        scan_report_id (str): ID of the scan report.
+        reader (ScanReportReader): The scan report to read table values from.
+
+    Raises:
+        Exception: ValueError: Trying to access a sheet in the workbook that does not exist.
+    """
+    if table_name not in reader.sheetnames:
+        await sync_to_async(_set_upload_failed)(scan_report_id)
+        raise ValueError(
+            f"Attempting to access sheet '{table_name}'"
+            f" in scan report, but no such sheet exists."
+        )
 
 
 async def _handle_single_table(
-    current_table_name: str,
+    table: ScanReportTable,
     field_entries: list[ScanReportField],
     scan_report_id: str,
-    workbook: Workbook,
+    reader: ScanReportReader,
     data_dictionary: Dict[Any, Dict],
 ) -> None:
     """
     Handle creating a single table values.
 
+    The values are read lazily and inserted in batches, so the memory used does not
+    grow with the size of the table.
+
     Args:
+        table (ScanReportTable): The table to upload.
         field_entries (List[Dict[str, str]]): List of field entries to create.
         scan_report_id (str): ID of the scan report to attach to.
+        reader (ScanReportReader): The scan report to read table values from.
+        data_dictionary (Dict[Any, Dict]): The data dictionary.
 
     Raises:
         Exception: ValueError: Trying to access a sheet in the workbook that does not exist.
     """
-    fields = await ScanReportField.objects.abulk_create(field_entries)
-
-    if current_table_name not in workbook.sheetnames:
-        update_job(
-            JobStageType.UPLOAD_SCAN_REPORT,
-            StageStatusType.FAILED,
-            scan_report=ScanReport.objects.get(id=scan_report_id),
-        )
-        raise ValueError(
-            f"Attempting to access sheet '{current_table_name}'"
-            f" in scan report, but no such sheet exists."
-        )
+    current_table_name = str(table.name)
+    await _check_table_sheet(current_table_name, scan_report_id, reader)
 
     # Go to Table sheet to process all the values from the sheet
-    sheet = workbook[current_table_name]
+    batches = helpers.batched(
+        reader.iter_value_triples(current_table_name), helpers.handle_batch_size()
+    )
+    await sync_to_async(_upload_table)(table, field_entries, batches, data_dictionary)
+
+
+def _upload_table_in_thread(
+    table: ScanReportTable,
+    field_entries: list[ScanReportField],
+    batches: Iterable[List[Tuple[Any, str, Any]]],
+    data_dictionary: Dict[Any, Dict],
+) -> None:
+    """
+    Uploads a table from a worker thread, closing the thread's database connection
+    afterwards.
+
+    Args:
+        table (ScanReportTable): The table to upload.
+        field_entries (List[ScanReportField]): List of field entries to create.
+        batches (Iterable[List[Tuple[Any, str, Any]]]): Batches of (field name,
+            value, frequency) for each value in the table.
+        data_dictionary (Dict[Any, Dict]): The data dictionary.
+    """
+    try:
+        _upload_table(table, field_entries, batches, data_dictionary)
+    finally:
+        connections.close_all()
+
+
+def _iter_queued_batches(
+    queue: Queue, cancelled: threading.Event
+) -> Iterator[List[Tuple[Any, str, Any]]]:
+    """
+    Reads batches of values from a queue until the parser puts `None` on it.
+
+    Args:
+        queue (Queue): The queue the parser puts batches on.
+        cancelled (threading.Event): Set to stop reading early.
 
-    fieldname_value_freq_dict = _transform_scan_report_sheet_table(sheet)
-    await _add_SRValues_and_value_descriptions(
-        fieldname_value_freq_dict,
+    Returns:
+        Iterator[List[Tuple[Any, str, Any]]]: The batches of values.
+
+    Raises:
+        asyncio.CancelledError: If reading was stopped early.
+        Exception: The exception the parser put on the queue, if parsing failed.
+    """
+    while not cancelled.is_set():
+        try:
+            batch = queue.get(timeout=0.1)
+        except Empty:
+            continue
+        if batch is None:
+            return
+        if isinstance(batch, BaseException):
+            raise batch
+        yield batch
+    raise asyncio.CancelledError("Reading the parsed batches was cancelled.")
+
+
+async def _handle_single_table_in_pool(
+    table: ScanReportTable,
+    field_entries: list[ScanReportField],
+    scan_report_id: str,
+    reader: ScanReportReader,
+    data_dictionary: Dict[Any, Dict],
+    pool: ProcessPoolExecutor,
+    manager: SyncManager,
+) -> None:
+    """
+    Handle creating a single table values, parsing the sheet in a worker process.
+
+    Inserts run in their own thread and database connection, so that several tables
+    can be inserted at once.
+
+    Args:
+        table (ScanReportTable): The table to upload.
+        field_entries (List[ScanReportField]): List of field entries to create.
+        scan_report_id (str): ID of the scan report to attach to.
+        reader (ScanReportReader): The scan report to read table values from.
+        data_dictionary (Dict[Any, Dict]): The data dictionary.
+        pool (ProcessPoolExecutor): The pool to parse the sheet in.
+        manager (SyncManager): The manager to create the batch queue with.
+
+    Raises:
+        Exception: ValueError: Trying to access a sheet in the workbook that does not exist.
+    """
+    current_table_name = str(table.name)
+    await _check_table_sheet(current_table_name, scan_report_id, reader)
+
+    loop = asyncio.get_running_loop()
+    queue = manager.Queue(maxsize=PARSED_BATCHES_QUEUE_SIZE)
+    cancelled = threading.Event()
+    parsing = loop.run_in_executor(
+        pool,
+        put_value_batches,
+        reader.path,
         current_table_name,
+        queue,
+        helpers.handle_batch_size(),
+    )
+    uploading = loop.run_in_executor(
+        None,
+        _upload_table_in_thread,
+        table,
+        field_entries,
+        _iter_queued_batches(queue, cancelled),
         data_dictionary,
-        fields,
     )
+    try:
+        await asyncio.shield(uploading)
+    finally:
+        # If this table was cancelled, wait for its transaction to be rolled back.
+        cancelled.set()
+        await asyncio.wait([uploading])
+        # If inserting failed or was cancelled, drain the queue so the parser isn't
+        # left waiting to put batches on it.
+        while not parsing.done():
+            with suppress(Empty):
+                await loop.run_in_executor(None, partial(queue.get, timeout=0.1))
+        await parsing
+
+
+async def _create_fields_concurrently(
+    worksheet: Worksheet,
+    reader: ScanReportReader,
+    id: str,
+    tables: list[ScanReportTable],
+    data_dictionary: Dict[Any, Dict],
+    workers: int,
+) -> None:
+    """
+    Creates fields extracted from the Field Overview worksheet, and the values of
+    up to `workers` tables at once.
+
+    Sheets are parsed in a pool of worker processes, and handed over to be inserted
+    through bounded queues. If any table fails, the remaining tables are cancelled
+    and rolled back, and the error is raised.
+
+    Args:
+        worksheet (Worksheet): The worksheet containing table names.
+        reader (ScanReportReader): The scan report to read table values from.
+        id (str): Scan Report ID to POST to
+        tables (list[ScanReportTable]): The tables of the scan report.
+        data_dictionary (Dict[Any, Dict]): The data dictionary.
+        workers (int): The number of tables to process at once.
 
+    Raises:
+        Exception: The first error raised by any table.
+    """
+    context = multiprocessing.get_context("spawn")
+    semaphore = asyncio.Semaphore(workers)
 
-def _create_tables(worksheet: Worksheet, id: str) -> list[ScanReportTable]:
+    with (
+        ProcessPoolExecutor(workers, mp_context=context) as pool,
+        context.Manager() as manager,
+    ):
+
+        async def handle_table(
+            table: ScanReportTable, field_entries: list[ScanReportField]
+        ) -> None:
+            async with semaphore:
+                await _handle_single_table_in_pool(
+                    table,
+                    field_entries,
+                    id,
+                    reader,
+                    data_dictionary,
+                    pool,
+                    manager,
+                )
+
+        try:
+            async with asyncio.TaskGroup() as group:
+                for table, field_entries in _iter_table_field_entries(
+                    worksheet, tables
+                ):
+                    group.create_task(handle_table(table, field_entries))
+        except ExceptionGroup as errors:
+            raise errors.exceptions[0]
+
+
+def _create_tables(reader: ScanReportReader, id: str) -> list[ScanReportTable]:
     """
     Creates tables extracted from the Field Overview worksheet.
 
-    For each table name create a ScanReportTable.
+    For each table name create a ScanReportTable. If the upload is being resumed,
+    the tables already created are returned instead.
 
     Args:
-        worksheet (Worksheet): The worksheet containing table names.
+        reader (ScanReportReader): The scan report containing table names.
         id (str): The ID of the scan report.
 
     Returns:
         list[ScanReportTable]: A list of the ScanReportTables created.
     """
-    table_names = _get_unique_table_names(worksheet)
+    if tables := list(ScanReportTable.objects.filter(scan_report_id=id)):
+        logger.info(f"Resuming upload of {len(tables)} tables")
+        return tables
+
+    table_names = _get_unique_table_names(reader)
     logger.info(f"TABLES NAMES >>> {table_names}")
     table_models = [_create_table_entry(name, id) for name in table_names]
     return ScanReportTable.objects.bulk_create(table_models)
 
 
-async def _create_fields(
-    worksheet: Worksheet,
-    workbook: Workbook,
-    id: str,
-    tables: list[ScanReportTable],
-    data_dictionary: Dict[Any, Dict],
-) -> None:
+def _iter_table_field_entries(
+    worksheet: Worksheet, tables: list[ScanReportTable]
+) -> Iterator[Tuple[ScanReportTable, list[ScanReportField]]]:
     """
-    Creates fields extracted from the Field Overview worksheet.
+    Reads the fields of each table from the Field Overview worksheet.
 
     Loop over all rows in Field Overview sheet.
     This is the same as looping over all fields in all tables.
-    When the end of one table is reached, then post all the ScanReportFields
-    and ScanReportValues associated to that table, then continue down the
-    list of fields in tables.
+    When the end of one table is reached, return the ScanReportFields of that table,
+    then continue down the list of fields in tables. Tables that have already been
+    uploaded are skipped.
 
     Args:
         worksheet (Worksheet): The worksheet containing table names.
-        id (str): Scan Report ID to POST to
+        tables (list[ScanReportTable]): The tables of the scan report.
+
+    Returns:
+        Iterator[Tuple[ScanReportTable, list[ScanReportField]]]: Each table still to
+            upload, with the field entries to create for it.
     """
+    tables_by_name = {str(table.name): table for table in tables}
     field_entries_to_post = []
 
     previous_row_value = None
@@ -380,32 +571,59 @@ async def _create_fields(
         # If the row is not empty, then it is a field in a table, and should be added to
         # the list ready for processing at the end of this table.
         if row[0].value != "" and row[0].value is not None:
-            current_table_name = row[0].value
-            table = next(t for t in tables if t.name == current_table_name)
             # get the current table in the list of tables by name.
+            table = tables_by_name[str(row[0].value)]
 
             field_entry = _create_field_entry(row, table.pk)
             field_entries_to_post.append(field_entry)
         else:
             # This is the scenario where the line is empty, so we're at the end of
             # the table. Don't add a field entry, but process all those so far.
-            await _handle_single_table(
-                str(current_table_name),
-                field_entries_to_post,
-                id,
-                workbook,
-                data_dictionary,
-            )
+            if not table.upload_complete:
+                yield table, field_entries_to_post
             field_entries_to_post = []
 
     # Catch the final table if it wasn't already posted in the loop above -
     # sometimes the iter_rows() seems to now allow you to go beyond the last row.
-    if field_entries_to_post:
+    if field_entries_to_post and not table.upload_complete:
+        yield table, field_entries_to_post
+
+
+async def _create_fields(
+    worksheet: Worksheet,
+    reader: ScanReportReader,
+    id: str,
+    tables: list[ScanReportTable],
+    data_dictionary: Dict[Any, Dict],
+    workers: Optional[int] = None,
+) -> None:
+    """
+    Creates fields extracted from the Field Overview worksheet.
+
+    Post all the ScanReportFields and ScanReportValues associated to each table.
+    Tables are processed one at a time unless more than one worker is configured.
+
+    Args:
+        worksheet (Worksheet): The worksheet containing table names.
+        reader (ScanReportReader): The scan report to read table values from.
+        id (str): Scan Report ID to POST to
+        tables (list[ScanReportTable]): The tables of the scan report.
+        data_dictionary (Dict[Any, Dict]): The data dictionary.
+        workers (Optional[int]): The number of tables to process at once.
+    """
+    workers = helpers.handle_upload_workers(workers)
+    if workers > 1:
+        await _create_fields_concurrently(
+            worksheet, reader, id, tables, data_dictionary, workers
+        )
+        return
+
+    for table, field_entries in _iter_table_field_entries(worksheet, tables):
         await _handle_single_table(
-            str(current_table_name),
-            field_entries_to_post,
+            table,
+            field_entries,
             id,
-            workbook,
+            reader,
             data_dictionary,
         )
 
@@ -414,30 +632,30 @@ def _handle_failure(msg: func.QueueMessage, scan_report_id: str) -> None:
     """
     Handles failure scenarios where the message has been dequeued more than once.
 
+    A redelivered message resumes the upload from the first table that wasn't
+    uploaded, unless the upload has already been marked as failed.
+
     Args:
         msg (func.QueueMessage): The message received from the queue.
         scan_report_id (str): The ID of the scan report.
 
     Raises:
-        ValueError: If the dequeue count of the message exceeds 1.
+        ValueError: If the message was redelivered after the upload failed.
     """
     logger.info(f"dequeue_count {msg.dequeue_count}")
 
-    if msg.dequeue_count == 2:
-        update_job(
-            JobStageType.UPLOAD_SCAN_REPORT,
-            StageStatusType.FAILED,
-            scan_report=ScanReport.objects.get(id=scan_report_id),
-        )
     if msg.dequeue_count > 1:
-        raise ValueError("dequeue_count > 1")
+        upload_status = ScanReport.objects.get(id=scan_report_id).upload_status
+        if upload_status and upload_status.value == StageStatusType.FAILED.name:
+            raise ValueError("dequeue_count > 1 and the upload has failed")
+        logger.info("Resuming upload")
 
 
 def main(msg: func.QueueMessage) -> None:
     """
     Processes a queue message
     Unwraps the message content
-    Gets the workbook and data dictionary.
+    Gets the workbook and data dictionary, checking them first if the API didn't.
     Creates the scan report tables.
     Creates the scan report fields.
     Updates the scan report status accordingly.
@@ -456,17 +674,43 @@ def main(msg: func.QueueMessage) -> None:
         scan_report=ScanReport.objects.get(id=scan_report_id),
     )
 
-    wb = blob_parser.get_scan_report(scan_report_blob)
-    data_dictionary, _ = blob_parser.get_data_dictionary(data_dictionary_blob)
-
-    # Get the first sheet 'Field Overview',
-    # to populate ScanReportTable & ScanReportField models
-    fo_ws = wb.worksheets[0]
-
-    table_name_to_id_map = _create_tables(fo_ws, scan_report_id)
-    asyncio.run(
-        _create_fields(fo_ws, wb, scan_report_id, table_name_to_id_map, data_dictionary)
-    )
+    validate = _should_validate(msg)
+    try:
+        scan_report_path = blob_parser.download_scan_report(scan_report_blob)
+        try:
+            # Check the files first, if the API accepted them without checking.
+            if validate:
+                check_scan_report(scan_report_path)
+            data_dictionary, _ = blob_parser.get_data_dictionary(
+                data_dictionary_blob, check=validate
+            )
+            wb = blob_parser.load_scan_report(scan_report_path)
+            reader = ScanReportReader(scan_report_path)
+
+            # Get the first sheet 'Field Overview',
+            # to populate ScanReportTable & ScanReportField models
+            fo_ws = wb.worksheets[0]
+
+            table_name_to_id_map = _create_tables(reader, scan_report_id)
+            asyncio.run(
+                _create_fields(
+                    fo_ws, reader, scan_report_id, table_name_to_id_map, data_dictionary
+                )
+            )
+            reader.close()
+            wb.close()
+        finally:
+            os.remove(scan_report_path)
+    except ScanReportCheckError as e:
+        # The files won't change if the message is redelivered, so fail straight away.
+        logger.error(f"Scan report {scan_report_id} failed the checks: {e.errors}")
+        _set_upload_failed(scan_report_id, _check_errors_details(e.errors))
+        return
+    except Exception:
+        # The message won't be redelivered to resume from, so the upload has failed.
+        if msg.dequeue_count >= MAX_DEQUEUE_COUNT:
+            _set_upload_failed(scan_report_id)
+        raise
 
     update_job(
         JobStageType.UPLOAD_SCAN_REPORT,
@@ -0,0 +1,100 @@
+"""
+Throughput benchmark for creating Scan Report Fields and Values during upload.
+
+Compares creating them with COPY against `abulk_create`. Everything is inserted in a
+transaction that is rolled back, so nothing is kept. Only supported on PostgreSQL.
+
+Run from `app/workers`, with the database settings of the workers:
+
+    python -m benchmarks.bench_bulk_load --rows 100000 --batch-size 5000
+"""
+
+import argparse
+import os
+import sys
+import time
+from typing import Callable, List
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "shared_code.django_settings")
+import django
+
+django.setup()
+
+from asgiref.sync import async_to_sync
+from django.db import connection, transaction
+from django.db.models import Model
+from shared.mapping.models import ScanReportField, ScanReportValue
+from shared.services.bulk_load import bulk_load_fields, bulk_load_values
+
+
+def _make_fields(count: int) -> List[ScanReportField]:
+    return [
+        ScanReportField(
+            scan_report_table_id=0,
+            name=f"field_{i}",
+            description_column="",
+            type_column="VARCHAR",
+            max_length=32,
+            nrows=count,
+            nrows_checked=count,
+            fraction_empty=0,
+            nunique_values=count,
+            fraction_unique=1,
+        )
+        for i in range(count)
+    ]
+
+
+def _make_values(count: int) -> List[ScanReportValue]:
+    return [
+        ScanReportValue(
+            scan_report_field_id=0,
+            value=f"value_{i}",
+            frequency=i,
+            value_description="A description" if i % 2 else None,
+        )
+        for i in range(count)
+    ]
+
+
+def _abulk_create(objs: List[Model]) -> List[Model]:
+    # Run from a sync caller, so the insert shares this thread's connection and
+    # transaction.
+    return async_to_sync(type(objs[0]).objects.abulk_create)(objs)
+
+
+def _time(
+    objs: List[Model], batch_size: int, load: Callable[[List[Model]], List[Model]]
+) -> float:
+    with transaction.atomic():
+        # Foreign keys are checked at commit, which never happens.
+        start = time.perf_counter()
+        for i in range(0, len(objs), batch_size):
+            load(objs[i : i + batch_size])
+        elapsed = time.perf_counter() - start
+        transaction.set_rollback(True)
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    if connection.vendor != "postgresql":
+        sys.exit("COPY is only supported on PostgreSQL.")
+
+    for name, make, bulk_load in [
+        ("ScanReportField", _make_fields, bulk_load_fields),
+        ("ScanReportValue", _make_values, bulk_load_values),
+    ]:
+        for method, load in [("COPY", bulk_load), ("abulk_create", _abulk_create)]:
+            elapsed = _time(make(args.rows), args.batch_size, load)
+            print(
+                f"{name} {method}: {args.rows / elapsed:,.0f} rows/s ({elapsed:.2f}s)"
+            )
+
+
+if __name__ == "__main__":
+    main()
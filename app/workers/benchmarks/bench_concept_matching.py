@@ -0,0 +1,86 @@
+"""
+Micro-benchmark for matching scan report values to the concepts of a vocabulary in
+RulesConceptsActivity.
+
+Matches a synthetic set of values against the concepts returned for them, half of
+which match. Nothing is read from the database, so only the matching is measured.
+
+The nested loop matching used before is quadratic, so by default it is only timed on
+a sample of the values, and the time for all of them is estimated from it. Pass
+`--nested-sample 0` to skip it.
+
+Pass `--max-seconds` to fail when matching takes longer, to guard against
+regressions.
+
+Run from `app/workers`:
+
+    python -m benchmarks.bench_concept_matching --codes 100000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "shared_code.django_settings")
+import django
+
+django.setup()
+
+from RulesConceptsActivity import _match_concepts_to_entries
+from shared.data.models import Concept
+
+
+def _match_nested(entries, concepts) -> None:
+    for entry in entries:
+        entry["concept_id"] = -1
+        entry["standard_concept"] = None
+        for concept in concepts:
+            if str(entry["value"]) == str(concept.concept_code):
+                entry["concept_id"] = str(concept.concept_id)
+                entry["standard_concept"] = str(concept.standard_concept)
+                break
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--codes", type=int, default=100000)
+    parser.add_argument("--nested-sample", type=int, default=200)
+    parser.add_argument("--max-seconds", type=float)
+    args = parser.parse_args()
+
+    entries = [{"value": f"code_{code}"} for code in range(args.codes)]
+    # Only every other value is a code in the vocabulary, and the concepts come back
+    # in a different order to the values.
+    concepts = [
+        Concept(concept_id=code, concept_code=f"code_{code}", standard_concept="S")
+        for code in reversed(range(0, args.codes, 2))
+    ]
+
+    start = time.perf_counter()
+    _match_concepts_to_entries(entries, concepts)
+    elapsed = time.perf_counter() - start
+    matched = sum(entry["concept_id"] != -1 for entry in entries)
+    print(
+        f"{args.codes} values, {len(concepts)} concepts, {matched} matched: "
+        f"{elapsed:.3f}s"
+    )
+
+    if args.nested_sample:
+        sample = [dict(entry) for entry in entries[: args.nested_sample]]
+        start = time.perf_counter()
+        _match_nested(sample, concepts)
+        nested_elapsed = time.perf_counter() - start
+        assert sample == entries[: args.nested_sample]
+        estimate = nested_elapsed * args.codes / len(sample)
+        print(
+            f"nested loop: {nested_elapsed:.3f}s for {len(sample)} values, "
+            f"~{estimate:.0f}s estimated for {args.codes}"
+        )
+
+    if args.max_seconds is not None and elapsed > args.max_seconds:
+        sys.exit(f"Matching took longer than {args.max_seconds}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Benchmark for looking up large sets of values with `lookup_in`.
+
+Compares the query count and latency of looking up concepts by code with chunked IN
+lists and a temporary table. Half of the codes looked up exist. Only
+chunked IN lists are compared on databases other than PostgreSQL.
+
+Run from `app/workers`, with the database settings of the workers:
+
+    python -m benchmarks.bench_lookups --values 100000
+"""
+
+import argparse
+import os
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "shared_code.django_settings")
+import django
+
+django.setup()
+
+from django.db import connection
+from shared.data.models import Concept
+from shared.services.lookups import choose_strategy, lookup_in
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--values", type=int, default=100000)
+    args = parser.parse_args()
+
+    codes = list(
+        Concept.objects.values_list("concept_code", flat=True)[: args.values // 2]
+    )
+    codes += [f"missing_{i}" for i in range(args.values - len(codes))]
+
+    strategies = ["in"]
+    if connection.vendor == "postgresql":
+        strategies.append("temp_table")
+    print(f"{len(codes)} codes, {choose_strategy(len(codes), 'default')} chosen")
+    for strategy in strategies:
+        result = lookup_in(
+            Concept.objects.values_list("concept_id"),
+            "concept_code",
+            codes,
+            strategy=strategy,
+        )
+        print(
+            f"{strategy}: {len(result.rows)} rows in {result.queries} queries, "
+            f"{result.seconds:.2f}s"
+        )
+
+
+if __name__ == "__main__":
+    main()
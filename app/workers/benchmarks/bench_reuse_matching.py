@@ -0,0 +1,123 @@
+"""
+Micro-benchmark for matching new scan report values and fields to existing ones
+with concepts in RulesConceptsActivity.reuse.
+
+Matches a synthetic set of new values and fields against many existing ones, about
+half of which match. Nothing is read from the database, so only the matching is
+measured.
+
+The filtering used before checks every existing value for each new one, so by
+default it is only timed on a sample of the new values and fields, and the time for
+all of them is estimated from it. Pass `--filter-sample 0` to skip it.
+
+Pass `--max-seconds` to fail when matching takes longer, to guard against
+regressions.
+
+Run from `app/workers`:
+
+    python -m benchmarks.bench_reuse_matching --existing 1000000 --new 10000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "shared_code.django_settings")
+import django
+
+django.setup()
+
+from RulesConceptsActivity.reuse import _match_fields, _match_values
+
+
+def _match_values_by_filter(new_values_full_details, existing_mappings_to_consider):
+    for item in new_values_full_details:
+        list(
+            filter(
+                lambda mapping: mapping["name"] == item["name"]
+                and mapping["description"] == item["description"]
+                and mapping["field_name"] == item["field_name"],
+                existing_mappings_to_consider,
+            )
+        )
+
+
+def _match_fields_by_filter(new_fields_full_details, existing_mappings_to_consider):
+    for item in new_fields_full_details:
+        list(
+            filter(
+                lambda mapping: mapping["name"] == item["name"],
+                existing_mappings_to_consider,
+            )
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--existing", type=int, default=1000000)
+    parser.add_argument("--new", type=int, default=10000)
+    parser.add_argument("--filter-sample", type=int, default=10)
+    parser.add_argument("--max-seconds", type=float)
+    args = parser.parse_args()
+
+    existing_values = [
+        {
+            "id": i,
+            "name": f"value_{i}",
+            "concept": [str(i % 1000)],
+            "description": None,
+            "field_name": f"field_{i % 100}",
+        }
+        for i in range(args.existing)
+    ]
+    existing_fields = [
+        {"id": i, "name": f"field_{i}", "concept": [str(i % 1000)]}
+        for i in range(args.existing)
+    ]
+    # Every other new value and field matches an existing one.
+    new_values = [
+        {
+            "id": args.existing + i,
+            "name": f"value_{i * 2 if i % 2 else -i}",
+            "description": None,
+            "field_name": f"field_{i * 2 % 100}",
+        }
+        for i in range(args.new)
+    ]
+    new_fields = [
+        {"id": str(args.existing + i), "name": f"field_{i * 2 if i % 2 else -i}"}
+        for i in range(args.new)
+    ]
+
+    elapsed = 0.0
+    for kind, match, match_by_filter, new, existing in [
+        ("values", _match_values, _match_values_by_filter, new_values, existing_values),
+        ("fields", _match_fields, _match_fields_by_filter, new_fields, existing_fields),
+    ]:
+        start = time.perf_counter()
+        matches = match(new, existing)
+        kind_elapsed = time.perf_counter() - start
+        elapsed += kind_elapsed
+        print(
+            f"{len(new)} new {kind}, {len(existing)} existing, {len(matches)} "
+            f"matched: {kind_elapsed:.2f}s"
+        )
+
+        if args.filter_sample:
+            sample = new[: args.filter_sample]
+            start = time.perf_counter()
+            match_by_filter(sample, existing)
+            filter_elapsed = time.perf_counter() - start
+            estimate = filter_elapsed * len(new) / len(sample)
+            print(
+                f"filtering: {filter_elapsed:.2f}s for {len(sample)} {kind}, "
+                f"~{estimate:.0f}s estimated for {len(new)}"
+            )
+
+    if args.max_seconds is not None and elapsed > args.max_seconds:
+        sys.exit(f"Matching took longer than {args.max_seconds}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+Benchmark for the consistency checks run on Scan Report uploads.
+
+Builds a synthetic Scan Report of many tables, then measures the time and peak RSS
+of checking it, both by loading the whole workbook as the upload validation used to,
+and with `check_scan_report`. Each approach runs in its own process.
+
+Sheets are given dimension records, as Excel writes them. Pass
+`--without-dimensions` to measure the worst case, where read-only mode has to read
+each sheet in full to size it.
+
+Pass `--max-seconds` or `--max-mib` to fail when `check_scan_report` takes longer or
+uses more memory, to guard against regressions.
+
+Run from `app/workers`:
+
+    python -m benchmarks.bench_scan_report_checks --tables 20 --fields 50 --rows 20000
+"""
+
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+
+import openpyxl
+from openpyxl.utils.cell import get_column_letter
+from shared.services.scan_report_checks import (
+    EXPECTED_HEADERS,
+    check_scan_report,
+    check_workbook,
+)
+
+
+def _write_scan_report(path: str, tables: int, fields: int, rows: int) -> None:
+    wb = openpyxl.Workbook(write_only=True)
+    fo_ws = wb.create_sheet("Field Overview")
+    fo_ws.append(EXPECTED_HEADERS)
+    for table in range(tables):
+        for field in range(fields):
+            fo_ws.append([f"table_{table}", f"field_{field}"])
+        fo_ws.append([None])
+    for table in range(tables):
+        sheet = wb.create_sheet(f"table_{table}")
+        header = []
+        for field in range(fields):
+            header += [f"field_{field}", "Frequency"]
+        sheet.append(header)
+        for row in range(rows):
+            values = []
+            for field in range(fields):
+                values += [f"value_{field}_{row}", row]
+            sheet.append(values)
+    wb.save(path)
+
+
+def _add_dimensions(path: str, tables: int, fields: int, rows: int) -> None:
+    # openpyxl's write-only mode leaves out the dimension record that Excel writes to
+    # each sheet, without which read-only mode reads every sheet in full to size it.
+    dimensions = {
+        "xl/worksheets/sheet1.xml": f"A1:J{tables * (fields + 1) + 1}",
+        **{
+            f"xl/worksheets/sheet{table + 2}.xml": (
+                f"A1:{get_column_letter(fields * 2)}{rows + 1}"
+            )
+            for table in range(tables)
+        },
+    }
+    with zipfile.ZipFile(path) as source, zipfile.ZipFile(
+        f"{path}.tmp", "w", zipfile.ZIP_DEFLATED
+    ) as target:
+        for info in source.infolist():
+            data = source.read(info.filename)
+            if info.filename in dimensions:
+                dimension = f'<dimension ref="{dimensions[info.filename]}"/>'
+                data = data.replace(
+                    b"<sheetData", dimension.encode() + b"<sheetData", 1
+                )
+            target.writestr(info, data)
+    os.replace(f"{path}.tmp", path)
+
+
+def _loaded(path: str) -> None:
+    with open(path, "rb") as f:
+        wb = openpyxl.load_workbook(f, data_only=True)
+    check_workbook(wb)
+
+
+def _streamed(path: str) -> None:
+    with open(path, "rb") as f:
+        check_scan_report(f)
+
+
+def _peak_rss_mib() -> float:
+    # ru_maxrss is reported in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tables", type=int, default=20)
+    parser.add_argument("--fields", type=int, default=50)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--max-seconds", type=float)
+    parser.add_argument("--max-mib", type=float)
+    parser.add_argument("--skip-loaded", action="store_true")
+    parser.add_argument("--without-dimensions", action="store_true")
+    parser.add_argument("--mode", choices=["loaded", "streamed"])
+    parser.add_argument("--path")
+    args = parser.parse_args()
+
+    if args.mode:
+        run = _loaded if args.mode == "loaded" else _streamed
+        baseline = _peak_rss_mib()
+        start = time.perf_counter()
+        run(args.path)
+        elapsed = time.perf_counter() - start
+        peak = _peak_rss_mib() - baseline
+        print(f"{args.mode}: {elapsed:.2f}s, peak RSS +{peak:.1f} MiB")
+        if args.max_seconds is not None and elapsed > args.max_seconds:
+            sys.exit(f"Checking took longer than {args.max_seconds}s")
+        if args.max_mib is not None and peak > args.max_mib:
+            sys.exit(f"Checking used more than {args.max_mib} MiB")
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "scan_report.xlsx")
+        _write_scan_report(path, args.tables, args.fields, args.rows)
+        if not args.without_dimensions:
+            _add_dimensions(path, args.tables, args.fields, args.rows)
+        print(
+            f"{args.tables} tables of {args.fields} fields and {args.rows} rows, "
+            f"{os.path.getsize(path)} bytes"
+        )
+        if not args.skip_loaded:
+            subprocess.run(
+                [
+                    sys.executable,
+                    "-m",
+                    "benchmarks.bench_scan_report_checks",
+                    "--mode=loaded",
+                    f"--path={path}",
+                ],
+                check=True,
+            )
+        command = [
+            sys.executable,
+            "-m",
+            "benchmarks.bench_scan_report_checks",
+            "--mode=streamed",
+            f"--path={path}",
+        ]
+        if args.max_seconds is not None:
+            command.append(f"--max-seconds={args.max_seconds}")
+        if args.max_mib is not None:
+            command.append(f"--max-mib={args.max_mib}")
+        subprocess.run(command, check=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Memory benchmark for scan report value ingestion in UploadQueue.
+
+Builds a synthetic table sheet, then measures the peak RSS of turning it into
+ScanReportValues, both by materialising the whole table up front (the previous
+behaviour) and by streaming it through in fixed-size batches. Each approach runs in
+its own process, and database inserts are replaced with a no-op, so only the parsing
+and value building is measured.
+
+Run from `app/workers`:
+
+    python -m benchmarks.bench_upload_memory --rows 200000 --fields 10
+"""
+
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+from contextlib import nullcontext
+from unittest.mock import patch
+
+import openpyxl
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "shared_code.django_settings")
+import django
+
+django.setup()
+
+from shared.mapping.models import ScanReportField, ScanReportTable
+from shared_code import helpers
+from shared_code.xlsx_reader import ScanReportReader
+from UploadQueue import _create_value_columns, _index_fields, _upload_table
+
+TABLE_NAME = "Table"
+
+
+def _write_scan_report(path: str, rows: int, fields: int) -> None:
+    wb = openpyxl.Workbook(write_only=True)
+    wb.create_sheet("Field Overview").append(["Table", "Field"])
+    sheet = wb.create_sheet(TABLE_NAME)
+    header = []
+    for field in range(fields):
+        header += [f"field_{field}", "Frequency"]
+    sheet.append(header)
+    for row in range(rows):
+        values = []
+        for field in range(fields):
+            values += [f"value_{field}_{row}", row]
+        sheet.append(values)
+    wb.save(path)
+
+
+def _materialised(path: str, fields: list[ScanReportField]) -> None:
+    with ScanReportReader(path) as reader:
+        value_freq_triples = list(reader.iter_value_triples(TABLE_NAME))
+    _create_value_columns(value_freq_triples, _index_fields(fields, TABLE_NAME, {}))
+
+
+def _streamed(path: str, fields: list[ScanReportField]) -> None:
+    with ScanReportReader(path) as reader:
+        batches = helpers.batched(
+            reader.iter_value_triples(TABLE_NAME), helpers.handle_batch_size()
+        )
+        _upload_table(ScanReportTable(name=TABLE_NAME), fields, batches, {})
+
+
+def _discard(rows):
+    return rows
+
+
+def _peak_rss_mib() -> float:
+    # ru_maxrss is reported in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--fields", type=int, default=10)
+    parser.add_argument("--mode", choices=["materialised", "streamed"])
+    parser.add_argument("--path")
+    args = parser.parse_args()
+
+    if args.mode:
+        fields = [
+            ScanReportField(pk=field, name=f"field_{field}")
+            for field in range(args.fields)
+        ]
+        run = _materialised if args.mode == "materialised" else _streamed
+        baseline = _peak_rss_mib()
+        with (
+            patch("UploadQueue.transaction.atomic", new=nullcontext),
+            patch("UploadQueue.ScanReportTable.save"),
+            patch("UploadQueue.bulk_load_fields", new=_discard),
+            patch("UploadQueue.bulk_load_value_columns", new=_discard),
+        ):
+            run(args.path, fields)
+        print(f"{args.mode}: peak RSS +{_peak_rss_mib() - baseline:.1f} MiB")
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "scan_report.xlsx")
+        _write_scan_report(path, args.rows, args.fields)
+        print(f"{args.rows * args.fields} values, {os.path.getsize(path)} bytes")
+        for mode in ["materialised", "streamed"]:
+            subprocess.run(
+                [
+                    sys.executable,
+                    "-m",
+                    "benchmarks.bench_upload_memory",
+                    f"--fields={args.fields}",
+                    f"--mode={mode}",
+                    f"--path={path}",
+                ],
+                check=True,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Throughput benchmark for uploading several tables at once in UploadQueue.
+
+Builds a synthetic scan report with several table sheets, then times creating the
+fields and values of every table with different numbers of workers. Database inserts
+are replaced with a fixed delay per batch, standing in for the round trip to the
+database, so only the overlap of parsing and inserting is measured.
+
+Run from `app/workers`:
+
+    python -m benchmarks.bench_upload_workers --tables 8 --rows 20000 --workers 1 4
+"""
+
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from contextlib import nullcontext
+from unittest.mock import patch
+
+import openpyxl
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "shared_code.django_settings")
+import django
+
+django.setup()
+
+from shared.mapping.models import ScanReportTable
+from shared_code.xlsx_reader import ScanReportReader
+from UploadQueue import _create_fields
+
+FIELDS = 5
+FIELD_OVERVIEW_HEADER = [
+    "Table",
+    "Field",
+    "Description",
+    "Type",
+    "Max length",
+    "N rows",
+    "N rows checked",
+    "Fraction empty",
+    "N unique values",
+    "Fraction unique",
+]
+
+
+def _write_scan_report(path: str, tables: int, rows: int) -> None:
+    wb = openpyxl.Workbook(write_only=True)
+    overview = wb.create_sheet("Field Overview")
+    overview.append(FIELD_OVERVIEW_HEADER)
+    for table in range(tables):
+        for field in range(FIELDS):
+            overview.append(
+                [f"table_{table}", f"field_{field}", "", "", 1, 1, 1, 0, 1, 0]
+            )
+        overview.append([])
+
+    for table in range(tables):
+        sheet = wb.create_sheet(f"table_{table}")
+        header = []
+        for field in range(FIELDS):
+            header += [f"field_{field}", "Frequency"]
+        sheet.append(header)
+        for row in range(rows):
+            values = []
+            for field in range(FIELDS):
+                values += [f"value_{field}_{row}", row]
+            sheet.append(values)
+    wb.save(path)
+
+
+def _run(path: str, tables: int, workers: int, latency: float) -> float:
+    def bulk_load(objs):
+        time.sleep(latency)
+        return objs
+
+    table_models = [
+        ScanReportTable(pk=table, name=f"table_{table}") for table in range(tables)
+    ]
+    wb = openpyxl.load_workbook(path, read_only=True)
+    worksheet = wb.worksheets[0]
+    worksheet.calculate_dimension(force=True)
+
+    with (
+        ScanReportReader(path) as reader,
+        patch("UploadQueue.transaction.atomic", new=nullcontext),
+        patch("UploadQueue.ScanReportTable.save"),
+        patch("UploadQueue.bulk_load_fields", new=bulk_load),
+        patch("UploadQueue.bulk_load_value_columns", new=bulk_load),
+    ):
+        start = time.perf_counter()
+        asyncio.run(_create_fields(worksheet, reader, "1", table_models, {}, workers))
+        elapsed = time.perf_counter() - start
+    wb.close()
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tables", type=int, default=8)
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument(
+        "--latency", type=float, default=0.05, help="Seconds per inserted batch"
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "scan_report.xlsx")
+        _write_scan_report(path, args.tables, args.rows)
+        print(f"{args.tables} tables, {args.tables * args.rows * FIELDS} values")
+        for workers in args.workers:
+            elapsed = _run(path, args.tables, workers, args.latency)
+            print(f"{workers} workers: {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Micro-benchmark for building scan report values in UploadQueue.
+
+Builds the value columns for a synthetic table of many fields, in the batches used
+during upload, with value descriptions from a data dictionary for half the fields.
+Nothing is read from a sheet or inserted, so only the value building is measured.
+
+Pass `--max-seconds` to fail when building takes longer, to guard against
+regressions.
+
+Run from `app/workers`:
+
+    python -m benchmarks.bench_value_building --fields 500 --values 1000000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "shared_code.django_settings")
+import django
+
+django.setup()
+
+from shared.mapping.models import ScanReportField
+from shared_code import helpers
+from UploadQueue import _create_value_columns, _index_fields
+
+TABLE_NAME = "Table"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--fields", type=int, default=500)
+    parser.add_argument("--values", type=int, default=1000000)
+    parser.add_argument("--batch-size", type=int, default=helpers.handle_batch_size())
+    parser.add_argument("--max-seconds", type=float)
+    args = parser.parse_args()
+
+    fields = [
+        ScanReportField(pk=field, name=f"field_{field}") for field in range(args.fields)
+    ]
+    values_per_field = args.values // args.fields
+    data_dictionary = {
+        TABLE_NAME: {
+            f"field_{field}": {
+                f"value_{value}": f"description_{value}"
+                for value in range(0, values_per_field, 2)
+            }
+            for field in range(0, args.fields, 2)
+        }
+    }
+    # Sheets are read row by row, so consecutive values belong to different fields.
+    value_freq_triples = [
+        (f"field_{field}", f"value_{value}", value)
+        for value in range(values_per_field)
+        for field in range(args.fields)
+    ]
+
+    start = time.perf_counter()
+    fields_index = _index_fields(fields, TABLE_NAME, data_dictionary)
+    built = 0
+    for batch in helpers.batched(value_freq_triples, args.batch_size):
+        built += len(_create_value_columns(batch, fields_index))
+    elapsed = time.perf_counter() - start
+
+    print(
+        f"{args.fields} fields, {built} values: {elapsed:.2f}s "
+        f"({built / elapsed:,.0f} values/s)"
+    )
+    if args.max_seconds is not None and elapsed > args.max_seconds:
+        sys.exit(f"Building values took longer than {args.max_seconds}s")
+
+
+if __name__ == "__main__":
+    main()
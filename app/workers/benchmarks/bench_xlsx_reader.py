@@ -0,0 +1,72 @@
+"""
+Parse speed benchmark for scan report table sheets.
+
+Builds a synthetic table sheet, then times reading every (header, value, frequency)
+triple from it with openpyxl's read-only worksheets, as UploadQueue used to, and with
+ScanReportReader.
+
+Run from `app/workers`:
+
+    python -m benchmarks.bench_xlsx_reader --rows 200000 --fields 10
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from typing import Any, Iterator, Tuple
+
+from benchmarks.bench_upload_memory import TABLE_NAME, _write_scan_report
+from shared_code import blob_parser
+from shared_code.xlsx_reader import ScanReportReader
+
+
+def _iter_openpyxl_values(path: str) -> Iterator[Tuple[Any, str, Any]]:
+    wb = blob_parser.load_scan_report(path)
+    sheet = wb[TABLE_NAME]
+    sheet.reset_dimensions()
+    first_row = next(sheet.iter_rows(min_row=1, max_row=1, values_only=True), ())
+    sheet_headers = list(first_row[::2])
+    for row in sheet.iter_rows(
+        min_col=1, max_col=len(sheet_headers) * 2, min_row=2, values_only=True
+    ):
+        this_row_empty = True
+        for header, cell, freq in zip(sheet_headers, row[::2], row[1::2]):
+            if (cell != "" and cell is not None) or (freq != "" and freq is not None):
+                yield header, str(cell), freq
+                this_row_empty = False
+        if this_row_empty:
+            break
+    wb.close()
+
+
+def _iter_reader_values(path: str) -> Iterator[Tuple[Any, str, Any]]:
+    with ScanReportReader(path) as reader:
+        yield from reader.iter_value_triples(TABLE_NAME)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--fields", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "scan_report.xlsx")
+        _write_scan_report(path, args.rows, args.fields)
+        print(f"{args.rows * args.fields} values, {os.path.getsize(path)} bytes")
+
+        results = {}
+        for name, iter_values in [
+            ("openpyxl", _iter_openpyxl_values),
+            ("ScanReportReader", _iter_reader_values),
+        ]:
+            start = time.perf_counter()
+            results[name] = list(iter_values(path))
+            print(f"{name}: {time.perf_counter() - start:.2f}s")
+
+        assert results["openpyxl"] == results["ScanReportReader"]
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+import codecs
+import csv
+import hashlib
+import json
+import os
+import tempfile
+from collections import OrderedDict
+from functools import cache
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+# {tables: {fields: {values: value description}}}
+DataDictionary = Dict[str, Dict[str, Dict[str, Any]]]
+# {tables: {fields: vocab}}
+VocabDictionary = Dict[str, Dict[str, str]]
+CompiledDataDictionary = Tuple[DataDictionary, VocabDictionary]
+
+
+def iter_lines(chunks: Iterable[bytes]) -> Iterator[str]:
+    """
+    Decodes chunks of a UTF-8 file into lines, as they are read.
+
+    Any byte order mark at the start of the file is removed.
+
+    Args:
+        chunks (Iterable[bytes]): The chunks of the file.
+
+    Returns:
+        Iterator[str]: The lines of the file, with their line endings.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    pending = ""
+    for chunk in chunks:
+        lines = (pending + decoder.decode(chunk)).splitlines(keepends=True)
+        # Hold back the last line until it is known to be complete, including a
+        # "\r\n" split across chunks.
+        pending = lines.pop() if lines and not lines[-1].endswith("\n") else ""
+        yield from lines
+    yield from (pending + decoder.decode(b"", final=True)).splitlines(keepends=True)
+
+
+def compile_data_dictionary(lines: Iterable[str]) -> CompiledDataDictionary:
+    """
+    Compiles a data dictionary CSV into value descriptions and vocabularies, in a
+    single pass.
+
+    Rows with a value are value descriptions, and rows without one give the
+    vocabulary of a field.
+
+    Args:
+        lines (Iterable[str]): The lines of the data dictionary CSV, with columns
+            'csv_file_name', 'field_name', 'code' and 'value'.
+
+    Returns:
+        CompiledDataDictionary: The data dictionary, with structure
+            {tables: {fields: {values: value description}}}, and the vocabulary
+            dictionary, with structure {tables: {fields: vocab}}.
+    """
+    data_dictionary: DataDictionary = {}
+    vocab_dictionary: VocabDictionary = {}
+    for row in csv.DictReader(lines):
+        table_name, field_name = row["csv_file_name"], row["field_name"]
+        if row["value"] == "":
+            vocab_dictionary.setdefault(table_name, {})[field_name] = row["code"]
+        else:
+            data_dictionary.setdefault(table_name, {}).setdefault(field_name, {})[
+                row["code"]
+            ] = row["value"]
+    return data_dictionary, vocab_dictionary
+
+
+class DataDictionaryCache:
+    """
+    A cache of compiled data dictionaries, held in memory and on local disk.
+
+    Entries are keyed by the name and etag of their blob, so a blob that changes is
+    compiled again. Once there are more than `max_entries`, the least recently used
+    are evicted. Entries are shared, so must not be modified.
+
+    Args:
+        directory (str): The directory to cache compiled data dictionaries in.
+        max_entries (int): The number of entries to keep, in memory and on disk.
+    """
+
+    def __init__(self, directory: str, max_entries: int):
+        self.directory = directory
+        self.max_entries = max_entries
+        self._entries: OrderedDict[Tuple[str, str], CompiledDataDictionary] = (
+            OrderedDict()
+        )
+
+    def _path(self, blob: str, etag: str) -> str:
+        key = hashlib.sha256(f"{blob}\0{etag}".encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _remember(self, blob: str, etag: str, compiled: CompiledDataDictionary) -> None:
+        self._entries[blob, etag] = compiled
+        self._entries.move_to_end((blob, etag))
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, blob: str, etag: str) -> Optional[CompiledDataDictionary]:
+        """
+        Gets a compiled data dictionary from the cache.
+
+        Args:
+            blob (str): The name of the data dictionary blob.
+            etag (str): The etag of the blob.
+
+        Returns:
+            Optional[CompiledDataDictionary]: The compiled data dictionary, or None if
+                it isn't cached.
+        """
+        if (compiled := self._entries.get((blob, etag))) is not None:
+            self._entries.move_to_end((blob, etag))
+            return compiled
+
+        path = self._path(blob, etag)
+        try:
+            with open(path, encoding="utf-8") as f:
+                cached = json.load(f)
+            # Mark the file as recently used.
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        compiled = cached["data_dictionary"], cached["vocab_dictionary"]
+        self._remember(blob, etag, compiled)
+        return compiled
+
+    def put(self, blob: str, etag: str, compiled: CompiledDataDictionary) -> None:
+        """
+        Adds a compiled data dictionary to the cache.
+
+        Args:
+            blob (str): The name of the data dictionary blob.
+            etag (str): The etag of the blob.
+            compiled (CompiledDataDictionary): The compiled data dictionary.
+        """
+        self._remember(blob, etag, compiled)
+
+        os.makedirs(self.directory, exist_ok=True)
+        data_dictionary, vocab_dictionary = compiled
+        # Write to a temporary file first, so other processes never read a partly
+        # written entry.
+        with tempfile.NamedTemporaryFile(
+            "w", dir=self.directory, suffix=".tmp", delete=False, encoding="utf-8"
+        ) as f:
+            json.dump(
+                {
+                    "data_dictionary": data_dictionary,
+                    "vocab_dictionary": vocab_dictionary,
+                },
+                f,
+            )
+        os.replace(f.name, self._path(blob, etag))
+        self._evict_files()
+
+    def _evict_files(self) -> None:
+        paths = [
+            entry.path
+            for entry in os.scandir(self.directory)
+            if entry.name.endswith(".json")
+        ]
+        if len(paths) <= self.max_entries:
+            return
+        paths.sort(key=_mtime_or_zero)
+        for path in paths[: len(paths) - self.max_entries]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def _mtime_or_zero(path: str) -> float:
+    try:
+        return os.path.getmtime(path)
+    except FileNotFoundError:
+        return 0
+
+
+@cache
+def get_cache() -> DataDictionaryCache:
+    """
+    Gets the data dictionary cache of this process, configured by the
+    'DATA_DICTIONARY_CACHE_DIR' and 'DATA_DICTIONARY_CACHE_SIZE' environment
+    variables.
+
+    Returns:
+        DataDictionaryCache: The data dictionary cache.
+    """
+    directory = os.environ.get("DATA_DICTIONARY_CACHE_DIR") or os.path.join(
+        tempfile.gettempdir(), "carrot-data-dictionaries"
+    )
+    max_entries_str = os.environ.get("DATA_DICTIONARY_CACHE_SIZE")
+    max_entries = int(max_entries_str) if max_entries_str else 16
+    return DataDictionaryCache(directory, max_entries)
@@ -1,25 +1,43 @@
+import os
 from collections import OrderedDict, defaultdict
-from typing import Any, Dict, List, Literal, Optional, Union
 from enum import Enum
+from typing import Any, Dict, Iterable, List, Literal, Optional, Tuple, Union
 
 from django.contrib.contenttypes.models import ContentType
+from django.db.models import Count, Max
 from django.db.models.query import QuerySet
 from shared.data.models import Concept, ConceptRelationship
+from shared.jobs.models import Job, JobStage, StageStatus
 from shared.mapping.models import (
+    ReusableConcept,
     ScanReport,
     ScanReportConcept,
     ScanReportField,
-    ScanReportValue,
     ScanReportTable,
+    ScanReportValue,
+    StandardConceptMap,
     UploadStatus,
 )
+from shared.services.lookups import lookup_in
+from shared.services.vocabulary_index import (
+    VocabularyIndex,
+    VocabularyIndexError,
+    get_vocabulary_version,
+)
+from shared_code.helpers import batched
 from shared_code.logger import logger
 from shared_code.models import (
     ScanReportConceptContentType,
     ScanReportFieldDict,
     ScanReportValueDict,
 )
-from shared.jobs.models import Job, JobStage, StageStatus
+
+# The number of objects to look up existing concepts for in one query
+CONCEPT_LOOKUP_BATCH_SIZE = 5000
+
+# The vocabulary index opened by this process, and the file it was opened from
+_vocabulary_index: Optional[VocabularyIndex] = None
+_vocabulary_index_file: Optional[Tuple[str, int, int]] = None
 
 
 class StageStatusType(Enum):
@@ -57,13 +75,19 @@ def update_job(
     stage_status_entity = StageStatus.objects.get(value=status.name)
     upload_status_entity = UploadStatus.objects.get(value=status.name)
 
+    job = None
     # Update scan report upload status if the stage is UPLOAD_SCAN_REPORT
     if scan_report and stage.name == "UPLOAD_SCAN_REPORT":
         scan_report.upload_status = upload_status_entity
         scan_report.save()
+        # Uploads validated by the worker also have a job, to report errors through
+        job = (
+            Job.objects.filter(scan_report=scan_report, stage=job_stage_entity)
+            .order_by("-created_at")
+            .first()
+        )
     else:
         # Get the latest job record to update based on scan_report or scan_report_table
-        job = None
         if scan_report:
             job = Job.objects.filter(
                 scan_report=scan_report, stage=job_stage_entity
@@ -73,51 +97,87 @@ def update_job(
                 scan_report_table=scan_report_table, stage=job_stage_entity
             ).order_by("-created_at")[0]
 
-        if job:
-            # Update status and details
-            job.status = stage_status_entity
-            if details:
-                job.details = details
-            job.save()
+    if job:
+        # Update status and details
+        job.status = stage_status_entity
+        if details:
+            job.details = details
+        job.save()
+
+
+def lookup(queryset: QuerySet, field_name: str, values: Iterable[Any]) -> List[Any]:
+    """
+    Gets the rows of a queryset whose field is any of the values, with the strategy
+    `lookup_in` chooses for the number of values, logging how long it took.
+
+    Args:
+        - queryset (QuerySet): The queryset to filter, which may select values.
+        - field_name (str): The field of the queryset's model to match.
+        - values (Iterable[Any]): The values to match.
+
+    Returns:
+        - List[Any]: The rows found.
+    """
+    result = lookup_in(queryset, field_name, values)
+    logger.debug(
+        f"Looked up {queryset.model.__name__}.{field_name} with {result.strategy}: "
+        f"{len(result.rows)} rows in {result.queries} queries, {result.seconds:.2f}s"
+    )
+    return result.rows
 
 
-def create_concept(
-    concept_id: Union[str, int],
-    object_id: str,
+def create_concepts(
+    concept_object_ids: Iterable[Tuple[Union[str, int], Union[str, int]]],
     content_type: ScanReportConceptContentType,
     creation_type: Literal["V", "R"] = "V",
-) -> Optional[ScanReportConcept]:
+) -> List[ScanReportConcept]:
     """
-    Creates a new ScanReportConcept.
+    Creates new ScanReportConcepts for a batch of concept and object pairs.
 
-    Checks if the ScanReportConcept already exists, and returns None if it does.
+    Pairs that already have a ScanReportConcept, or repeat an earlier pair, are
+    skipped. The content type is looked up once, and existing ScanReportConcepts with
+    one query per `CONCEPT_LOOKUP_BATCH_SIZE` objects.
 
     Args:
-        - concept_id (str): The Id of the Concept to create.
-        - object_id (str): The Object Id of the Concept to create.
-        - content_type (Literal["scanreportfield", "scanreportvalue"]): The Content Type of the Concept.
-        - creation_type (Literal["R", "V"], optional): The Creation Type value of the Concept.
+        - concept_object_ids (Iterable[Tuple[Union[str, int], Union[str, int]]]): The
+            Id of the Concept and the Object Id of each Concept to create.
+        - content_type (ScanReportConceptContentType): The Content Type of the
+            Concepts.
+        - creation_type (Literal["R", "V"], optional): The Creation Type value of the
+            Concepts.
 
     Returns:
-        Optional[ScanReportConcept]: model.
+        List[ScanReportConcept]: The new ScanReportConcepts, not yet saved.
     """
-    # Check:
+    pairs = list(
+        dict.fromkeys(
+            (int(concept_id), int(object_id))
+            for concept_id, object_id in concept_object_ids
+        )
+    )
+    if not pairs:
+        return []
     content_type_model = ContentType.objects.get(model=content_type.value)
-    concept_check = ScanReportConcept.objects.filter(
-        concept=concept_id,
-        object_id=object_id,
-        content_type=content_type_model,
-    ).count()
 
-    if concept_check > 0:
-        return None
+    existing = set()
+    object_ids = sorted({object_id for _, object_id in pairs})
+    for batch in batched(object_ids, CONCEPT_LOOKUP_BATCH_SIZE):
+        existing.update(
+            ScanReportConcept.objects.filter(
+                content_type=content_type_model, object_id__in=batch
+            ).values_list("concept_id", "object_id")
+        )
 
-    return ScanReportConcept(
-        concept_id=concept_id,
-        object_id=object_id,
-        content_type=content_type_model,
-        creation_type=creation_type,
-    )
+    return [
+        ScanReportConcept(
+            concept_id=concept_id,
+            object_id=object_id,
+            content_type=content_type_model,
+            creation_type=creation_type,
+        )
+        for concept_id, object_id in pairs
+        if (concept_id, object_id) not in existing
+    ]
 
 
 def get_scan_report_values(id: int) -> List[ScanReportValueDict]:
@@ -195,47 +255,68 @@ def serialize_scan_report_fields(
     return [{"id": field.pk, "name": field.name} for field in fields]
 
 
-def get_scan_report_active_concepts(
-    content_type: ScanReportConceptContentType,
-) -> QuerySet[ScanReportConcept]:
+def get_reusable_concepts(
+    content_type: ScanReportConceptContentType, scan_report_id: int
+) -> List[ReusableConcept]:
     """
-    Gets Scan Report Concepts for the given `content_type` and in `active` SRs
+    Gets the Reusable Concepts of the given `content_type` that could be reused in a
+    scan report, with a single query: those on fields with the same name as a field
+    of the scan report, or on values with the same value and field name as a value
+    of the scan report.
 
     Args:
         - content_type (ScanReportConceptContentType): The content_type to filter by.
+        - scan_report_id (int): The scan report to reuse concepts in.
 
     Returns:
-        - QuerySet[ScanReportConcept]: The list of Scan Report Concepts.
+        - List[ReusableConcept]: The Reusable Concepts, ordered by object and concept.
     """
-
     content_type_model = ContentType.objects.get(model=content_type.value)
+    field_names = ScanReportField.objects.filter(
+        scan_report_table__scan_report_id=scan_report_id
+    ).values("name")
 
     if content_type == ScanReportConceptContentType.FIELD:
-        object_ids = ScanReportField.objects.filter(
-            scan_report_table__scan_report__hidden=False,
-            scan_report_table__scan_report__parent_dataset__hidden=False,
-            scan_report_table__scan_report__mapping_status__value="COMPLETE",
-        ).values_list("id", flat=True)
+        reusable_concepts = ReusableConcept.objects.filter(
+            content_type=content_type_model, name__in=field_names
+        )
     elif content_type == ScanReportConceptContentType.VALUE:
-        object_ids = ScanReportValue.objects.filter(
-            scan_report_field__scan_report_table__scan_report__hidden=False,
-            scan_report_field__scan_report_table__scan_report__mapping_status__value="COMPLETE",
-        ).values_list("id", flat=True)
+        reusable_concepts = ReusableConcept.objects.filter(
+            content_type=content_type_model,
+            name__in=ScanReportValue.objects.filter(
+                scan_report_field__scan_report_table__scan_report_id=scan_report_id
+            ).values("value"),
+            field_name__in=field_names,
+        )
     else:
         raise ValueError(f"Unsupported content type: {content_type}")
 
-    return ScanReportConcept.objects.filter(
-        content_type=content_type_model, object_id__in=object_ids
-    ).all()
+    return list(reusable_concepts.order_by("object_id", "concept_id"))
+
+
+def get_reusable_concepts_version() -> str:
+    """
+    Gets a version stamp of the Reusable Concepts, from their number and latest id.
+    Reusable Concepts are only ever added or deleted, so any change gives a new
+    version.
+
+    Returns:
+        - str: The version stamp.
+    """
+    stats = ReusableConcept.objects.aggregate(count=Count("id"), latest=Max("id"))
+    return f"{stats['count']}-{stats['latest'] or 0}"
 
 
 def find_standard_concept_batch(
     source_concepts: List[ScanReportValueDict],
+    use_standard_concept_maps: bool,
 ) -> Union[defaultdict[Any, List], Dict]:
     """
     Given a list of ScanReportValueDict, each of which contains a 'concept_id' entry,
     return a dictionary mapping from the original concept_ids to all standard
-    concepts it maps to via ConceptRelationship.
+    concepts it maps to via ConceptRelationship. These are read from the Standard
+    Concept Maps when they've been built for the vocabularies in the database, as
+    checked once by the caller with `standard_concept_maps_are_current()`.
 
     example:
     - input
@@ -257,11 +338,48 @@ def find_standard_concept_batch(
     if not source_concepts:
         return {}
 
-    # Get "Maps to" relations of all source concepts supplied
     concept_ids = [concept["concept_id"] for concept in source_concepts]
-    concept_relationships = ConceptRelationship.objects.filter(
-        relationship_id="Maps to", concept_id_1__in=concept_ids
-    ).all()
+    if not use_standard_concept_maps:
+        logger.warning(
+            "Standard concept maps haven't been built for these vocabularies, "
+            "using concept relationships."
+        )
+        return _find_standard_concept_batch_from_relationships(concept_ids)
+
+    combined_pairs = defaultdict(list)
+    for source_concept_id, standard_concept_id in sorted(
+        lookup(
+            StandardConceptMap.objects.values_list(
+                "source_concept_id", "standard_concept_id"
+            ),
+            "source_concept_id",
+            concept_ids,
+        )
+    ):
+        combined_pairs[source_concept_id].append(standard_concept_id)
+    return combined_pairs
+
+
+def _find_standard_concept_batch_from_relationships(
+    concept_ids: List[Any],
+) -> Union[defaultdict[Any, List], Dict]:
+    """
+    Find the standard concepts of concepts from their "Maps to" relationships, for
+    when the Standard Concept Maps haven't been built.
+
+    Args:
+        - concept_ids (List[Any]): The concept_ids to find standard concepts for.
+
+    Returns:
+        - Union[defaultdict[Any, List], Dict]: The standard concept_ids of each
+            concept_id that has any.
+    """
+    # Get "Maps to" relations of all source concepts supplied
+    concept_relationships = lookup(
+        ConceptRelationship.objects.filter(relationship_id="Maps to"),
+        "concept_id_1",
+        concept_ids,
+    )
 
     # Find those concepts with a "trail" to follow, that is, those which have
     # differing concept_id_1/2.
@@ -275,7 +393,7 @@ def find_standard_concept_batch(
 
     # Send all of those to conceptfilter again to check they are standard.
     concept_id_2s = [relation.concept_id_2 for relation in filtered_concept_relations]
-    concepts = Concept.objects.filter(concept_id__in=concept_id_2s).all()
+    concepts = lookup(Concept.objects.all(), "concept_id", concept_id_2s)
     concept_details = {a.concept_id: a.standard_concept for a in concepts}
 
     logger.debug("concepts got")
@@ -294,3 +412,49 @@ def find_standard_concept_batch(
         combined_pairs[pair] = list(OrderedDict.fromkeys(combined_pairs[pair]))
 
     return combined_pairs
+
+
+def get_vocabulary_index() -> Optional[VocabularyIndex]:
+    """
+    Gets the vocabulary index at the path in the 'VOCABULARY_INDEX_PATH' environment
+    variable, to look up concepts by vocabulary and code without querying the
+    database.
+
+    The index is opened once per process, and reopened when the file is replaced. It
+    isn't used when its version stamp doesn't match the vocabularies in the database,
+    so a stale index is never read.
+
+    Returns:
+        - Optional[VocabularyIndex]: The index, or None if there isn't a usable one.
+    """
+    global _vocabulary_index, _vocabulary_index_file
+
+    path = os.environ.get("VOCABULARY_INDEX_PATH")
+    if not path:
+        return None
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        logger.warning(f"Vocabulary index {path} not found, using the database.")
+        return None
+
+    file = (path, stat.st_ino, stat.st_mtime_ns)
+    if file != _vocabulary_index_file:
+        # Indexes already handed out stay open until they're no longer referenced.
+        _vocabulary_index = None
+        _vocabulary_index_file = file
+        try:
+            index = VocabularyIndex(path)
+        except VocabularyIndexError as e:
+            logger.warning(f"{e} Using the database.")
+            return None
+        version = get_vocabulary_version() or ""
+        if index.version != version:
+            logger.warning(
+                f"Vocabulary index {path} has version '{index.version}', but the "
+                f"vocabularies are version '{version}'. Using the database."
+            )
+            index.close()
+            return None
+        _vocabulary_index = index
+    return _vocabulary_index
@@ -1,6 +1,7 @@
 import json
 import os
-from typing import Any, Dict, List, Literal, Optional, Tuple, Union
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Literal, Optional, Tuple, Union
 
 import azure.functions as func
 from shared_code.logger import logger
@@ -82,6 +83,54 @@ def flatten_list(arr: List[List[Any]]) -> List[Any]:
     return [item for sublist in arr for item in sublist]
 
 
+def batched(iterable: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    """
+    Splits an iterable into lists of at most `size` items, consuming it lazily.
+
+    Args:
+        iterable (Iterable[Any]): The items to split.
+        size (int): The maximum number of items in each batch.
+
+    Returns:
+        Iterator[List[Any]]: An iterator over the batches.
+    """
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def handle_batch_size(batch_size: Optional[int] = None) -> int:
+    """
+    Gets the number of rows to insert at a time, defaulting to the
+    'UPLOAD_BATCH_SIZE' environment variable.
+    """
+    if batch_size is None:
+        batch_size_str = os.environ.get("UPLOAD_BATCH_SIZE")
+        batch_size = int(batch_size_str) if batch_size_str else 5000
+    return batch_size
+
+
+def handle_upload_workers(workers: Optional[int] = None) -> int:
+    """
+    Gets the number of tables to upload at once, defaulting to the
+    'UPLOAD_WORKERS' environment variable.
+    """
+    if workers is None:
+        workers_str = os.environ.get("UPLOAD_WORKERS")
+        workers = int(workers_str) if workers_str else 1
+    return workers
+
+
+def get_max_dequeue_count() -> int:
+    """
+    Gets the number of times a queue message is delivered before it is moved to the
+    poison queue, from `maxDequeueCount` in host.json.
+    """
+    host_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), "host.json")
+    with open(host_path) as host_file:
+        return json.load(host_file)["extensions"]["queues"]["maxDequeueCount"]
+
+
 def default_zero(value):
     """
     Helper function that returns the input, replacing anything Falsey
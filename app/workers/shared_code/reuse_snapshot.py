@@ -0,0 +1,299 @@
+import os
+import struct
+import tempfile
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from shared_code import db
+from shared_code.logger import logger
+from shared_code.models import ScanReportConceptContentType
+
+MAGIC = b"CARROTRS"
+# Magic, version length, number of strings, number of records
+_HEADER = struct.Struct("<8sIII")
+_STRING_LENGTH = struct.Struct("<I")
+# Content type, object id, concept id, then the indexes of the name, value
+# description and field name in the strings, or -1 for None.
+_RECORD = struct.Struct("<BIiiii")
+
+_CONTENT_TYPES = [
+    ScanReportConceptContentType.FIELD,
+    ScanReportConceptContentType.VALUE,
+]
+
+# The snapshot loaded by this process
+_snapshot: Optional[Tuple[int, "ReuseSnapshot"]] = None
+
+
+class ReuseSnapshotError(ValueError):
+    """
+    Raised when a file is not a reuse snapshot this version can read.
+    """
+
+
+class SnapshotConcept(NamedTuple):
+    """
+    A concept on an existing field or value that could be reused.
+    """
+
+    object_id: int
+    concept_id: int
+    name: str
+    value_description: Optional[str]
+    field_name: str
+
+
+class ReuseSnapshot:
+    """
+    The concepts that could be reused in a scan report, as they were at a version of
+    the Reusable Concepts. Snapshots are shared, so are read-only.
+
+    Args:
+        version (str): The version of the Reusable Concepts the snapshot was taken
+            from.
+        concepts (Dict[ScanReportConceptContentType, Iterable[SnapshotConcept]]):
+            The concepts of each content type, ordered by object and concept.
+    """
+
+    def __init__(
+        self,
+        version: str,
+        concepts: Dict[ScanReportConceptContentType, Iterable[SnapshotConcept]],
+    ):
+        self.version = version
+        self._concepts = {
+            content_type: tuple(concepts.get(content_type, ()))
+            for content_type in _CONTENT_TYPES
+        }
+
+    def concepts(
+        self, content_type: ScanReportConceptContentType
+    ) -> Tuple[SnapshotConcept, ...]:
+        """
+        Gets the concepts of a content type.
+
+        Args:
+            content_type (ScanReportConceptContentType): The content type.
+
+        Returns:
+            Tuple[SnapshotConcept, ...]: The concepts, ordered by object and concept.
+        """
+        return self._concepts[content_type]
+
+    def __len__(self) -> int:
+        return sum(len(concepts) for concepts in self._concepts.values())
+
+
+def write_reuse_snapshot(path: str, snapshot: ReuseSnapshot) -> None:
+    """
+    Writes a reuse snapshot to a file, replacing it in one step so readers never see
+    it partly written.
+
+    Names repeat across concepts, so each distinct string is written once and
+    concepts refer to it by index.
+
+    Args:
+        path (str): The path to write the snapshot to.
+        snapshot (ReuseSnapshot): The snapshot to write.
+    """
+    strings: Dict[str, int] = {}
+
+    def index(string: Optional[str]) -> int:
+        if string is None:
+            return -1
+        return strings.setdefault(string, len(strings))
+
+    records = bytearray()
+    for kind, content_type in enumerate(_CONTENT_TYPES):
+        for concept in snapshot.concepts(content_type):
+            records += _RECORD.pack(
+                kind,
+                concept.object_id,
+                concept.concept_id,
+                index(concept.name),
+                index(concept.value_description),
+                index(concept.field_name),
+            )
+
+    version = snapshot.version.encode("utf-8")
+    directory = os.path.dirname(path) or "."
+    with tempfile.NamedTemporaryFile(
+        "wb", dir=directory, suffix=".tmp", delete=False
+    ) as f:
+        f.write(
+            _HEADER.pack(
+                MAGIC, len(version), len(strings), len(records) // _RECORD.size
+            )
+        )
+        f.write(version)
+        for string in strings:
+            encoded = string.encode("utf-8")
+            f.write(_STRING_LENGTH.pack(len(encoded)))
+            f.write(encoded)
+        f.write(records)
+    os.replace(f.name, path)
+
+
+def read_reuse_snapshot(path: str) -> ReuseSnapshot:
+    """
+    Reads a reuse snapshot from a file.
+
+    Args:
+        path (str): The path of the snapshot.
+
+    Returns:
+        ReuseSnapshot: The snapshot.
+
+    Raises:
+        ReuseSnapshotError: If the file is not a reuse snapshot.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    try:
+        magic, version_length, string_count, record_count = _HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ReuseSnapshotError(f"{path} is not a reuse snapshot.")
+        offset = _HEADER.size
+        version = data[offset : offset + version_length].decode("utf-8")
+        offset += version_length
+
+        strings: List[str] = []
+        for _ in range(string_count):
+            (length,) = _STRING_LENGTH.unpack_from(data, offset)
+            offset += _STRING_LENGTH.size
+            strings.append(data[offset : offset + length].decode("utf-8"))
+            offset += length
+
+        records = data[offset:]
+        if len(records) != record_count * _RECORD.size:
+            raise ReuseSnapshotError(f"Reuse snapshot {path} is truncated.")
+    except (struct.error, UnicodeDecodeError) as e:
+        raise ReuseSnapshotError(f"Reuse snapshot {path} is corrupt: {e}") from e
+
+    concepts: Dict[ScanReportConceptContentType, List[SnapshotConcept]] = {
+        content_type: [] for content_type in _CONTENT_TYPES
+    }
+    for (
+        kind,
+        object_id,
+        concept_id,
+        name,
+        value_description,
+        field_name,
+    ) in _RECORD.iter_unpack(records):
+        concepts[_CONTENT_TYPES[kind]].append(
+            SnapshotConcept(
+                object_id,
+                concept_id,
+                strings[name],
+                strings[value_description] if value_description >= 0 else None,
+                strings[field_name],
+            )
+        )
+    return ReuseSnapshot(version, concepts)
+
+
+def build_reuse_snapshot(scan_report_id: int, version: str) -> ReuseSnapshot:
+    """
+    Builds a snapshot of the concepts that could be reused in a scan report from the
+    Reusable Concepts.
+
+    Args:
+        scan_report_id (int): The scan report to reuse concepts in.
+        version (str): The current version of the Reusable Concepts.
+
+    Returns:
+        ReuseSnapshot: The snapshot.
+    """
+    return ReuseSnapshot(
+        version,
+        {
+            content_type: [
+                SnapshotConcept(
+                    reusable_concept.object_id,
+                    reusable_concept.concept_id,
+                    reusable_concept.name,
+                    reusable_concept.value_description,
+                    reusable_concept.field_name,
+                )
+                for reusable_concept in db.get_reusable_concepts(
+                    content_type, scan_report_id
+                )
+            ]
+            for content_type in _CONTENT_TYPES
+        },
+    )
+
+
+def get_reuse_snapshot(scan_report_id: int, version: str) -> ReuseSnapshot:
+    """
+    Gets the snapshot of the concepts that could be reused in a scan report.
+
+    The snapshot is built once for each version of the Reusable Concepts, and shared
+    by the activities of every table in the scan report through a file in the
+    directory in the 'REUSE_SNAPSHOT_DIR' environment variable. The most recent
+    snapshot is also kept in memory. Up to 'REUSE_SNAPSHOT_CACHE_SIZE' snapshot
+    files are kept.
+
+    Args:
+        scan_report_id (int): The scan report to reuse concepts in.
+        version (str): The version of the Reusable Concepts to reuse, taken once by
+            the orchestrator for the whole run.
+
+    Returns:
+        ReuseSnapshot: The snapshot.
+    """
+    global _snapshot
+
+    if _snapshot is not None:
+        cached_scan_report_id, snapshot = _snapshot
+        if cached_scan_report_id == scan_report_id and snapshot.version == version:
+            return snapshot
+
+    directory = os.environ.get("REUSE_SNAPSHOT_DIR") or os.path.join(
+        tempfile.gettempdir(), "carrot-reuse-snapshots"
+    )
+    path = os.path.join(directory, f"{scan_report_id}.bin")
+    try:
+        snapshot = read_reuse_snapshot(path)
+        # Mark the file as recently used.
+        os.utime(path)
+    except FileNotFoundError:
+        snapshot = None
+    except (OSError, ReuseSnapshotError) as e:
+        logger.warning(f"{e} Building it again.")
+        snapshot = None
+
+    if snapshot is None or snapshot.version != version:
+        snapshot = build_reuse_snapshot(scan_report_id, version)
+        logger.info(
+            f"Built reuse snapshot of {len(snapshot)} concepts for scan report "
+            f"{scan_report_id}."
+        )
+        os.makedirs(directory, exist_ok=True)
+        write_reuse_snapshot(path, snapshot)
+        max_files_str = os.environ.get("REUSE_SNAPSHOT_CACHE_SIZE")
+        _evict_files(directory, int(max_files_str) if max_files_str else 64)
+
+    _snapshot = scan_report_id, snapshot
+    return snapshot
+
+
+def _evict_files(directory: str, max_files: int) -> None:
+    paths = [
+        entry.path for entry in os.scandir(directory) if entry.name.endswith(".bin")
+    ]
+    if len(paths) <= max_files:
+        return
+    paths.sort(key=_mtime_or_zero)
+    for path in paths[: len(paths) - max_files]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def _mtime_or_zero(path: str) -> float:
+    try:
+        return os.path.getmtime(path)
+    except FileNotFoundError:
+        return 0
@@ -0,0 +1,528 @@
+import html
+import io
+import posixpath
+import re
+import zipfile
+from itertools import islice
+from queue import Queue
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from xml.etree.ElementTree import fromstring, iterparse
+
+from openpyxl.styles.stylesheet import Stylesheet
+from openpyxl.utils.cell import column_index_from_string
+from openpyxl.utils.datetime import (
+    CALENDAR_MAC_1904,
+    CALENDAR_WINDOWS_1900,
+    from_excel,
+    from_ISO8601,
+)
+
+SHEET_MAIN_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+PKG_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+CONTENT_TYPES_NS = "http://schemas.openxmlformats.org/package/2006/content-types"
+REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+
+OFFICE_DOCUMENT_REL = f"{REL_NS}/officeDocument"
+STYLES_REL = f"{REL_NS}/styles"
+SHARED_STRINGS_TYPE = (
+    "application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"
+)
+
+STRING_ITEM_TAG = f"{{{SHEET_MAIN_NS}}}si"
+TEXT_TAG = f"{{{SHEET_MAIN_NS}}}t"
+RICH_TEXT_RUN_TAG = f"{{{SHEET_MAIN_NS}}}r"
+
+# Number of characters of sheet XML to read at a time
+CHUNK_SIZE = 256 * 1024
+
+# The cell data of a sheet is a flat list of rows and cells, and "<" can only appear
+# in the XML as the start of a tag, so it can be tokenised with regular expressions.
+# This avoids building an element, or calling back into Python, for every row, cell
+# and value, which is most of the cost of parsing a large sheet.
+_SHEET_DATA_START = re.compile(r"<(?:(\w+):)?sheetData\b[^>]*?(/?)>")
+_ROW_OR_CELL = re.compile(
+    r"<(?:\w+:)?(?:row\b([^>]*)>|c\b([^>]*?)(?:/>|>(?:"
+    # Plain values and inline strings, the common cases, are captured directly.
+    r"<(?:\w+:)?v>([^<]*)</(?:\w+:)?v>"
+    r"|<(?:\w+:)?is><(?:\w+:)?t>([^<]*)</(?:\w+:)?t></(?:\w+:)?is>"
+    r"|(.*?))</(?:\w+:)?c>))",
+    re.S,
+)
+_REFERENCE = re.compile(r"\sr\s*=\s*[\"']([^\"']*)")
+_TYPE = re.compile(r"\st\s*=\s*[\"']([^\"']*)")
+_STYLE = re.compile(r"\ss\s*=\s*[\"']([^\"']*)")
+_VALUE = re.compile(r"<(?:\w+:)?v\b[^>]*>([^<]*)<")
+_INLINE_STRING = re.compile(r"<(?:\w+:)?is\b")
+_TEXT = re.compile(r"<(?:\w+:)?t\b[^>/]*>([^<]*)<")
+_PHONETIC = re.compile(r"<(?:\w+:)?rPh\b.*?</(?:\w+:)?rPh>", re.S)
+
+
+def _cast_number(value: str) -> Any:
+    """
+    Convert a number stored as a string to an int or float, as openpyxl does.
+
+    Args:
+        value (str): The number as a string.
+
+    Returns:
+        Any: The int or float value.
+    """
+    if "." in value or "E" in value or "e" in value:
+        return float(value)
+    return int(value)
+
+
+def _string_item_text(element) -> str:
+    """
+    Get the plain text of a shared string, ignoring any formatting and phonetic runs.
+
+    Args:
+        element: The `si` element.
+
+    Returns:
+        str: The text of the string.
+    """
+    snippets = []
+    plain = element.find(TEXT_TAG)
+    if plain is not None and plain.text is not None:
+        snippets.append(plain.text)
+    for run in element.iterfind(RICH_TEXT_RUN_TAG):
+        text = run.findtext(TEXT_TAG)
+        if text is not None:
+            snippets.append(text)
+    return "".join(snippets)
+
+
+def _unescape(text: str) -> str:
+    """
+    Replace the entity and character references in XML text, and normalise line
+    endings, as an XML parser would.
+
+    Args:
+        text (str): The raw text from the XML.
+
+    Returns:
+        str: The text content.
+    """
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    if "&" in text:
+        text = html.unescape(text)
+    return text
+
+
+class ScanReportReader:
+    """
+    A minimal, read-only reader for the sheets of a scan report workbook.
+
+    openpyxl builds a cell object, with its styling, for every cell it reads, which
+    dominates the time spent reading large value sheets. This reader parses the sheet
+    XML directly from the archive and only produces cell values. Values are converted
+    in the same way as openpyxl with `read_only=True, data_only=True`, so the two can
+    be used interchangeably.
+
+    Args:
+        path (str): Path to the .xlsx file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._archive = zipfile.ZipFile(path)
+        self._shared_strings: Optional[List[str]] = None
+
+        workbook_path = self._find_rel_target(self._read_rels(""), OFFICE_DOCUMENT_REL)
+        self._workbook_rels = self._read_rels(workbook_path)
+
+        workbook = fromstring(self._archive.read(workbook_path))
+        properties = workbook.find(f"{{{SHEET_MAIN_NS}}}workbookPr")
+        self._epoch = CALENDAR_WINDOWS_1900
+        if properties is not None and properties.get("date1904") in ("1", "true"):
+            self._epoch = CALENDAR_MAC_1904
+
+        self._sheet_paths: Dict[str, str] = {}
+        for sheet in workbook.iter(f"{{{SHEET_MAIN_NS}}}sheet"):
+            target = self._workbook_rels.get(sheet.get(f"{{{REL_NS}}}id"))
+            if target is not None:
+                self._sheet_paths[sheet.get("name")] = target[1]
+
+        self._date_formats, self._timedelta_formats = self._read_date_styles()
+
+    def __enter__(self) -> "ScanReportReader":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        Close the underlying archive.
+        """
+        self._archive.close()
+
+    @property
+    def sheetnames(self) -> List[str]:
+        """
+        The names of the sheets in the workbook, in workbook order.
+        """
+        return list(self._sheet_paths)
+
+    def _read_rels(self, part_path: str) -> Dict[str, Tuple[str, str]]:
+        """
+        Read the relationships of a part of the archive.
+
+        Args:
+            part_path (str): Path of the part in the archive, "" for the package.
+
+        Returns:
+            Dict[str, Tuple[str, str]]: (type, absolute target path) by relationship id.
+        """
+        folder, name = posixpath.split(part_path)
+        rels_path = posixpath.join(folder, "_rels", f"{name}.rels")
+        try:
+            rels = fromstring(self._archive.read(rels_path))
+        except KeyError:
+            return {}
+
+        targets = {}
+        for rel in rels.iter(f"{{{PKG_REL_NS}}}Relationship"):
+            target = rel.get("Target")
+            if target.startswith("/"):
+                target = target[1:]
+            else:
+                target = posixpath.normpath(posixpath.join(folder, target))
+            targets[rel.get("Id")] = (rel.get("Type"), target)
+        return targets
+
+    @staticmethod
+    def _find_rel_target(
+        rels: Dict[str, Tuple[str, str]], rel_type: str
+    ) -> Optional[str]:
+        """
+        Find the target of the first relationship of a given type.
+
+        Args:
+            rels (Dict[str, Tuple[str, str]]): The relationships to search.
+            rel_type (str): The relationship type to find.
+
+        Returns:
+            Optional[str]: The path of the target in the archive, if there is one.
+        """
+        for target_type, target in rels.values():
+            if target_type == rel_type:
+                return target
+        return None
+
+    def _find_content_type(self, content_type: str) -> Optional[str]:
+        """
+        Find the first part of the archive with a given content type.
+
+        Args:
+            content_type (str): The content type to find.
+
+        Returns:
+            Optional[str]: The path of the part in the archive, if there is one.
+        """
+        manifest = fromstring(self._archive.read("[Content_Types].xml"))
+        for override in manifest.iter(f"{{{CONTENT_TYPES_NS}}}Override"):
+            if override.get("ContentType") == content_type:
+                return override.get("PartName").lstrip("/")
+        return None
+
+    def _read_date_styles(self) -> Tuple[set, set]:
+        """
+        Find the cell styles that format numbers as dates or durations.
+
+        Returns:
+            Tuple[set, set]: The indices of the date and timedelta styles.
+        """
+        styles_path = self._find_rel_target(self._workbook_rels, STYLES_REL)
+        if styles_path is None:
+            return set(), set()
+        stylesheet = Stylesheet.from_tree(fromstring(self._archive.read(styles_path)))
+        return stylesheet.date_formats, stylesheet.timedelta_formats
+
+    @property
+    def shared_strings(self) -> List[str]:
+        """
+        The shared strings table, read the first time it is needed.
+        """
+        if self._shared_strings is None:
+            self._shared_strings = []
+            strings_path = self._find_content_type(SHARED_STRINGS_TYPE)
+            if strings_path is not None:
+                with self._archive.open(strings_path) as source:
+                    for _, element in iterparse(source):
+                        if element.tag == STRING_ITEM_TAG:
+                            self._shared_strings.append(
+                                _string_item_text(element).replace("x005F_", "")
+                            )
+                            element.clear()
+        return self._shared_strings
+
+    def _cell_value(
+        self,
+        attributes: str,
+        value: Optional[str],
+        inline_string: Optional[str],
+        content: Optional[str],
+    ) -> Any:
+        """
+        Get the value of a cell, converted to its Python type.
+
+        Args:
+            attributes (str): The attributes of the `c` element.
+            value (Optional[str]): The text of the value, if the cell only has a value.
+            inline_string (Optional[str]): The text of the string, if the cell only
+                has a plain inline string.
+            content (Optional[str]): The XML inside the `c` element, if it is anything
+                else.
+
+        Returns:
+            Any: The value of the cell, or None if it is empty.
+        """
+        data_type = _TYPE.search(attributes)
+        data_type = data_type.group(1) if data_type else "n"
+
+        if data_type == "inlineStr":
+            if inline_string is not None:
+                return _unescape(inline_string)
+            if content is None or _INLINE_STRING.search(content) is None:
+                return None
+            if "rPh" in content:
+                content = _PHONETIC.sub("", content)
+            return _unescape("".join(_TEXT.findall(content)))
+
+        if value is None and content is not None:
+            value = _VALUE.search(content)
+            value = value.group(1) if value else None
+        if not value:
+            return None
+
+        if data_type == "n":
+            number = _cast_number(value)
+            style_id = _STYLE.search(attributes)
+            style_id = int(style_id.group(1)) if style_id else 0
+            if style_id in self._date_formats:
+                try:
+                    return from_excel(
+                        number,
+                        self._epoch,
+                        timedelta=style_id in self._timedelta_formats,
+                    )
+                except (OverflowError, ValueError):
+                    return "#VALUE!"
+            return number
+        if data_type == "s":
+            return self.shared_strings[int(value)]
+        if data_type == "b":
+            return bool(int(value))
+        if data_type == "d":
+            return from_ISO8601(value)
+        return _unescape(value)
+
+    def _iter_sheet_data(self, sheet_name: str) -> Iterator[str]:
+        """
+        Read the cell data of a sheet in chunks, each ending just before the start of
+        a row, so that rows are never split between chunks.
+
+        Args:
+            sheet_name (str): The name of the sheet to read.
+
+        Returns:
+            Iterator[str]: The XML inside the `sheetData` element, in order.
+
+        Raises:
+            KeyError: If there is no sheet with that name.
+        """
+        with self._archive.open(self._sheet_paths[sheet_name]) as source:
+            reader = io.TextIOWrapper(source, encoding="utf-8")
+            buffer = ""
+            row_start = end_tag = None
+            while True:
+                chunk = reader.read(CHUNK_SIZE)
+                buffer += chunk
+
+                if row_start is None:
+                    sheet_data = _SHEET_DATA_START.search(buffer)
+                    if sheet_data is None:
+                        if not chunk:
+                            return
+                        continue
+                    if sheet_data.group(2):
+                        # An empty, self-closing sheetData element
+                        return
+                    prefix = f"{sheet_data.group(1)}:" if sheet_data.group(1) else ""
+                    row_start = f"<{prefix}row"
+                    end_tag = f"</{prefix}sheetData>"
+                    buffer = buffer[sheet_data.end() :]
+
+                end = buffer.find(end_tag)
+                if end != -1:
+                    yield buffer[:end]
+                    return
+                if not chunk:
+                    yield buffer
+                    return
+
+                cut = buffer.rfind(row_start)
+                if cut > 0:
+                    yield buffer[:cut]
+                    buffer = buffer[cut:]
+
+    def _iter_sheet_rows(self, sheet_name: str) -> Iterator[Tuple[int, List[Any]]]:
+        """
+        Read the rows present in a sheet.
+
+        Args:
+            sheet_name (str): The name of the sheet to read.
+
+        Returns:
+            Iterator[Tuple[int, List[Any]]]: The row number and the values of each row
+                in the sheet, with None for any missing cells.
+        """
+        column_indices: Dict[str, int] = {}
+        row_number = 0
+        values: Optional[List[Any]] = None
+
+        for chunk in self._iter_sheet_data(sheet_name):
+            for match in _ROW_OR_CELL.finditer(chunk):
+                (
+                    row_attributes,
+                    cell_attributes,
+                    value,
+                    inline_string,
+                    content,
+                ) = match.groups()
+
+                if row_attributes is not None:
+                    if values is not None:
+                        yield row_number, values
+                    reference = _REFERENCE.search(row_attributes)
+                    row_number = (
+                        int(reference.group(1)) if reference else row_number + 1
+                    )
+                    values = []
+                    continue
+
+                if values is None:
+                    continue
+                reference = _REFERENCE.search(cell_attributes)
+                if reference is None:
+                    column = len(values) + 1
+                else:
+                    letters = reference.group(1).rstrip("0123456789")
+                    column = column_indices.get(letters)
+                    if column is None:
+                        column = column_index_from_string(letters)
+                        column_indices[letters] = column
+                if column > len(values):
+                    values.extend([None] * (column - len(values)))
+                values[column - 1] = self._cell_value(
+                    cell_attributes, value, inline_string, content
+                )
+
+        if values is not None:
+            yield row_number, values
+
+    def iter_rows(
+        self, sheet_name: str, min_row: int = 1, max_col: Optional[int] = None
+    ) -> Iterator[Tuple[Any, ...]]:
+        """
+        Lazily read the cell values of a sheet, one row at a time.
+
+        As with openpyxl, rows missing from the sheet are returned as empty rows, and
+        missing cells within a row as None.
+
+        Args:
+            sheet_name (str): The name of the sheet to read.
+            min_row (int): The first row to return, counting from 1.
+            max_col (Optional[int]): If given, every row is cut or padded with None
+                to this many columns. Otherwise each row ends at its last cell.
+
+        Returns:
+            Iterator[Tuple[Any, ...]]: The values of each row, in row order.
+
+        Raises:
+            KeyError: If there is no sheet with that name.
+        """
+        empty_row = () if max_col is None else (None,) * max_col
+        counter = min_row
+
+        for row_number, values in self._iter_sheet_rows(sheet_name):
+            if row_number < min_row:
+                continue
+
+            # Fill in any rows missing from the sheet.
+            while counter < row_number:
+                counter += 1
+                yield empty_row
+
+            if max_col is not None:
+                values = values[:max_col]
+                values.extend([None] * (max_col - len(values)))
+            counter += 1
+            yield tuple(values)
+
+    def iter_value_triples(self, sheet_name: str) -> Iterator[Tuple[Any, str, Any]]:
+        """
+        Lazily read the value/frequency pairs from a table sheet.
+
+        The sheet has alternating value and frequency columns, headed by the field name
+        and 'Frequency' respectively. Reading stops at the first entirely empty row.
+
+        Args:
+            sheet_name (str): The name of the table sheet.
+
+        Returns:
+            Iterator[Tuple[Any, str, Any]]: (header, value, frequency) for each
+                non-empty pair of cells, in row order.
+        """
+        rows = self.iter_rows(sheet_name)
+        # Get header entries (skipping every second column which is just 'Frequency')
+        sheet_headers = list(next(rows, ())[::2])
+        rows.close()
+
+        # Use the number of headers to set the maximum column rather than relying on
+        # the sheet dimensions, as these are not always reliably updated by Excel etc.
+        for row in self.iter_rows(
+            sheet_name, min_row=2, max_col=len(sheet_headers) * 2
+        ):
+            this_row_empty = True
+            for header, cell, freq in zip(sheet_headers, row[::2], row[1::2]):
+                if (cell != "" and cell is not None) or (
+                    freq != "" and freq is not None
+                ):
+                    yield header, str(cell), freq
+                    this_row_empty = False
+            if this_row_empty:
+                break
+
+
+def put_value_batches(
+    path: str, sheet_name: str, queue: Queue, batch_size: int
+) -> None:
+    """
+    Read the value/frequency triples of a table sheet onto a queue, in batches.
+
+    This is run in a worker process, so it opens the scan report itself. The batches
+    are put on the queue as they are read, followed by None once the sheet is
+    finished. If reading fails, the exception is put on the queue in place of None,
+    so the consumer doesn't take a partly read sheet for a whole one. If the queue is
+    bounded, reading waits for the batches to be taken rather than getting ahead of
+    the consumer.
+
+    Args:
+        path (str): Path to the .xlsx file.
+        sheet_name (str): The name of the table sheet.
+        queue (Queue): The queue to put the batches on.
+        batch_size (int): The number of triples in each batch.
+    """
+    try:
+        with ScanReportReader(path) as reader:
+            triples = reader.iter_value_triples(sheet_name)
+            while batch := list(islice(triples, batch_size)):
+                queue.put(batch)
+    except Exception as e:
+        queue.put(e)
+        raise
+    queue.put(None)
@@ -1,11 +1,16 @@
+from unittest.mock import patch
+
 import pytest
 from RulesConceptsActivity import (
     _create_concepts,
+    _get_concepts_for_vocab,
     _match_concepts_to_entries,
     _set_defaults_for_none_vocab,
+    _transform_concepts,
     _update_entries_with_standard_concepts,
 )
 from shared.data.models import Concept
+from shared.services.vocabulary_index import VocabularyIndex, write_vocabulary_index
 
 
 def test__create_concepts():
@@ -64,6 +69,81 @@ def test__match_concepts_to_entries():
     ]
 
 
+def test__match_concepts_to_entries_uses_first_match():
+    # Arrange
+    entries = [
+        {"value": "2", "concept_id": 1, "standard_concept": None},
+        {"value": 3, "concept_id": 1, "standard_concept": None},
+    ]
+    vocab = [
+        Concept(concept_code=2, concept_id=200, standard_concept="S"),
+        Concept(concept_code="2", concept_id=201, standard_concept=None),
+        Concept(concept_code="3", concept_id=300, standard_concept=None),
+    ]
+
+    # Act
+    _match_concepts_to_entries(entries, vocab)
+
+    # Assert
+    assert entries == [
+        {"value": "2", "concept_id": "200", "standard_concept": "S"},
+        {"value": 3, "concept_id": "300", "standard_concept": "None"},
+    ]
+
+
+@pytest.mark.parametrize(
+    "vocabulary_ids, checked", [([None], False), (["LOINC", "ICD10", None], True)]
+)
+def test__transform_concepts_checks_standard_concept_maps_once(vocabulary_ids, checked):
+    # Arrange
+    table_values = [{"vocabulary_id": vocab} for vocab in vocabulary_ids]
+
+    # Act
+    with (
+        patch(
+            "RulesConceptsActivity.standard_concept_maps_are_current",
+            return_value=True,
+        ) as maps_are_current,
+        patch("RulesConceptsActivity._process_concepts_for_vocab") as process,
+    ):
+        _transform_concepts(table_values, None)
+
+    # Assert
+    assert maps_are_current.call_count == int(checked)
+    assert [call.args[3] for call in process.call_args_list] == [True] * (
+        len(vocabulary_ids) - 1
+    )
+
+
+def test__get_concepts_for_vocab_from_vocabulary_index(tmp_path):
+    # Arrange
+    path = str(tmp_path / "vocabulary.idx")
+    write_vocabulary_index(
+        path,
+        [("ICD10", "A01", 100, "S", "Condition"), ("ICD10", "A02", 200, None, "Drug")],
+        "",
+    )
+    entries = [{"value": "A01"}, {"value": "B01"}, {"value": "A02"}, {"value": "A01"}]
+
+    # Act
+    with (
+        patch(
+            "shared_code.db.get_vocabulary_index",
+            return_value=VocabularyIndex(path),
+        ),
+        patch("RulesConceptsActivity.Concept.objects.filter") as filter_concepts,
+    ):
+        concepts = _get_concepts_for_vocab("ICD10", entries)
+
+    # Assert
+    filter_concepts.assert_not_called()
+    assert sorted(
+        (c.concept_code, c.concept_id, c.standard_concept, c.domain_id)
+        for c in concepts
+    ) == [("A01", 100, "S", "Condition"), ("A02", 200, None, "Drug")]
+    assert all(c.vocabulary_id == "ICD10" for c in concepts)
+
+
 def test__update_entries_with_standard_concepts():
     # Arrange
     entries = [
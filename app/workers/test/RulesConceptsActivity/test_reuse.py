@@ -0,0 +1,200 @@
+import random
+from unittest.mock import MagicMock, patch
+
+from RulesConceptsActivity.reuse import (
+    _existing_mappings,
+    _match_fields,
+    _match_values,
+    reuse_existing_field_concepts,
+)
+from shared_code.reuse_snapshot import SnapshotConcept
+
+
+def _match_values_by_filter(new_values_full_details, existing_mappings_to_consider):
+    # The matching that _match_values replaced, checking every existing value.
+    matches = {}
+    for item in new_values_full_details:
+        name, description, field_name = (
+            item["name"],
+            item["description"],
+            item["field_name"],
+        )
+        mappings_matching_value = list(
+            filter(
+                lambda mapping: mapping["name"] == name
+                and mapping["description"] == description
+                and mapping["field_name"] == field_name,
+                existing_mappings_to_consider,
+            )
+        )
+        if mappings_matching_value:
+            matches[(str(name), str(description), str(field_name))] = (
+                str(mappings_matching_value[0]["id"]),
+                list(
+                    {
+                        concept_id
+                        for mapping in mappings_matching_value
+                        for concept_id in mapping["concept"]
+                    }
+                ),
+            )
+    return matches
+
+
+def test__match_values():
+    # Arrange
+    existing = [
+        {
+            "id": 1,
+            "name": "M",
+            "description": None,
+            "field_name": "sex",
+            "concept": ["10"],
+        },
+        {
+            "id": 2,
+            "name": "M",
+            "description": "Male",
+            "field_name": "sex",
+            "concept": ["11"],
+        },
+        {
+            "id": 3,
+            "name": "M",
+            "description": None,
+            "field_name": "sex",
+            "concept": ["12", "10"],
+        },
+        {
+            "id": 4,
+            "name": "M",
+            "description": None,
+            "field_name": "gender",
+            "concept": ["13"],
+        },
+    ]
+    new = [
+        {"id": 20, "name": "M", "description": None, "field_name": "sex"},
+        {"id": 21, "name": "F", "description": None, "field_name": "sex"},
+        {"id": 22, "name": "M", "description": "None", "field_name": "sex"},
+    ]
+
+    # Act
+    matches = _match_values(new, existing)
+
+    # Assert
+    # The first matching value is used, with the concepts of all matching values.
+    assert list(matches) == [("M", "None", "sex")]
+    value_id, concept_ids = matches[("M", "None", "sex")]
+    assert value_id == "1"
+    assert sorted(concept_ids) == ["10", "12"]
+
+
+def test__match_values_matches_filtering():
+    random.seed(0)
+    existing = [
+        {
+            "id": i,
+            "name": f"value_{random.randrange(50)}",
+            "description": random.choice([None, "", "description"]),
+            "field_name": f"field_{random.randrange(5)}",
+            "concept": [str(random.randrange(20)) for _ in range(random.randrange(3))],
+        }
+        for i in range(500)
+    ]
+    new = [
+        {
+            "id": 1000 + i,
+            "name": f"value_{random.randrange(60)}",
+            "description": random.choice([None, "", "description"]),
+            "field_name": f"field_{random.randrange(6)}",
+        }
+        for i in range(200)
+    ]
+
+    assert _match_values(new, existing) == _match_values_by_filter(new, existing)
+
+
+def test__match_fields():
+    # Arrange
+    existing = [
+        {"id": 1, "name": "sex", "concept": []},
+        {"id": 2, "name": "sex", "concept": ["10", "11"]},
+        {"id": 3, "name": "sex", "concept": ["10"]},
+        {"id": 4, "name": "age", "concept": []},
+    ]
+    new = [
+        {"id": "20", "name": "sex"},
+        {"id": "21", "name": "age"},
+        {"id": "22", "name": "date"},
+    ]
+
+    # Act
+    matches = _match_fields(new, existing)
+
+    # Assert
+    # The first matching field is used, even when it has no concepts itself, and
+    # fields whose matches have no concepts are left out.
+    assert list(matches) == ["sex"]
+    field_id, concept_ids = matches["sex"]
+    assert field_id == "1"
+    assert sorted(concept_ids) == ["10", "11"]
+
+
+def test__existing_mappings():
+    # Arrange
+    reusable_concepts = [
+        SnapshotConcept(1, 10, "M", None, "sex"),
+        SnapshotConcept(1, 11, "M", None, "sex"),
+        SnapshotConcept(2, 20, "F", "Female", "sex"),
+    ]
+
+    # Act
+    mappings = _existing_mappings(reusable_concepts)
+
+    # Assert
+    assert mappings == [
+        {
+            "name": "M",
+            "concept": ["10", "11"],
+            "id": 1,
+            "description": None,
+            "field_name": "sex",
+        },
+        {
+            "name": "F",
+            "concept": ["20"],
+            "id": 2,
+            "description": "Female",
+            "field_name": "sex",
+        },
+    ]
+
+
+def test_reuse_existing_field_concepts_refreshes_reusable_concepts():
+    # Arrange
+    concepts = [MagicMock(pk=5), MagicMock(pk=6)]
+
+    # Act
+    with (
+        patch("RulesConceptsActivity.reuse.get_reuse_snapshot") as get_reuse_snapshot,
+        patch("RulesConceptsActivity.reuse._existing_mappings"),
+        patch("RulesConceptsActivity.reuse._match_fields"),
+        patch(
+            "RulesConceptsActivity.reuse.select_concepts_to_post",
+            return_value=concepts,
+        ),
+        patch(
+            "RulesConceptsActivity.reuse.ScanReportConcept.objects.bulk_create"
+        ) as bulk_create,
+        patch("RulesConceptsActivity.reuse.refresh_reusable_concepts") as refresh,
+    ):
+        reuse_existing_field_concepts(
+            [{"name": "sex", "id": 1}], MagicMock(scan_report_id=2), "3-7"
+        )
+
+    # Assert
+    # Bulk created concepts don't send signals, so are refreshed here
+    get_reuse_snapshot.assert_called_once_with(2, "3-7")
+    bulk_create.assert_called_once_with(concepts)
+    refresh.assert_called_once_with(scan_report_concept_ids=[5, 6])
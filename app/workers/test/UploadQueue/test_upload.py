@@ -1,45 +1,358 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime, timezone
+from queue import Queue
 from unittest.mock import MagicMock, patch
 
+import openpyxl
+import pytest
+import UploadQueue
 from openpyxl.cell.cell import Cell
+from shared.mapping.models import ScanReportField, ScanReportTable
+from shared.services.bulk_load import ValueColumns
+from shared_code.xlsx_reader import ScanReportReader
 from UploadQueue import (
-    _apply_data_dictionary,
-    _assign_order,
+    _check_errors_details,
     _create_field_entry,
     _create_table_entry,
-    _create_value_entries,
-    _create_values_details,
+    _create_value_columns,
     _get_unique_table_names,
+    _handle_failure,
+    _index_fields,
+    _iter_queued_batches,
+    _iter_table_field_entries,
+    _should_validate,
+    _transform_scan_report_sheet_table,
 )
 
 
-def test__get_unique_table_names():
+def test__get_unique_table_names(tmp_path):
     # Arrange
-    worksheet_mock = MagicMock()
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = "Field Overview"
 
     sample_worksheet_data = [
+        ["Table"],
         ["Table1"],
         ["Table2"],
+        [None],
         ["Table1"],
         ["Table3"],
         ["Table2"],
         ["Table4"],
     ]
+    for row in sample_worksheet_data:
+        sheet.append(row)
+    path = tmp_path / "scan_report.xlsx"
+    workbook.save(path)
 
-    # Mock iter_rows
-    worksheet_mock.iter_rows = MagicMock(
-        return_value=(
-            [MagicMock(value=cell_value) for cell_value in row_data]
-            for row_data in sample_worksheet_data
+    # Act
+    with ScanReportReader(path) as reader:
+        result = _get_unique_table_names(reader)
+
+    # Assert
+    expected_result = ["Table1", "Table2", "Table3", "Table4"]
+    assert result == expected_result
+
+
+def test__transform_scan_report_sheet_table(tmp_path):
+    # Arrange
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.title = "Table1"
+    for row in [
+        ["field1", "Frequency", "field2", "Frequency"],
+        ["apple", 20, "orange", 5],
+        ["banana", 3, None, None],
+        [None, None, None, None],
+        ["ignored", 1, None, None],
+    ]:
+        sheet.append(row)
+    path = tmp_path / "scan_report.xlsx"
+    workbook.save(path)
+
+    # Act
+    with ScanReportReader(path) as reader:
+        result = _transform_scan_report_sheet_table(reader, "Table1")
+
+    # Assert
+    assert result == {
+        "field1": [("apple", 20), ("banana", 3)],
+        "field2": [("orange", 5)],
+    }
+
+
+@pytest.fixture
+def field_overview():
+    workbook = openpyxl.Workbook()
+    worksheet = workbook.active
+    for row in [
+        ["Table", "Field"],
+        ["Table1", "field1", "", "", 1, 1, 1, 0, 1, 0],
+        ["Table1", "field2", "", "", 1, 1, 1, 0, 1, 0],
+        [None],
+        ["Table2", "field3", "", "", 1, 1, 1, 0, 1, 0],
+    ]:
+        worksheet.append(row)
+    return worksheet
+
+
+def test__iter_table_field_entries(field_overview):
+    # Arrange
+    tables = [
+        ScanReportTable(pk=1, name="Table1"),
+        ScanReportTable(pk=2, name="Table2"),
+    ]
+
+    # Act
+    result = [
+        (table.name, [(f.scan_report_table_id, f.name) for f in field_entries])
+        for table, field_entries in _iter_table_field_entries(field_overview, tables)
+    ]
+
+    # Assert
+    assert result == [
+        ("Table1", [(1, "field1"), (1, "field2")]),
+        ("Table2", [(2, "field3")]),
+    ]
+
+
+def test__iter_table_field_entries_skips_uploaded_tables(field_overview):
+    # Arrange
+    tables = [
+        ScanReportTable(pk=1, name="Table1", upload_complete=True),
+        ScanReportTable(pk=2, name="Table2"),
+    ]
+
+    # Act
+    result = [
+        table.name for table, _ in _iter_table_field_entries(field_overview, tables)
+    ]
+
+    # Assert
+    assert result == ["Table2"]
+
+
+def test__iter_queued_batches():
+    # Arrange
+    queue = Queue()
+    for batch in [[("field1", "a", 1)], [("field1", "b", 2)], None]:
+        queue.put(batch)
+
+    # Act
+    result = list(_iter_queued_batches(queue, threading.Event()))
+
+    # Assert
+    assert result == [[("field1", "a", 1)], [("field1", "b", 2)]]
+
+
+def test__iter_queued_batches_parser_failed():
+    # Arrange
+    queue = Queue()
+    for batch in [[("field1", "a", 1)], ValueError("Corrupt sheet")]:
+        queue.put(batch)
+    batches = _iter_queued_batches(queue, threading.Event())
+
+    # Act
+    first = next(batches)
+
+    # Assert
+    assert first == [("field1", "a", 1)]
+    with pytest.raises(ValueError, match="Corrupt sheet"):
+        next(batches)
+
+
+def test__upload_table_parser_failed():
+    # Arrange
+    table = MagicMock(upload_complete=False)
+    queue = Queue()
+    for batch in [[("field1", "a", 1)], ValueError("Corrupt sheet")]:
+        queue.put(batch)
+
+    # Act
+    with (
+        patch("UploadQueue.transaction.atomic") as atomic,
+        patch("UploadQueue.bulk_load_fields"),
+        patch("UploadQueue._index_fields"),
+        patch("UploadQueue._create_value_columns"),
+        patch("UploadQueue.bulk_load_value_columns") as bulk_load_value_columns,
+    ):
+        with pytest.raises(ValueError, match="Corrupt sheet"):
+            UploadQueue._upload_table(
+                table, [], _iter_queued_batches(queue, threading.Event()), {}
+            )
+
+    # Assert
+    # The first batch was loaded, then the transaction was left with the error, so
+    # it's rolled back and the table isn't marked as uploaded.
+    bulk_load_value_columns.assert_called_once()
+    exc_type, _, _ = atomic.return_value.__exit__.call_args.args
+    assert exc_type is ValueError
+    assert not table.upload_complete
+    table.save.assert_not_called()
+
+
+def test__iter_queued_batches_cancelled():
+    # Arrange
+    queue = Queue()
+    queue.put([("field1", "a", 1)])
+    cancelled = threading.Event()
+    batches = _iter_queued_batches(queue, cancelled)
+
+    # Act
+    first = next(batches)
+    cancelled.set()
+
+    # Assert
+    assert first == [("field1", "a", 1)]
+    with pytest.raises(asyncio.CancelledError):
+        next(batches)
+
+
+def test__handle_single_table_in_pool_parser_failed(tmp_path):
+    # Arrange
+    path = tmp_path / "scan_report.xlsx"
+    workbook = openpyxl.Workbook()
+    workbook.active.title = "Table1"
+    workbook.create_sheet("Table2")
+    workbook.save(path)
+
+    def iter_value_triples(self, sheet_name):
+        yield from [("field1", "a", 1)] * 4
+        if sheet_name == "Table2":
+            raise ValueError("Corrupt sheet")
+
+    # Each upload thread keeps what it loaded until its transaction commits.
+    committed = []
+    pending = threading.local()
+
+    @contextmanager
+    def atomic():
+        pending.rows = []
+        yield
+        committed.extend(pending.rows)
+
+    def bulk_load_fields(field_entries):
+        pending.rows.extend(field_entries)
+        return field_entries
+
+    def bulk_load_value_columns(columns):
+        pending.rows.extend(zip(columns.field_ids, columns.values))
+
+    tables = [
+        ScanReportTable(pk=1, name="Table1"),
+        ScanReportTable(pk=2, name="Table2"),
+    ]
+    fields = [ScanReportField(pk=1, name="field1", scan_report_table_id=1)]
+    manager = MagicMock(Queue=Queue)
+    reader = MagicMock(path=path)
+
+    async def upload_tables(pool):
+        return await asyncio.gather(
+            *(
+                UploadQueue._handle_single_table_in_pool(
+                    table, [fields[0]], "1", reader, {}, pool, manager
+                )
+                for table in tables
+            ),
+            return_exceptions=True,
         )
+
+    # Act
+    with (
+        patch.object(ScanReportReader, "iter_value_triples", iter_value_triples),
+        patch("UploadQueue._check_table_sheet"),
+        patch("UploadQueue.helpers.handle_batch_size", return_value=2),
+        patch("UploadQueue.transaction.atomic", atomic),
+        patch("UploadQueue.bulk_load_fields", bulk_load_fields),
+        patch("UploadQueue.bulk_load_value_columns", bulk_load_value_columns),
+        patch("UploadQueue.connections.close_all"),
+        patch.object(ScanReportTable, "save"),
+        ThreadPoolExecutor(2) as pool,
+    ):
+        results = asyncio.run(upload_tables(pool))
+
+    # Assert
+    # Only the table that was parsed in full is committed.
+    assert results[0] is None
+    assert isinstance(results[1], ValueError)
+    assert committed == [fields[0]] + [(1, "a")] * 4
+    assert tables[0].upload_complete
+    assert not tables[1].upload_complete
+
+
+@pytest.mark.parametrize(
+    "dequeue_count, status, raises",
+    [(1, None, False), (2, "IN_PROGRESS", False), (2, "FAILED", True)],
+)
+def test__handle_failure(dequeue_count, status, raises):
+    # Arrange
+    msg = MagicMock(dequeue_count=dequeue_count)
+    scan_report = MagicMock()
+    scan_report.upload_status.value = status
+
+    # Act
+    with patch("UploadQueue.ScanReport.objects.get", return_value=scan_report):
+        if raises:
+            with pytest.raises(ValueError):
+                _handle_failure(msg, "1")
+        else:
+            _handle_failure(msg, "1")
+
+
+@pytest.mark.parametrize(
+    "body, validate",
+    [
+        (b'{"scan_report_id": 1}', False),
+        (b'{"scan_report_id": 1, "validate": true}', True),
+    ],
+)
+def test__should_validate(body, validate):
+    assert _should_validate(MagicMock(**{"get_body.return_value": body})) is validate
+
+
+def test__check_errors_details():
+    assert _check_errors_details(["a", "b"]) == "a * b"
+    details = _check_errors_details(["x" * 200, "y" * 200])
+    assert len(details) == 256
+    assert details.endswith("y...")
+
+
+def test_main_fails_upload_that_fails_checks(tmp_path):
+    # Arrange
+    scan_report_path = tmp_path / "scan_report.xlsx"
+    workbook = openpyxl.Workbook()
+    workbook.active.append(["Table", "Field"])
+    workbook.save(scan_report_path)
+    msg = MagicMock(dequeue_count=1)
+    msg.get_body.return_value = (
+        b'{"scan_report_id": 1, "scan_report_blob": "sr.xlsx", '
+        b'"data_dictionary_blob": "None", "validate": true}'
     )
 
     # Act
-    result = _get_unique_table_names(worksheet_mock)
+    with (
+        patch("UploadQueue.ScanReport.objects.get"),
+        patch("UploadQueue.update_job"),
+        patch(
+            "UploadQueue.blob_parser.download_scan_report",
+            return_value=str(scan_report_path),
+        ),
+        patch("UploadQueue._set_upload_failed") as set_upload_failed,
+        patch("UploadQueue._create_tables") as create_tables,
+    ):
+        UploadQueue.main(msg)
 
     # Assert
-    expected_result = ["Table1", "Table2", "Table3", "Table4"]
-    assert result == expected_result
+    set_upload_failed.assert_called_once()
+    assert "Please check the following columns exist" in (
+        set_upload_failed.call_args.args[1]
+    )
+    create_tables.assert_not_called()
+    assert not scan_report_path.exists()
 
 
 def test__create_table_entry():
@@ -113,172 +426,61 @@ def test__create_field_entry():
     assert result == expected_result
 
 
-def test__create_values_details():
+def test__index_fields():
     # Arrange
-    table_name = "test_table"
-
-    fieldname_value_freq = {
-        "field1": [("value1", "10"), ("value2", "20")],
-        "field2": [("value3", "30"), ("value4", "40")],
+    fields = [
+        ScanReportField(pk=1, name="field1"),
+        ScanReportField(pk=2, name="field2"),
+        ScanReportField(pk=3, name="field1"),
+    ]
+    data_dictionary = {
+        "test_table": {"field1": {"value1": "description1"}},
+        "other_table": {"field2": {"value3": "description3"}},
     }
 
     # Act
-    result = _create_values_details(fieldname_value_freq, table_name)
+    result = _index_fields(fields, "test_table", data_dictionary)
 
     # Assert
-    expected = [
-        {
-            "full_value": "value1",
-            "frequency": 10,
-            "fieldname": "field1",
-            "table": "test_table",
-            "val_desc": None,
-        },
-        {
-            "full_value": "value2",
-            "frequency": 20,
-            "fieldname": "field1",
-            "table": "test_table",
-            "val_desc": None,
-        },
-        {
-            "full_value": "value3",
-            "frequency": 30,
-            "fieldname": "field2",
-            "table": "test_table",
-            "val_desc": None,
-        },
-        {
-            "full_value": "value4",
-            "frequency": 40,
-            "fieldname": "field2",
-            "table": "test_table",
-            "val_desc": None,
-        },
-    ]
+    assert result == {"field1": (1, {"value1": "description1"}), "field2": (2, {})}
 
-    assert result == expected
 
-
-def test__assign_order():
+def test__index_fields_without_data_dictionary():
     # Arrange
-    values_details = [
-        {
-            "full_value": "value1",
-            "frequency": 10,
-            "fieldname": "field1",
-            "table": "test_table",
-            "val_desc": None,
-        },
-        {
-            "full_value": "value2",
-            "frequency": 20,
-            "fieldname": "field1",
-            "table": "test_table",
-            "val_desc": None,
-        },
-        {
-            "full_value": "value3",
-            "frequency": 30,
-            "fieldname": "field2",
-            "table": "test_table",
-            "val_desc": None,
-        },
-    ]
+    fields = [ScanReportField(pk=1, name="field1")]
 
     # Act
-    _assign_order(values_details)
+    result = _index_fields(fields, "test_table", None)
 
     # Assert
-    for i, entry in enumerate(values_details):
-        assert entry["order"] == i
+    assert result == {"field1": (1, {})}
 
 
-def test__apply_data_dictionary():
+def test__create_value_columns():
     # Arrange
-    values_details = [
-        {
-            "full_value": "value1",
-            "frequency": 10,
-            "fieldname": "field1",
-            "table": "test_table",
-            "val_desc": None,
-        },
-        {
-            "full_value": "value2",
-            "frequency": 20,
-            "fieldname": "field1",
-            "table": "test_table",
-            "val_desc": None,
-        },
-        {
-            "full_value": "value3",
-            "frequency": 30,
-            "fieldname": "field2",
-            "table": "test_table",
-            "val_desc": None,
-        },
-    ]
-
-    data_dictionary = {
-        "test_table": {
-            "field1": {
-                "value1": "description1",
-                "value2": "description2",
-            },
-            "field2": {
-                "value3": "description3",
-            },
-        }
+    fields_index = {
+        "field1": (1, {"value1": "description1", "value2": "description2"}),
+        "field2": (2, {}),
     }
+    batch = [
+        ("field1", "value1", 10),
+        ("field2", "value3", "30"),
+        ("field1", "value2", "not a number"),
+        ("field1", "x" * 200, None),
+    ]
 
     # Act
-    _apply_data_dictionary(values_details, data_dictionary)
+    result = _create_value_columns(batch, fields_index)
 
     # Assert
-    assert values_details[0]["val_desc"] == "description1"
-    assert values_details[1]["val_desc"] == "description2"
-    assert values_details[2]["val_desc"] == "description3"
-
-
-def test__create_value_entries():
-    # Arrange
-    values_details = [
-        {
-            "full_value": "value1",
-            "frequency": 10,
-            "fieldname": "field1",
-            "val_desc": "description1",
-        },
-        {
-            "full_value": "value2",
-            "frequency": 20,
-            "fieldname": "field1",
-            "val_desc": "description2",
-        },
-    ]
-
-    fieldnames_to_ids_dict = {
-        "field1": "field_id_1",
-        "field2": "field_id_2",
-    }
-
-    # Mock datetime
-    expected_datetime = "2024-02-29T00:00:00.000000Z"
-    with patch("UploadQueue.datetime") as mock_datetime:
-        mock_datetime.now.return_value = datetime(2024, 2, 29, tzinfo=timezone.utc)
+    assert result == ValueColumns(
+        field_ids=[1, 2, 1, 1],
+        values=["value1", "value3", "value2", "x" * 127],
+        frequencies=[10, 30, 0, 0],
+        descriptions=["description1", None, "description2", None],
+    )
 
-        # Act
-        result = _create_value_entries(values_details, fieldnames_to_ids_dict)
 
-    # Assert
-    for i, entry in enumerate(result):
-        assert entry["created_at"] == expected_datetime
-        assert entry["updated_at"] == expected_datetime
-        assert entry["value"] == values_details[i]["full_value"]
-        assert entry["frequency"] == values_details[i]["frequency"]
-        assert entry["value_description"] == values_details[i]["val_desc"]
-        assert (
-            entry["scan_report_field"]
-            == fieldnames_to_ids_dict[values_details[i]["fieldname"]]
-        )
+def test__create_value_columns_unknown_field():
+    with pytest.raises(ValueError, match="field3"):
+        _create_value_columns([("field3", "value", 1)], {"field1": (1, {})})
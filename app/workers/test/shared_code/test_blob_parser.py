@@ -1,119 +1,61 @@
-import pytest
-from shared_code.blob_parser import (
-    process_four_item_dict,
-    process_three_item_dict,
-    remove_BOM,
-)
-
-
-def test_remove_BOM():
-    # Arrange
-    intermediate = [
-        {"\ufeffkey1": "value1", "key2": "value2"},
-        {"key1": "value1", "\ufeffkey2": "value2"},
-        {"key1": "value1", "key2": "value2"},
-    ]
-
-    # Act
-    result = remove_BOM(intermediate)
+from unittest.mock import MagicMock
 
-    # Assert
-    expected_result = [
-        {"key1": "value1", "key2": "value2"},
-        {"key1": "value1", "key2": "value2"},
-        {"key1": "value1", "key2": "value2"},
-    ]
-    assert result == expected_result
-
-
-def test_process_three_item_dict():
-    # Arrange
-    three_item_data = [
-        {
-            "csv_file_name": "table1",
-            "field_name": "field1",
-            "value": "value1",
-            "code": "code1",
-        },
-        {
-            "csv_file_name": "table1",
-            "field_name": "field2",
-            "value": "value2",
-            "code": "code2",
-        },
-        {
-            "csv_file_name": "table2",
-            "field_name": "field2",
-            "value": "value2",
-            "code": "code2",
-        },
-        {
-            "csv_file_name": "table3",
-            "field_name": "field3",
-            "value": "value3",
-            "code": "code3",
-        },
+import pytest
+from shared.services.scan_report_checks import ScanReportCheckError
+from shared_code import blob_parser
+from shared_code.data_dictionary import DataDictionaryCache
+
+
+@pytest.fixture
+def blob_client(tmp_path, monkeypatch):
+    blob_client = MagicMock()
+    blob_client.get_blob_properties.return_value.etag = "etag1"
+    downloader = blob_client.download_blob.return_value
+    downloader.properties.etag = "etag1"
+    downloader.chunks.return_value = [
+        b"csv_file_name,field_name,code,value\n",
+        b"table1,field1,1,Yes\ntable1,field2,LOINC,\n",
     ]
-
+    service_client = MagicMock()
+    service_client.get_container_client.return_value.get_blob_client.return_value = (
+        blob_client
+    )
+    monkeypatch.setattr(
+        blob_parser.BlobServiceClient,
+        "from_connection_string",
+        lambda conn_str: service_client,
+    )
+    cache = DataDictionaryCache(str(tmp_path), 4)
+    monkeypatch.setattr(blob_parser.data_dictionary, "get_cache", lambda: cache)
+    return blob_client
+
+
+def test_get_data_dictionary_downloads_once(blob_client):
     # Act
-    result = process_three_item_dict(three_item_data)
+    first = blob_parser.get_data_dictionary("blob.csv", check=True)
+    second = blob_parser.get_data_dictionary("blob.csv")
 
     # Assert
-    expected_result = {
-        "table1": {"field1": "code1", "field2": "code2"},
-        "table2": {"field2": "code2"},
-        "table3": {"field3": "code3"},
-    }
-    assert result == expected_result
+    assert first == (
+        {"table1": {"field1": {"1": "Yes"}}},
+        {"table1": {"field2": "LOINC"}},
+    )
+    assert second is first
+    blob_client.download_blob.assert_called_once()
 
 
-@pytest.mark.skip()
-def test_process_four_item_dict():
-    """
-    TODO: This fails despite being based on the code example.
-    We need to clarify if the code, or example is wrong.
-    """
+def test_get_data_dictionary_check(blob_client):
     # Arrange
-    four_item_data = [
-        {
-            "csv_file_name": "table1",
-            "field_name": "field1",
-            "value": "value1",
-            "code": "code1",
-        },
-        {
-            "csv_file_name": "table1",
-            "field_name": "field2",
-            "value": "value2",
-            "code": "code2",
-        },
-        {
-            "csv_file_name": "table2",
-            "field_name": "field2",
-            "value": "value2",
-            "code": "code2",
-        },
-        {
-            "csv_file_name": "table2",
-            "field_name": "field2",
-            "value": "value3",
-            "code": "code3",
-        },
-        {
-            "csv_file_name": "table3",
-            "field_name": "field3",
-            "value": "value3",
-            "code": "code3",
-        },
+    blob_client.download_blob.return_value.chunks.return_value = [
+        b"csv_file_name,field_name,code,value\ntable1,,1,Yes\n"
     ]
 
     # Act
-    result = process_four_item_dict(four_item_data)
+    with pytest.raises(ScanReportCheckError) as e:
+        blob_parser.get_data_dictionary("blob.csv", check=True)
 
     # Assert
-    expected_result = {
-        "table1": {"field1": {"value1": "code1"}, "field2": {"value2": "code2"}},
-        "table2": {"field2": {"value2": "code2", "value3": "code3"}},
-        "table3": {"field3": {"value3": "code3"}},
-    }
-    assert result == expected_result
+    assert e.value.errors[0].startswith("Dictionary has an empty element in column 2")
+    # Data dictionaries that fail the checks aren't cached.
+    with pytest.raises(ScanReportCheckError):
+        blob_parser.get_data_dictionary("blob.csv", check=True)
@@ -0,0 +1,91 @@
+import os
+
+import pytest
+from shared_code.data_dictionary import (
+    DataDictionaryCache,
+    compile_data_dictionary,
+    iter_lines,
+)
+
+DATA_DICTIONARY_CSV = (
+    "﻿csv_file_name,field_name,code,value\r\n"
+    "table1,field1,1,Yes\r\n"
+    "table1,field1,2,No\r\n"
+    'table1,field2,a,"A, with a comma"\r\n'
+    "table1,field3,,\r\n"
+    "table2,field1,1,Present\r\n"
+    "table2,field4,LOINC,\r\n"
+)
+
+
+def test_compile_data_dictionary():
+    # Act
+    data_dictionary, vocab_dictionary = compile_data_dictionary(
+        DATA_DICTIONARY_CSV.lstrip("﻿").splitlines()
+    )
+
+    # Assert
+    assert data_dictionary == {
+        "table1": {
+            "field1": {"1": "Yes", "2": "No"},
+            "field2": {"a": "A, with a comma"},
+        },
+        "table2": {"field1": {"1": "Present"}},
+    }
+    assert vocab_dictionary == {
+        "table1": {"field3": ""},
+        "table2": {"field4": "LOINC"},
+    }
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 5, 1024])
+def test_iter_lines(chunk_size):
+    # Arrange
+    data = DATA_DICTIONARY_CSV.encode("utf-8")
+    chunks = [data[i : i + chunk_size] for i in range(0, len(data), chunk_size)]
+
+    # Act
+    lines = list(iter_lines(chunks))
+
+    # Assert
+    assert lines == DATA_DICTIONARY_CSV.lstrip("﻿").splitlines(keepends=True)
+
+
+def test_iter_lines_without_trailing_newline():
+    assert list(iter_lines([b"a,b\r", b"\nc,d"])) == ["a,b\r\n", "c,d"]
+
+
+def test_data_dictionary_cache(tmp_path):
+    # Arrange
+    compiled = ({"table1": {"field1": {"1": "Yes"}}}, {"table1": {"field2": "LOINC"}})
+    cache = DataDictionaryCache(str(tmp_path), max_entries=2)
+
+    # Act
+    cache.put("blob.csv", "etag1", compiled)
+
+    # Assert
+    assert cache.get("blob.csv", "etag1") is compiled
+    assert cache.get("blob.csv", "etag2") is None
+    # Another process reads the entry from disk.
+    assert DataDictionaryCache(str(tmp_path), 2).get("blob.csv", "etag1") == compiled
+
+
+def test_data_dictionary_cache_evicts_least_recently_used(tmp_path):
+    # Arrange
+    cache = DataDictionaryCache(str(tmp_path), max_entries=2)
+    cache.put("a.csv", "1", ({}, {}))
+    cache.put("b.csv", "1", ({}, {}))
+    cache.get("a.csv", "1")
+    os.utime(cache._path("a.csv", "1"), (0, 0))
+    os.utime(cache._path("b.csv", "1"), (1, 1))
+    # Another process reads the first entry from disk.
+    DataDictionaryCache(str(tmp_path), max_entries=2).get("a.csv", "1")
+
+    # Act
+    cache.put("c.csv", "1", ({}, {}))
+
+    # Assert
+    assert list(cache._entries) == [("a.csv", "1"), ("c.csv", "1")]
+    assert sorted(os.listdir(tmp_path)) == sorted(
+        os.path.basename(cache._path(blob, "1")) for blob in ["a.csv", "c.csv"]
+    )
@@ -0,0 +1,121 @@
+from unittest.mock import patch
+
+import pytest
+from django.contrib.contenttypes.models import ContentType
+from shared.services.vocabulary_index import write_vocabulary_index
+from shared_code import db
+from shared_code.models import ScanReportConceptContentType
+
+
+def test_create_concepts(monkeypatch):
+    # Arrange
+    monkeypatch.setattr(db, "CONCEPT_LOOKUP_BATCH_SIZE", 2)
+    content_type = ContentType(id=1, app_label="mapping", model="scanreportvalue")
+    existing = [[(10, 1)], [(30, 3)]]
+
+    # Act
+    with (
+        patch(
+            "shared_code.db.ContentType.objects.get", return_value=content_type
+        ) as get_content_type,
+        patch("shared_code.db.ScanReportConcept.objects.filter") as filter_concepts,
+    ):
+        filter_concepts.return_value.values_list.side_effect = existing
+        concepts = db.create_concepts(
+            [("10", "1"), (11, 1), ("20", "2"), (20, 2), (30, 3)],
+            ScanReportConceptContentType.VALUE,
+            "R",
+        )
+
+    # Assert
+    get_content_type.assert_called_once_with(model="scanreportvalue")
+    assert [call.kwargs for call in filter_concepts.call_args_list] == [
+        {"content_type": content_type, "object_id__in": [1, 2]},
+        {"content_type": content_type, "object_id__in": [3]},
+    ]
+    assert [(c.concept_id, c.object_id) for c in concepts] == [(11, 1), (20, 2)]
+    assert all(c.content_type == content_type for c in concepts)
+    assert all(c.creation_type == "R" for c in concepts)
+
+
+def test_create_concepts_without_concepts():
+    with patch("shared_code.db.ContentType.objects.get") as get_content_type:
+        assert db.create_concepts([], ScanReportConceptContentType.FIELD) == []
+
+    get_content_type.assert_not_called()
+
+
+@pytest.fixture
+def vocabulary_index_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(db, "_vocabulary_index", None)
+    monkeypatch.setattr(db, "_vocabulary_index_file", None)
+    path = str(tmp_path / "vocabulary.idx")
+    monkeypatch.setenv("VOCABULARY_INDEX_PATH", path)
+    return path
+
+
+def test_get_vocabulary_index(vocabulary_index_path):
+    write_vocabulary_index(
+        vocabulary_index_path, [("ICD10", "A01", 1, "S", "Condition")], "v1"
+    )
+
+    with patch(
+        "shared_code.db.get_vocabulary_version", return_value="v1"
+    ) as get_version:
+        index = db.get_vocabulary_index()
+        assert db.get_vocabulary_index() is index
+        get_version.assert_called_once()
+        assert index.get("ICD10", "A01").concept_id == 1
+
+        # A replaced index is reopened.
+        write_vocabulary_index(
+            vocabulary_index_path, [("ICD10", "A01", 2, "S", "Condition")], "v1"
+        )
+        assert db.get_vocabulary_index().get("ICD10", "A01").concept_id == 2
+
+
+def test_get_vocabulary_index_stale(vocabulary_index_path):
+    write_vocabulary_index(vocabulary_index_path, [], "v1")
+
+    with patch("shared_code.db.get_vocabulary_version", return_value="v2"):
+        assert db.get_vocabulary_index() is None
+
+
+def test_get_vocabulary_index_missing(vocabulary_index_path, monkeypatch):
+    assert db.get_vocabulary_index() is None
+
+    monkeypatch.delenv("VOCABULARY_INDEX_PATH")
+    assert db.get_vocabulary_index() is None
+
+
+def test_find_standard_concept_batch():
+    with (
+        patch(
+            "shared_code.db.lookup", return_value=[(3, 30), (1, 11), (1, 10)]
+        ) as lookup,
+        patch(
+            "shared_code.db._find_standard_concept_batch_from_relationships"
+        ) as from_relationships,
+    ):
+        standard_concepts = db.find_standard_concept_batch(
+            [{"concept_id": "1"}, {"concept_id": "2"}, {"concept_id": "3"}], True
+        )
+
+    assert lookup.call_args.args[1:] == ("source_concept_id", ["1", "2", "3"])
+    from_relationships.assert_not_called()
+    assert standard_concepts == {1: [10, 11], 3: [30]}
+
+
+def test_find_standard_concept_batch_without_maps():
+    with (
+        patch("shared_code.db.lookup") as lookup,
+        patch(
+            "shared_code.db._find_standard_concept_batch_from_relationships",
+            return_value={1: [10]},
+        ) as from_relationships,
+    ):
+        standard_concepts = db.find_standard_concept_batch([{"concept_id": "1"}], False)
+
+    lookup.assert_not_called()
+    from_relationships.assert_called_once_with(["1"])
+    assert standard_concepts == {1: [10]}
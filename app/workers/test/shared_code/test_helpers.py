@@ -110,3 +110,31 @@ def test_add_vocabulary_id_to_entries():
         {"scan_report_field": {"id": 2, "name": "field name"}, "vocabulary_id": "LOINC"}
     ]
     assert values == expected
+
+
+def test_batched():
+    # Arrange
+    entries = iter(range(7))
+
+    # Act
+    result = list(helpers.batched(entries, 3))
+
+    # Assert
+    assert result == [[0, 1, 2], [3, 4, 5], [6]]
+
+
+def test_handle_upload_workers(monkeypatch):
+    # Arrange
+    monkeypatch.setenv("UPLOAD_WORKERS", "4")
+
+    # Act
+    result = helpers.handle_upload_workers()
+
+    # Assert
+    assert result == 4
+    assert helpers.handle_upload_workers(2) == 2
+
+
+def test_get_max_dequeue_count():
+    # The number of deliveries host.json sets for queue messages
+    assert helpers.get_max_dequeue_count() == 5
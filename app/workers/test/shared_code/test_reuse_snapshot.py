@@ -0,0 +1,83 @@
+from unittest.mock import patch
+
+import pytest
+from shared_code import reuse_snapshot
+from shared_code.models import ScanReportConceptContentType
+from shared_code.reuse_snapshot import (
+    ReuseSnapshot,
+    ReuseSnapshotError,
+    SnapshotConcept,
+    get_reuse_snapshot,
+    read_reuse_snapshot,
+    write_reuse_snapshot,
+)
+
+FIELD = ScanReportConceptContentType.FIELD
+VALUE = ScanReportConceptContentType.VALUE
+
+SNAPSHOT = ReuseSnapshot(
+    "3-7",
+    {
+        FIELD: [SnapshotConcept(1, 30, "sex", None, "sex")],
+        VALUE: [
+            SnapshotConcept(2, 10, "M", None, "sex"),
+            SnapshotConcept(3, 20, "F", "Fémale", "sex"),
+        ],
+    },
+)
+
+
+@pytest.fixture(autouse=True)
+def snapshot_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("REUSE_SNAPSHOT_DIR", str(tmp_path))
+    monkeypatch.setattr(reuse_snapshot, "_snapshot", None)
+    return tmp_path
+
+
+def test_write_and_read_reuse_snapshot(tmp_path):
+    # Arrange
+    path = str(tmp_path / "snapshot.bin")
+
+    # Act
+    write_reuse_snapshot(path, SNAPSHOT)
+    snapshot = read_reuse_snapshot(path)
+
+    # Assert
+    assert snapshot.version == "3-7"
+    assert snapshot.concepts(FIELD) == SNAPSHOT.concepts(FIELD)
+    assert snapshot.concepts(VALUE) == SNAPSHOT.concepts(VALUE)
+    assert len(snapshot) == 3
+
+
+def test_read_reuse_snapshot_rejects_other_files(tmp_path):
+    # Arrange
+    path = tmp_path / "snapshot.bin"
+    path.write_bytes(b"not a snapshot at all")
+
+    # Act & Assert
+    with pytest.raises(ReuseSnapshotError):
+        read_reuse_snapshot(str(path))
+
+
+def test_get_reuse_snapshot_builds_once_per_version(snapshot_dir):
+    # Arrange
+    with patch.object(
+        reuse_snapshot.db, "get_reusable_concepts_version"
+    ) as get_version, patch.object(
+        reuse_snapshot, "build_reuse_snapshot", return_value=SNAPSHOT
+    ) as build:
+        # Act
+        first = get_reuse_snapshot(1, "3-7")
+        # Another process reads the snapshot from the file.
+        reuse_snapshot._snapshot = None
+        second = get_reuse_snapshot(1, "3-7")
+
+        get_reuse_snapshot(1, "4-8")
+
+    # Assert
+    assert first is SNAPSHOT
+    assert second.concepts(VALUE) == SNAPSHOT.concepts(VALUE)
+    assert (snapshot_dir / "1.bin").exists()
+    assert [call.args for call in build.call_args_list] == [(1, "3-7"), (1, "4-8")]
+    # The version is passed in, so isn't looked up for each snapshot
+    get_version.assert_not_called()
@@ -0,0 +1,216 @@
+import zipfile
+from datetime import date, datetime, time
+from queue import Queue
+
+import openpyxl
+import pytest
+from openpyxl.styles import Font
+from shared_code import xlsx_reader
+from shared_code.xlsx_reader import SHARED_STRINGS_TYPE, SHEET_MAIN_NS, ScanReportReader
+
+SHEET_ROWS = [
+    ["field1", "Frequency", "field2", "Frequency"],
+    ["apple", 20, "orange", 5],
+    ["banana", 3.5, None, None],
+    [True, 1, False, 2],
+    [datetime(2024, 2, 29, 12, 30), 4, date(2023, 1, 1), 6],
+    [time(9, 15), 7, "=1+1", 8],
+    ["", None, "x", 9],
+]
+
+
+@pytest.fixture
+def scan_report_path(tmp_path):
+    workbook = openpyxl.Workbook()
+    overview = workbook.active
+    overview.title = "Field Overview"
+    for row in [["Table", "Field"], ["Table1", "field1"], ["Table1", "field2"]]:
+        overview.append(row)
+
+    sheet = workbook.create_sheet("Table1")
+    for row in SHEET_ROWS:
+        sheet.append(row)
+    # A gap in the rows, then a trailing row that should be read as-is.
+    sheet.cell(row=len(SHEET_ROWS) + 3, column=1, value="after gap")
+    sheet.cell(row=len(SHEET_ROWS) + 3, column=6, value="beyond headers")
+    sheet["A2"].font = Font(bold=True)
+
+    workbook.create_sheet("Empty")
+
+    path = tmp_path / "scan_report.xlsx"
+    workbook.save(path)
+    return path
+
+
+def _openpyxl_rows(path, sheet_name, **kwargs):
+    workbook = openpyxl.load_workbook(
+        path, read_only=True, data_only=True, keep_links=False
+    )
+    sheet = workbook[sheet_name]
+    sheet.reset_dimensions()
+    # Missing rows are returned as lists rather than tuples
+    rows = [tuple(row) for row in sheet.iter_rows(values_only=True, **kwargs)]
+    workbook.close()
+    return rows
+
+
+def test_sheetnames(scan_report_path):
+    with ScanReportReader(scan_report_path) as reader:
+        assert reader.sheetnames == ["Field Overview", "Table1", "Empty"]
+
+
+@pytest.mark.parametrize("sheet_name", ["Field Overview", "Table1", "Empty"])
+def test_iter_rows_matches_openpyxl(scan_report_path, sheet_name):
+    with ScanReportReader(scan_report_path) as reader:
+        assert list(reader.iter_rows(sheet_name)) == _openpyxl_rows(
+            scan_report_path, sheet_name
+        )
+
+
+def test_iter_rows_small_chunks(scan_report_path, monkeypatch):
+    # Rows split across chunks are read whole.
+    with ScanReportReader(scan_report_path) as reader:
+        expected = list(reader.iter_rows("Table1"))
+        monkeypatch.setattr(xlsx_reader, "CHUNK_SIZE", 7)
+        assert list(reader.iter_rows("Table1")) == expected
+
+
+def test_iter_rows_max_col_matches_openpyxl(scan_report_path):
+    with ScanReportReader(scan_report_path) as reader:
+        result = list(reader.iter_rows("Table1", min_row=2, max_col=4))
+
+    assert result == _openpyxl_rows(
+        scan_report_path, "Table1", min_row=2, min_col=1, max_col=4
+    )
+
+
+def test_iter_value_triples(scan_report_path):
+    with ScanReportReader(scan_report_path) as reader:
+        result = list(reader.iter_value_triples("Table1"))
+
+    assert result == [
+        ("field1", "apple", 20),
+        ("field2", "orange", 5),
+        ("field1", "banana", 3.5),
+        ("field1", "True", 1),
+        ("field2", "False", 2),
+        ("field1", "2024-02-29 12:30:00", 4),
+        ("field2", "2023-01-01 00:00:00", 6),
+        ("field1", "09:15:00", 7),
+        # Formulas without a cached result are read as empty
+        ("field2", "None", 8),
+        ("field2", "x", 9),
+    ]
+
+
+def test_put_value_batches(scan_report_path):
+    queue = Queue()
+
+    xlsx_reader.put_value_batches(scan_report_path, "Table1", queue, 4)
+
+    batches = []
+    while (batch := queue.get_nowait()) is not None:
+        batches.append(batch)
+    with ScanReportReader(scan_report_path) as reader:
+        triples = list(reader.iter_value_triples("Table1"))
+    assert batches == [triples[:4], triples[4:8], triples[8:]]
+    assert queue.empty()
+
+
+def test_put_value_batches_missing_sheet(scan_report_path):
+    queue = Queue()
+
+    with pytest.raises(KeyError):
+        xlsx_reader.put_value_batches(scan_report_path, "Missing", queue, 4)
+
+    assert isinstance(queue.get_nowait(), KeyError)
+    assert queue.empty()
+
+
+def test_put_value_batches_fails_after_first_batch(scan_report_path, monkeypatch):
+    def iter_value_triples(self, sheet_name):
+        yield from [("field1", "a", 1)] * 4
+        raise ValueError("Corrupt sheet")
+
+    monkeypatch.setattr(ScanReportReader, "iter_value_triples", iter_value_triples)
+    queue = Queue()
+
+    with pytest.raises(ValueError):
+        xlsx_reader.put_value_batches(scan_report_path, "Table1", queue, 4)
+
+    # The error is put on the queue in place of the end of the sheet
+    assert queue.get_nowait() == [("field1", "a", 1)] * 4
+    assert isinstance(queue.get_nowait(), ValueError)
+    assert queue.empty()
+
+
+def test_iter_value_triples_empty_sheet(scan_report_path):
+    with ScanReportReader(scan_report_path) as reader:
+        assert list(reader.iter_value_triples("Empty")) == []
+
+
+@pytest.mark.parametrize("prefix", ["", "x:"])
+def test_xml_variants_match_openpyxl(tmp_path, prefix):
+    # openpyxl only writes plain inline strings, so rewrite the sheet with shared
+    # strings, rich text, escaped text, formulas and namespace prefixes.
+    path = tmp_path / "scan_report.xlsx"
+    workbook = openpyxl.Workbook()
+    workbook.active.title = "Table1"
+    workbook.save(path)
+
+    ns = f'xmlns{":x" if prefix else ""}="{SHEET_MAIN_NS}"'
+    sheet_xml = (
+        (
+            f"<worksheet {ns}><cols><col min='1' max='2' width='10'/></cols>"
+            "<sheetData>"
+            '<row r="1"><c r="A1" t="inlineStr"><is><t>field1</t></is></c>'
+            '<c r="B1" t="s"><v>0</v></c></row>'
+            '<row r="3"><c r="A3" t="inlineStr"><is><r><t>ba</t></r><r><t>nana</t>'
+            '</r></is></c><c r="B3"><v>12</v></c></row>'
+            "<row r='4' spans='1:4'><c r='A4' t='str'><v>a &amp; b</v></c>"
+            '<c r="B4"><f>1+1</f><v>2</v></c><c r="C4" t="inlineStr">'
+            '<is><t xml:space="preserve"> &lt;x&gt; </t></is></c><c r="D4"/></row>'
+            '<row r="6"/>'
+            "</sheetData></worksheet>"
+        )
+        .replace("<", f"<{prefix}")
+        .replace(f"<{prefix}/", f"</{prefix}")
+    )
+    parts = {
+        "xl/worksheets/sheet1.xml": sheet_xml,
+        "xl/sharedStrings.xml": (
+            f'<sst xmlns="{SHEET_MAIN_NS}" count="1" uniqueCount="1"><si>'
+            '<r><t>Freq</t></r><r><t>uency</t></r><rPh sb="0" eb="1"><t>x</t></rPh>'
+            "</si></sst>"
+        ),
+    }
+    rewritten = tmp_path / "rewritten.xlsx"
+    with zipfile.ZipFile(path) as source, zipfile.ZipFile(rewritten, "w") as target:
+        for item in source.infolist():
+            data = parts.pop(item.filename, None) or source.read(item)
+            if item.filename == "[Content_Types].xml":
+                data = data.replace(
+                    b"</Types>",
+                    b'<Override PartName="/xl/sharedStrings.xml" ContentType="'
+                    + SHARED_STRINGS_TYPE.encode()
+                    + b'" /></Types>',
+                )
+            target.writestr(item, data)
+        for filename, data in parts.items():
+            target.writestr(filename, data)
+
+    with ScanReportReader(rewritten) as reader:
+        rows = list(reader.iter_rows("Table1"))
+        triples = list(reader.iter_value_triples("Table1"))
+
+    assert rows == _openpyxl_rows(rewritten, "Table1")
+    assert rows == [
+        ("field1", "Frequency"),
+        (),
+        ("banana", 12),
+        ("a & b", 2, " <x> ", None),
+        (),
+        (),
+    ]
+    # Reading stops at the missing second row.
+    assert triples == []